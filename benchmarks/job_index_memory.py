@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+memory used by the server to keep track of the pending jobs
+
+Compares the former bookkeeping, where the server kept a hashable copy
+of every argument in a set and a second copy in the job_q and matched
+the returned results by the full argument, with the job id index, where
+a dict maps the job id to the single copy of the argument and the job_q
+and the results only refer to the argument via its id.
+
+The arguments are small numpy arrays, as frequently used in practice.
+
+    python job_index_memory.py [number of jobs]
+"""
+from __future__ import division, print_function
+
+import collections
+import copy
+from os.path import split, dirname, abspath
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+# Add parent directory to beginning of path variable
+sys.path = [split(dirname(abspath(__file__)))[0]] + sys.path
+
+from jobmanager import jobmanager
+
+
+def args_set_scheme(args):
+    """former scheme: set of hashable copies + copies in the queue"""
+    tracemalloc.start()
+    args_set = set()
+    job_q = collections.deque()
+    for a in args:
+        a = jobmanager.hashableCopyOfNumpyArray(a)
+        args_set.add(copy.copy(a))
+        job_q.append(copy.copy(a))
+    mem = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    t0 = time.time()
+    while job_q:
+        arg = job_q.popleft()
+        # the result carries the argument back
+        args_set.remove(arg)
+    t = time.time() - t0
+    return mem, t
+
+
+def args_dict_scheme(args):
+    """job id index: dict of id -> arg + (id, arg) in the queue"""
+    tracemalloc.start()
+    args_dict = {}
+    job_q = collections.deque()
+    for job_id, a in enumerate(args):
+        a = copy.copy(a)
+        args_dict[job_id] = a
+        job_q.append((job_id, a))
+    mem = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    t0 = time.time()
+    while job_q:
+        job_id, arg = job_q.popleft()
+        # the result carries the job id back
+        args_dict.pop(job_id)
+    t = time.time() - t0
+    return mem, t
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        n = int(sys.argv[1])
+    else:
+        n = 10**6
+
+    args = [np.random.rand(4) for i in range(n)]
+
+    print("bookkeeping of {} jobs with numpy array arguments".format(n))
+    print("{:>10} | {:>12} | {:>14}".format("scheme", "memory [MB]", "matching [s]"))
+    for name, scheme in [('args_set', args_set_scheme),
+                         ('args_dict', args_dict_scheme)]:
+        mem, t = scheme(args)
+        print("{:>10} | {:>12.1f} | {:>14.2f}".format(name, mem / 2**20, t))
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+dispatch rate of the job_q as seen by a client
+
+The queue is hosted by a SyncManager (as done by the JobManager_Server)
+and emptied via proxy. Compares the JobQueue, which lives natively in the
+SyncManager process, with a multiprocessing.Queue (myQueue) as used before,
+for single gets and for get_many.
+
+    python job_queue_dispatch.py [number of items]
+"""
+from __future__ import division, print_function
+
+from multiprocessing.managers import SyncManager
+from os.path import split, dirname, abspath
+import sys
+import time
+
+# Add parent directory to beginning of path variable
+sys.path = [split(dirname(abspath(__file__)))[0]] + sys.path
+
+from jobmanager import jobmanager
+
+
+def dispatch_rate(queue_class, n, chunk_size):
+    """items per second when emptying a queue of n items via proxy"""
+    q = queue_class()
+    q.put_many(range(n))
+    # let the feeder thread of the multiprocessing.Queue finish
+    time.sleep(0.5)
+
+    class BenchManager(SyncManager):
+        pass
+    BenchManager.register('get_q', callable=lambda: q)
+
+    manager = BenchManager(address=('127.0.0.1', 0), authkey=b'bench')
+    manager.start()
+    try:
+        q_proxy = manager.get_q()
+        cnt = 0
+        t0 = time.time()
+        try:
+            while True:
+                if chunk_size == 1:
+                    q_proxy.get(timeout=0.1)
+                    cnt += 1
+                else:
+                    cnt += len(q_proxy.get_many(chunk_size, timeout=0.1))
+        except jobmanager.queue.Empty:
+            pass
+        t = time.time() - t0 - 0.1   # the last get waited for the timeout
+    finally:
+        manager.shutdown()
+
+    assert cnt == n, "got {} items, expected {}".format(cnt, n)
+    return n / t
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        n = int(sys.argv[1])
+    else:
+        n = 20000
+
+    print("dispatch {} items via SyncManager proxy".format(n))
+    print("{:>10} | {:>16} | {:>16} | {:>6}".format("chunk size", "myQueue [1/s]", "JobQueue [1/s]", "ratio"))
+    for chunk_size in [1, 10, 100]:
+        r_mp = dispatch_rate(jobmanager.myQueue, n, chunk_size)
+        r_jq = dispatch_rate(jobmanager.JobQueue, n, chunk_size)
+        print("{:>10} | {:>16.0f} | {:>16.0f} | {:>6.2f}".format(chunk_size, r_mp, r_jq, r_jq / r_mp))
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+encode/decode time and size of the messages of the serializers
+
+Each serializer (see JobManager_Server serializer) encodes and decodes
+representative payloads: a small numpy array as an argument, a tuple of
+15 floats like the arguments of the FitFunc example, a large numpy array
+as a result and the list of (job_id, result) pairs a client uploads.
+The last one is encoded by the _WireCodec like on the wire.
+
+    python serializers.py [number of repetitions]
+"""
+from __future__ import division, print_function
+
+from os.path import split, dirname, abspath
+import sys
+import time
+
+import numpy as np
+
+# Add parent directory to beginning of path variable
+sys.path = [split(dirname(abspath(__file__)))[0]] + sys.path
+
+from jobmanager import jobmanager
+
+
+def measure(dumps, loads, obj, n):
+    """return encode time [us], decode time [us] and bytes per message"""
+    t0 = time.time()
+    for i in range(n):
+        data = dumps(obj)
+    t_enc = (time.time() - t0) / n
+
+    t0 = time.time()
+    for i in range(n):
+        loads(data)
+    t_dec = (time.time() - t0) / n
+    return t_enc * 1e6, t_dec * 1e6, len(data)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        n = int(sys.argv[1])
+    else:
+        n = 10000
+
+    # name, payload, fraction of the repetitions
+    payloads = [('array(4)', np.random.rand(4), 1),
+                ('float tuple(15)', tuple(np.random.rand(15)), 1),
+                ('array(1000, 100)', np.random.rand(1000, 100), 0.01),
+                ('64 results', [(i, np.random.rand(100)) for i in range(64)], 0.1)]
+
+    serializers = [jobmanager.PickleSerializer(protocol=2),
+                   jobmanager.PickleSerializer(),
+                   jobmanager.NumpySerializer(),
+                   jobmanager.FloatTupleSerializer()]
+
+    print("{} repetitions (fewer for the larger payloads)".format(n))
+    print("{:>16} | {:>12} | {:>11} | {:>11} | {:>9}".format("payload", "serializer", "encode [us]", "decode [us]", "bytes"))
+    for p_name, obj, fraction in payloads:
+        for serializer in serializers:
+            if p_name == '64 results':
+                codec = jobmanager._WireCodec(codec=None, serializer=serializer)
+                dumps, loads = codec.dumps_results, codec.loads_results
+            else:
+                dumps, loads = serializer.dumps, serializer.loads
+            t_enc, t_dec, size = measure(dumps, loads, obj, max(1, int(n*fraction)))
+            print("{:>16} | {:>12} | {:>11.2f} | {:>11.2f} | {:>9}".format(p_name, serializer.name, t_enc, t_dec, size))
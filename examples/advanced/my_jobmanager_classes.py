@@ -37,6 +37,13 @@ class FitFunc_Client(jm.JobManager_Client):
                        method="BFGS")
         
         return res.x, res.fun
+    
+    @staticmethod
+    def combine(acc, arg, result):
+        # only the best fit is of interest, so send only that one to the server
+        if (acc is None) or (result[1] < acc[1]):
+            return result
+        return acc
         
 
 class FitFunc_Server(jm.JobManager_Server):
@@ -131,7 +138,7 @@ if __name__ == "__main__":
     # we can check if they can be process by the 
     # clinet's static function func
 
-    arg0 = fitfunc_server.job_q.get()
+    job_id, arg0 = fitfunc_server.job_q.get()
     x, fun = FitFunc_Client.func(arg0, const_args=const_args)
     print("arg0 :", arg0)
     print("x    :", x)
@@ -6,6 +6,7 @@ The clients module
 This module provides special subclasses of the JobManager_Client
 """
 
+import numpy as np
 import os
 import sys
 import traceback
@@ -76,6 +77,19 @@ def merge_arg_and_const_arg(arg, const_arg):
     return args_dgl, kwargs
 
 
+def ode_result_schema(N, res_dim, dtype=np.complex128):
+    """
+        returns the result schema (see JobManager_Server result_schema)
+        for the results (t, x) of Integration_Client_CPLX/REAL, where
+        N is the number of time steps and res_dim the shape of x(t)
+        (use dtype=np.float64 for Integration_Client_REAL)
+    """
+    if isinstance(res_dim, int):
+        res_dim = (res_dim, )
+    return [('t', np.float64, (N, )),
+            ('x', dtype, (N, ) + tuple(res_dim))]
+
+
 class Integration_Client_CPLX(JobManager_Client):
     """
         A JobManager_Client subclass to integrate a set of complex valued ODE.
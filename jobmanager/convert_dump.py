@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""convert a dump of the JobManager_Server to the chunked format
+
+    python -m jobmanager.convert_dump old.dump [new.dump]
+    
+If new.dump is not given, old.dump is replaced (see 
+JobManager_Server.convert_dump).
+"""
+from __future__ import division, print_function
+
+import sys
+
+from .jobmanager import JobManager_Server
+
+if __name__ == "__main__":
+    if len(sys.argv) not in [2, 3]:
+        print(__doc__)
+        sys.exit(1)
+    fname_old = sys.argv[1]
+    fname_new = sys.argv[2] if len(sys.argv) == 3 else None
+    JobManager_Server.convert_dump(fname_old, fname_new)
+    print("converted '{}' to '{}'".format(fname_old, fname_new or fname_old))
@@ -30,25 +30,47 @@ The class JobManager_Client
 """
 from __future__ import division, print_function
 
+import collections
 import copy
+import fcntl
 import functools
+import hashlib
+import heapq
 import inspect
+import math
 import multiprocessing as mp
-from multiprocessing.managers import SyncManager
+from multiprocessing.managers import SyncManager, BaseProxy
+import multiprocessing.connection as mp_connection
+import multiprocessing.queues as mp_queues
 import numpy as np
 import os
 import pickle
+import random
 import signal
 import socket
+import struct
 import sys
+import tempfile
+import threading
 import time
 import traceback
+import zlib
 
 # This is a list of all python objects that will be imported upon
 # initialization during module import (see __init__.py)
 __all__ = ["JobManager_Client",
            "JobManager_Local",
            "JobManager_Server",
+           "ResultSink",
+           "PickleFileSink",
+           "NpyDirSink",
+           "ResultColumns",
+           "RetryPolicy",
+           "BlobRef",
+           "Serializer",
+           "PickleSerializer",
+           "NumpySerializer",
+           "FloatTupleSerializer",
            "hashDict",
            "hashableCopyOfNumpyArray",
            "getDateForFileName"
@@ -88,6 +110,40 @@ class JobManager_Client(object):
     Each subprocess gets an argument from the job_q, processes it 
     and puts the result to the result_q.
     
+    With batch_size > 1 a subprocess fetches up to batch_size arguments
+    from the job_q at once (one round trip to the server) and works
+    through them locally.
+    
+    With prefetch > 0 a background thread of each subprocess fetches
+    the next arguments while the current ones are processed (see _JobFetcher).
+    
+    The results are not sent one by one. A background thread of each
+    subprocess collects them and puts them as a list to the result_q
+    (see _ResultUploader), so the calculation does not wait for the network.
+    
+    If the server only needs a reduction of the results (e.g. the best one or
+    a sum), implement combine to fold the results of each subprocess locally.
+    Instead of the single results the accumulator is sent, together with the ids
+    of the jobs folded into it (see combine_interval).
+    
+    With const_arg_cache the const_arg is kept on disk, keyed by its content hash,
+    so reconnecting clients do not transfer it again. If the server publishes a new 
+    version (see JobManager_Server.set_const_arg), the subprocesses switch to it as 
+    soon as they get an argument of the new version. The client fetches it once for 
+    all its subprocesses (see _ConstArgSwitch).
+    
+    If the server broadcasts the const_arg (see JobManager_Server const_arg_broadcast),
+    the client fetches its chunks from other clients where possible and serves the
+    chunks it holds to others until start returns (see _fetch_broadcast).
+    
+    Arguments may refer to large inputs stored by the server (see 
+    JobManager_Server.put_blob). They are fetched once per host and kept in 
+    a host-local cache of at most blob_cache_size bytes (see _BlobCache).
+    
+    With shared_const_arg the numpy arrays of const_arg are stored once per host
+    in files (in /dev/shm if available), which all subprocesses map read-only
+    instead of holding their own copy (see _share_const_arg).
+    
     If the job_q is empty, terminate the subprocess.
     
     In case of any failure detected within the try except clause
@@ -112,7 +168,18 @@ class JobManager_Client(object):
                   verbose=1,
                   show_statusbar_for_jobs=True,
                   show_counter_only=False,
-                  interval=0.3):
+                  interval=0.3,
+                  batch_size=1,
+                  result_batch_size=64,
+                  result_flush_interval=0.2,
+                  prefetch=0,
+                  combine_interval=10,
+                  combine_max_jobs=10000,
+                  shared_const_arg=False,
+                  shared_const_arg_dir=None,
+                  const_arg_cache=None,
+                  blob_cache_dir=None,
+                  blob_cache_size=2**30):
         """
         server [string] - ip address or hostname where the JobManager_Server is running
         
@@ -142,6 +209,52 @@ class JobManager_Client(object):
         no_warnings [bool] - call warnings.filterwarnings("ignore") -> all warnings are ignored
         
         verbose [int] - 0: quiet, 1: status only, 2: debug messages
+        
+        batch_size [int/'auto'] - number of arguments a subprocess fetches from the
+        job_q with a single request. Use values larger than one for short jobs
+        where the communication with the server dominates the run time.
+        'auto' lets the server choose the number based on the measured calculation
+        and communication times (see ChunkSizer).
+        
+        result_batch_size [int] - number of results collected by a subprocess
+        before they are sent to the result_q as a single message
+        
+        result_flush_interval [float] - collected results are sent at the latest
+        after that many seconds, even if less than result_batch_size results
+        are available
+        
+        prefetch [int] - number of chunks (of batch_size arguments each) a subprocess
+        fetches ahead in a background thread while working on the current arguments.
+        So the communication with the server overlaps with the calculation, which pays
+        off when the latency to the server is high. 0 disables prefetching.
+        
+        combine_interval [float] - if combine is implemented, a subprocess sends its
+        accumulator at the latest after that many seconds
+        
+        combine_max_jobs [int] - ... or when that many results have been folded into it
+        
+        shared_const_arg [bool] - put the numpy arrays of const_arg (also those in a 
+        tuple, list or dict) into host-local files named by the hash of their content,
+        mapped read-only by the subprocesses. So a large const_arg is held in memory 
+        once per host, also when several clients on the host work for the same server.
+        Each client holds a shared lock on the files it uses until start returns, the 
+        last one removes them (see _SharedFileLock). Processes still mapping them are 
+        not affected.
+        
+        shared_const_arg_dir [string/None] - directory of these files (None: /dev/shm 
+        if it exists, otherwise the default temporary directory), has to be host-local
+        
+        const_arg_cache [string/None] - directory where the const_arg received from 
+        the server is stored as jobmanager_const_arg_<hash>.pickle. If the server 
+        announces a const_arg whose hash is found there, it is read from disk instead.
+        The files are not removed, None disables the cache.
+        
+        blob_cache_dir [string/None] - host-local directory where the blobs referred 
+        to by the arguments (see BlobRef) are cached, shared by all clients on the 
+        host (None: as for shared_const_arg_dir)
+        
+        blob_cache_size [int] - the least recently used blobs are removed from the 
+        cache when it exceeds that many bytes
         """
         
         self.show_statusbar_for_jobs = show_statusbar_for_jobs
@@ -178,6 +291,37 @@ class JobManager_Client(object):
             njobs -= 1
         self.njobs = njobs
         
+        if (batch_size != 'auto') and (batch_size < 1):
+            raise RuntimeError("Invalid batch_size {}, must be a positive integer or 'auto'".format(batch_size))
+        self.batch_size = batch_size
+        
+        if result_batch_size < 1:
+            raise RuntimeError("Invalid result_batch_size {}, must be a positive integer".format(result_batch_size))
+        self.result_batch_size = result_batch_size
+        self.result_flush_interval = result_flush_interval
+        
+        if prefetch < 0:
+            raise RuntimeError("Invalid prefetch {}, must be a non negative integer".format(prefetch))
+        self.prefetch = prefetch
+        
+        if combine_max_jobs < 1:
+            raise RuntimeError("Invalid combine_max_jobs {}, must be a positive integer".format(combine_max_jobs))
+        self.combine_interval = combine_interval
+        self.combine_max_jobs = combine_max_jobs
+        
+        self.shared_const_arg = shared_const_arg
+        if shared_const_arg_dir is None:
+            shared_const_arg_dir = _host_local_dir()
+        self.shared_const_arg_dir = shared_const_arg_dir
+        self._shared_locks = []     # held on the files of _share_const_arg
+        self.const_arg_cache = const_arg_cache
+        if blob_cache_dir is None:
+            blob_cache_dir = _host_local_dir()
+        self.blob_cache_dir = blob_cache_dir
+        self.blob_cache_size = blob_cache_size
+        self._seeders = []          # serve the broadcast const_arg to other clients
+        self._switch_manager = None # fetches new versions of the const_arg (see _switch_const_arg)
+        
         self.procs = []
         
         self.manager_objects = None  # will be set via connect()
@@ -188,6 +332,14 @@ class JobManager_Client(object):
     def connect(self):
         if self.manager_objects is None:
             self.manager_objects = self.get_manager_objects()
+            if self.shared_const_arg:
+                # the subprocesses get references to the shared arrays only
+                job_q, result_q, fail_q, const_arg, result_port, transport, const_arg_version, blob_store = self.manager_objects
+                const_arg, locks = _share_const_arg(const_arg, self.shared_const_arg_dir)
+                self._shared_locks += locks
+                if self.verbose > 1:
+                    print("{}: const_arg shared in {} ({} files)".format(self._identifier, self.shared_const_arg_dir, len(locks)))
+                self.manager_objects = job_q, result_q, fail_q, const_arg, result_port, transport, const_arg_version, blob_store
         else:
             if self.verbose > 0:
                 print("{}: already connected (at least shared object are available)".format(self._identifier))
@@ -201,17 +353,76 @@ class JobManager_Client(object):
                                                       self.port, 
                                                       self.authkey, 
                                                       self._identifier,
-                                                      self.verbose)
+                                                      self.verbose,
+                                                      self.const_arg_cache,
+                                                      self._seeders)
+       
+    def _switch_const_arg(self):
+        """get the current const_arg of the server for all workers (see _ConstArgSwitch), 
+        return (const_arg, version)
+        
+        Called by a thread of the client process, it uses a connection of its own
+        to the server for all switches. The const_arg is taken from the const_arg_cache
+        or the broadcast as the initial one and shared on the host if shared_const_arg.
+        """
+        if self._switch_manager is None:
+            self._switch_manager = JobManager_Client._connect_manager(self.server, self.port, self.authkey,
+                                                                      self._identifier, self.verbose)
+            if self._switch_manager is None:
+                raise RuntimeError("could not connect to the server to get a new const_arg")
+        result_port, transport = self.manager_objects[4:6]
+        const_arg, version = JobManager_Client._fetch_const_arg(self._switch_manager, self.server, self.authkey, 
+                                                                self._identifier, self.verbose, self.const_arg_cache, 
+                                                                self._seeders, transport, result_port)
+        if self.shared_const_arg:
+            const_arg, locks = _share_const_arg(const_arg, self.shared_const_arg_dir)
+            self._shared_locks += locks
+        if self.verbose > 0:
+            print("{}: switched to const_arg version {}".format(self._identifier, version))
+        return const_arg, version
        
     @staticmethod
-    def _get_manager_objects(server, port, authkey, identifier, verbose = 0):
+    def _get_manager_objects(server, port, authkey, identifier, verbose = 0, const_arg_cache = None, seeders = None):
         """
             connects to the server and get registered shared objects such as
-            job_q, result_q, fail_q
+            job_q, result_q, fail_q and the port of the direct result
+            channel (None if not available)
             
             const_arg will be deep copied from the manager and therefore live
-            as non shared object in local memory
+            as non shared object in local memory, its version is returned 
+            followed by the store of the blobs (see JobManager_Server.put_blob). 
+            With const_arg_cache (a directory) a const_arg of the 
+            same hash is read from disk instead (see JobManager_Client).
+            
+            If the server broadcasts the const_arg and seeders is a list, the
+            _BroadcastSeeder serving the chunks to other clients is appended.
         """
+        manager = JobManager_Client._connect_manager(server, port, authkey, identifier, verbose)
+        if manager is None:
+            return None
+        
+        job_q = manager.get_job_q()
+        if verbose > 1:
+            print("{}: found job_q with {} jobs".format(identifier, job_q.qsize()))
+            
+        result_q = manager.get_result_q()
+        fail_q = manager.get_fail_q()
+        # port of the direct result channel of the server, None if the
+        # results have to be put to the result_q
+        result_port = copy.deepcopy(manager.get_result_port())
+        if (verbose > 1) and (result_port is not None):
+            print("{}: send results directly to port {}".format(identifier, result_port))
+        # how to send data over the direct result channel (see JobManager_Server zero_copy)
+        transport = copy.deepcopy(manager.get_transport())
+        
+        const_arg, const_arg_version = JobManager_Client._fetch_const_arg(manager, server, authkey, identifier, verbose,
+                                                                         const_arg_cache, seeders, transport, result_port)
+        blob_store = manager.get_blob_store()
+        return job_q, result_q, fail_q, const_arg, result_port, transport, const_arg_version, blob_store
+    
+    @staticmethod
+    def _connect_manager(server, port, authkey, identifier, verbose = 0):
+        """connect to the SyncManager of the server, return None on failure"""
         class ServerQueueManager(SyncManager):
             pass
         
@@ -219,6 +430,11 @@ class JobManager_Client(object):
         ServerQueueManager.register('get_result_q')
         ServerQueueManager.register('get_fail_q')
         ServerQueueManager.register('get_const_arg')
+        ServerQueueManager.register('get_const_arg_info')
+        ServerQueueManager.register('get_const_arg_tracker')
+        ServerQueueManager.register('get_blob_store')
+        ServerQueueManager.register('get_result_port')
+        ServerQueueManager.register('get_transport')
     
         manager = ServerQueueManager(address=(server, port), authkey=authkey)
             
@@ -240,19 +456,56 @@ class JobManager_Client(object):
         else:
             if verbose > 1:    
                 print("{}: connecting to {}:{} authkey '{}' SUCCEEDED!".format(identifier, server, port, authkey.decode('utf8')))
-            
+        return manager
+    
+    @staticmethod
+    def _fetch_const_arg(manager, server, authkey, identifier, verbose, const_arg_cache, seeders, transport, result_port):
+        """get the current const_arg of the server, return (const_arg, version)
         
-        job_q = manager.get_job_q()
-        if verbose > 1:
-            print("{}: found job_q with {} jobs".format(identifier, job_q.qsize()))
-            
-        result_q = manager.get_result_q()
-        fail_q = manager.get_fail_q()
-        # deep copy const_arg from manager -> non shared object in local memory
-        const_arg = copy.deepcopy(manager.get_const_arg())
-
+        see _get_manager_objects
+        """
+        const_arg_version, const_arg_hash = copy.deepcopy(manager.get_const_arg_info())
+        if const_arg_cache is not None:
+            fname_cache = os.path.join(const_arg_cache, 'jobmanager_const_arg_{}.pickle'.format(const_arg_hash))
+        else:
+            fname_cache = None
             
-        return job_q, result_q, fail_q, const_arg
+        if (fname_cache is not None) and os.path.exists(fname_cache):
+            with open(fname_cache, 'rb') as f:
+                const_arg = pickle.load(f)
+            if verbose > 1:
+                print("{}: const_arg version {} read from cache {}".format(identifier, const_arg_version, fname_cache))
+            return const_arg, const_arg_version
+        
+        if transport['broadcast']:
+            # chunks from other clients and the server (see JobManager_Server const_arg_broadcast)
+            const_arg, seeder = _fetch_broadcast(server      = server, 
+                                                 authkey     = authkey, 
+                                                 tracker     = manager.get_const_arg_tracker(), 
+                                                 seed        = seeders is not None,
+                                                 identifier  = identifier,
+                                                 verbose     = verbose)
+            if seeder is not None:
+                seeders.append(seeder)
+        elif transport['zero_copy']:
+            # const_arg with out-of-band buffers via the direct channel
+            channel = _DirectResultChannel(address = (server, result_port), 
+                                           authkey = authkey, 
+                                           zero_copy = True)
+            const_arg = channel.get_const_arg()
+            channel.close()
+        else:
+            # deep copy const_arg from manager -> non shared object in local memory
+            const_arg = copy.deepcopy(manager.get_const_arg())
+        if fname_cache is not None:
+            # several clients on a host may fill the cache at the same time
+            fname_tmp = '{}.{}.tmp'.format(fname_cache, os.getpid())
+            with open(fname_tmp, 'wb') as f:
+                pickle.dump(const_arg, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.rename(fname_tmp, fname_cache)
+            if verbose > 1:
+                print("{}: const_arg version {} stored in cache {}".format(identifier, const_arg_version, fname_cache))
+        return const_arg, const_arg_version
         
     @staticmethod
     def func(arg, const_arg):
@@ -276,6 +529,13 @@ class JobManager_Client(object):
         time.sleep(0.1)
         return os.getpid()
     
+    # combine(acc, arg, result) -> acc folds the result of the argument arg into
+    # the accumulator acc (None for the first result) and returns the new 
+    # accumulator. Implement it as staticmethod in a subclass to reduce the results 
+    # on the client side, the server gets the accumulator and the arguments folded 
+    # into it (see JobManager_Server.process_combined_result).
+    combine = None
+    
     @staticmethod
     def _handle_unexpected_queue_error(e, verbose, identifier):
         if verbose > 0:
@@ -283,7 +543,10 @@ class JobManager_Client(object):
             traceback.print_exc()
 
     @staticmethod
-    def __worker_func(func, nice, verbose, server, port, authkey, i, manager_objects, c, m, reset_pbc, njobs):
+    def __worker_func(func, nice, verbose, server, port, authkey, i, manager_objects, c, m, reset_pbc, njobs, batch_size=1,
+                      result_batch_size=64, result_flush_interval=0.2, prefetch=0, 
+                      combine=None, combine_interval=10, combine_max_jobs=10000, const_arg_switch=None,
+                      blob_cache_dir=None, blob_cache_size=2**30):
         """
         the wrapper spawned nproc trimes calling and handling self.func
         """
@@ -291,7 +554,11 @@ class JobManager_Client(object):
         Signal_to_sys_exit(signals=[signal.SIGTERM])
         Signal_to_SIG_IGN(signals=[signal.SIGINT])
 
-        job_q, result_q, fail_q, const_arg = manager_objects 
+        job_q, result_q, fail_q, const_arg, result_port, transport, const_arg_version, blob_store = manager_objects 
+        # map the arrays shared on this host (see shared_const_arg)
+        const_arg = _load_shared_const_arg(const_arg)
+        # the blobs the arguments refer to (see BlobRef)
+        blob_cache = _BlobCache(blob_cache_dir, blob_cache_size)
         
         n = os.nice(0)
         try:
@@ -308,6 +575,78 @@ class JobManager_Client(object):
         
         tg_1 = tg_0 = tp_1 = tp_0 = tf_1 = tf_0 = 0
         
+        # reported to the server when batch_size is 'auto' (see ChunkSizer)
+        # and holding the lease of the jobs (see JobQueue), the client id has 
+        # to be unique among all hosts
+        client_id = "{}:{}".format(socket.gethostname(), os.getpid())
+        time_get = 0.
+        cnt_get = 0
+        time_per_job = None
+        time_per_request = None
+        
+        # jobs (job_id, arg) fetched from the job_q but not processed yet
+        local_args = collections.deque()
+        # the job currently being processed, None if there is none
+        job = None
+        
+        # accumulator of the combined results and the ids of the jobs
+        # folded into it (see combine)
+        acc = None
+        acc_ids = []
+        t_acc = time.time()
+        
+        # sends the results to the result_q (or directly to the server
+        # process if it provides a result port) in a background thread
+        if result_port is not None:
+            result_q = _DirectResultChannel(address   = (server, result_port),
+                                            authkey   = authkey,
+                                            zero_copy = transport['zero_copy'])
+        # serializes and compresses arguments and results 
+        # (see JobManager_Server serializer and compression)
+        if (transport['compression'] is not None) or (transport['serializer'] is not None):
+            if transport['compression'] is not None:
+                codec, level, threshold = transport['compression']
+            else:
+                codec, level, threshold = None, None, 0
+            wire_codec = _WireCodec(codec      = codec, 
+                                    level      = level, 
+                                    threshold  = threshold,
+                                    serializer = transport['serializer'])
+        else:
+            wire_codec = None
+        uploader = _ResultUploader(result_q   = result_q,
+                                   max_items  = result_batch_size,
+                                   max_delay  = result_flush_interval,
+                                   identifier = identifier,
+                                   verbose    = verbose,
+                                   wire_codec = wire_codec)
+        uploader.start()
+        
+        # fetches the next arguments in a background thread while
+        # the current ones are processed
+        if prefetch > 0:
+            fetcher = _JobFetcher(job_q      = job_q,
+                                  batch_size = batch_size,
+                                  depth      = prefetch,
+                                  njobs      = njobs,
+                                  identifier = identifier,
+                                  verbose    = verbose,
+                                  client_id  = client_id)
+            fetcher.start()
+        else:
+            fetcher = None
+            
+        # keeps the leases of the fetched jobs alive (see JobManager_Server lease_time)
+        if transport['lease_time'] is not None:
+            heartbeat = _Heartbeat(job_q      = job_q,
+                                   client_id  = client_id,
+                                   interval   = transport['lease_time'] / 3,
+                                   identifier = identifier,
+                                   verbose    = verbose)
+            heartbeat.start()
+        else:
+            heartbeat = None
+        
         # check for func definition without status members count, max_count
         #args_of_func = inspect.getfullargspec(func).args
         #if len(args_of_func) == 2:
@@ -342,29 +681,77 @@ class JobManager_Client(object):
             #    c) any queue operation (get, put) fails for what ever reason
             #    d) njobs becomes zero
             while njobs != 0:
+                # try to get new items from the job_q, if there are
+                # no more local arguments left to process
+                tg_1 = tg_0 = 0
+                if len(local_args) == 0:
+                    # prefetched by the background thread, only wait if
+                    # the fetcher did not keep up
+                    if fetcher is not None:
+                        tg_0 = time.time()
+                        chunk = fetcher.get()
+                        tg_1 = time.time()
+                        if chunk is None:
+                            # job_q.get in the fetcher thread failed -> server down?
+                            if fetcher.error is not None:
+                                JobManager_Client._handle_unexpected_queue_error(fetcher.error, verbose, identifier)
+                            # regular case, just stop working when empty job_q was found
+                            elif verbose > 1:
+                                print("{}: finds empty job queue, processed {} jobs".format(identifier, cnt))
+                            break
+                        local_args.extend(chunk)
+                    else:
+                        try:
+                            tg_0 = time.time()
+                            local_args.extend(_fetch_chunk(job_q, batch_size, njobs, client_id,
+                                                           time_per_job, time_per_request))
+                            tg_1 = time.time()
+                            time_get += tg_1 - tg_0
+                            cnt_get += 1
+                            time_per_request = time_get / cnt_get
+                        # no job for now, ask again (see JobQueue)
+                        except _JobsPending:
+                            continue
+                        # regular case, just stop working when empty job_q was found
+                        except queue.Empty:
+                            if verbose > 1:
+                                print("{}: finds empty job queue, processed {} jobs".format(identifier, cnt))
+                            break
+                        # handle SystemExit in outer try ... except
+                        except SystemExit as e:
+                            raise e
+                        # job_q.get failed -> server down?             
+                        except Exception as e: 
+                            JobManager_Client._handle_unexpected_queue_error(e, verbose, identifier)
+                            break
+                
+                job = local_args.popleft()
+                job_id, arg = job
+                if (heartbeat is not None) and heartbeat.skip(job_id):
+                    # a copy of the job has been done by another client already
+                    # (see JobManager_Server speculative_copies)
+                    job = None
+                    continue
                 njobs -= 1
-
-                # try to get an item from the job_q                
-                try:
-                    tg_0 = time.time()
-                    arg = job_q.get(block = True, timeout = 0.1)
-                    tg_1 = time.time()
-                 
-                # regular case, just stop working when empty job_q was found
-                except queue.Empty:
-                    if verbose > 1:
-                        print("{}: finds empty job queue, processed {} jobs".format(identifier, cnt))
-                    break
-                # handle SystemExit in outer try ... except
-                except SystemExit as e:
-                    raise e
-                # job_q.get failed -> server down?             
-                except Exception as e: 
-                    JobManager_Client._handle_unexpected_queue_error(e, verbose, identifier)
-                    break
+                # the argument requires a const_arg other than the initial one
+                # (see JobManager_Server.set_const_arg)
+                arg_version = None
+                if isinstance(arg, _VersionedArg):
+                    arg_version = arg.version
+                    arg = arg.arg
                 
                 # try to process the retrieved argument
                 try:
+                    # a corrupt payload or an unknown codec fails the job, not the worker
+                    if wire_codec is not None:
+                        arg = wire_codec.decode_arg(arg)
+                    if (arg_version is not None) and (arg_version != const_arg_version):
+                        # fetched once by the client for all its workers
+                        const_arg, const_arg_version = const_arg_switch.get(i, arg_version)
+                        const_arg = _load_shared_const_arg(const_arg)
+                        if verbose > 1:
+                            print("{}: switched to const_arg version {}".format(identifier, const_arg_version))
+                    arg = blob_cache.resolve(arg, blob_store)
                     tf_0 = time.time()
                     res = _func(arg, const_arg, c, m)
                     tf_1 = time.time()
@@ -390,7 +777,7 @@ class JobManager_Client(object):
                         print("        write exception to file {} ... ".format(fname), end='')
                         sys.stdout.flush()
                     with open(fname, 'w') as f:
-                        traceback.print_exception(etype=err, value=val, tb=trb, file=f)
+                        traceback.print_exception(err, val, trb, file=f)
                     if verbose > 0:
                         print("done")
                         print("        continue processing next argument.")
@@ -400,41 +787,53 @@ class JobManager_Client(object):
                         print("{}: try to send send failed arg to fail_q ...".format(identifier), end='')
                         sys.stdout.flush()
                     try:
-                        fail_q.put((arg, err.__name__, hostname), timeout=10)
+                        fail_q.put((job_id, err.__name__, hostname), timeout=10)
                     # handle SystemExit in outer try ... except                        
                     except SystemExit as e:
                         if verbose > 1:
                             print(" FAILED!")
                         raise e
                     # fail_q.put failed -> server down?             
-                    except:
+                    except Exception as e:
                         if verbose > 1:
                             print(" FAILED!")
-                        JobManager_Client._handle_unexpected_queue_error(verbose, identifier)
+                        JobManager_Client._handle_unexpected_queue_error(e, verbose, identifier)
                         break
                     else:
+                        job = None
                         if verbose > 1:
                             print(" done!")
                             
                 # processing the retrieved arguments succeeded
-                # - try to send the result back to the server                        
+                # - pass the result to the uploader which sends it back
+                #   to the server
                 else:
-                    try:
-                        tp_0 = time.time()
-                        result_q.put((arg, res))
-                        tp_1 = time.time()
-                    # handle SystemExit in outer try ... except
-                    except SystemExit as e:
-                        raise e
-                    # job_q.get failed -> server down?             
-                    except Exception as e:
-                        JobManager_Client._handle_unexpected_queue_error(e, verbose, identifier)
+                    if combine is not None:
+                        # fold the result into the accumulator, which is
+                        # sent regularly (see combine_interval)
+                        acc = combine(acc, arg, res)
+                        acc_ids.append(job_id)
+                        if (len(acc_ids) >= combine_max_jobs) or (time.time() - t_acc > combine_interval):
+                            # a tuple of job ids marks an accumulator
+                            uploader.put(tuple(acc_ids), acc)
+                            acc = None
+                            acc_ids = []
+                            t_acc = time.time()
+                    else:
+                        uploader.put(job_id, res)
+                    job = None
+                    # result_q.put in the uploader thread failed -> server down?
+                    # (the error is reported after closing the uploader)
+                    if uploader.error is not None:
                         break
                     
                 cnt += 1
                 
-                time_queue += (tg_1-tg_0 + tp_1-tp_0)
+                time_queue += (tg_1-tg_0)
                 time_calc += (tf_1-tf_0)
+                time_per_job = time_calc / cnt
+                if fetcher is not None:
+                    fetcher.time_per_job = time_per_job
                 
                 reset_pbc()
              
@@ -443,26 +842,50 @@ class JobManager_Client(object):
         # default signal handlers
         except SystemExit:
             if verbose > 0:
-                print("{}: SystemExit, quit processing, reinsert current argument".format(identifier))
-
+                print("{}: SystemExit, quit processing".format(identifier))
+        
+        # put back unprocessed jobs and send all results still buffered by 
+        # the uploader, whatever made the worker stop (SystemExit, a failing 
+        # queue operation or an unexpected exception)
+        finally:
+            # the current job (if any) and all fetched but unprocessed
+            # jobs have to go back to the job_q
+            if job is not None:
+                local_args.appendleft(job)
+            if fetcher is not None:
+                local_args.extend(fetcher.close(timeout=10))
+            if len(local_args) > 0:
+                if verbose > 0:
+                    print("{}: reinsert {} argument(s)".format(identifier, len(local_args)))
+                try:
+                    if len(local_args) == 1:
+                        job_q.put(local_args[0], timeout=10, client_id=client_id)
+                    else:
+                        job_q.put_many(list(local_args), timeout=10, client_id=client_id)
+                # job_q.put failed -> server down?             
+                except Exception as e:
+                    if verbose > 0:
+                        print("{}: failed to reinsert {} argument(s), they are lost".format(identifier, len(local_args)))
+                    JobManager_Client._handle_unexpected_queue_error(e, verbose, identifier)
+                    
+            if len(acc_ids) > 0:
+                uploader.put(tuple(acc_ids), acc)
             if verbose > 1:
-                print("{}: try to put arg back to job_q ...".format(identifier), end='')
+                print("{}: flush result buffer ...".format(identifier), end='')
                 sys.stdout.flush()
-            try:
-                job_q.put(arg, timeout=10)
-            # handle SystemExit in outer try ... except                        
-            except SystemExit as e:
-                if verbose > 1:
-                    print(" FAILED!")
-                raise e
-            # fail_q.put failed -> server down?             
-            except:
+            uploader.close(timeout=10)
+            time_queue += uploader.time_put
+            # the server releases the leases as the results arrive
+            if heartbeat is not None:
+                heartbeat.close(timeout=10)
+            if result_port is not None:
+                result_q.close()
+            if uploader.error is not None:
                 if verbose > 1:
                     print(" FAILED!")
-                JobManager_Client._handle_unexpected_queue_error(verbose, identifier)
-            else:
-                if verbose > 1:
-                    print(" done!")
+                JobManager_Client._handle_unexpected_queue_error(uploader.error, verbose, identifier)
+            elif verbose > 1:
+                print(" done!")
                 
         if verbose > 0:
             try:
@@ -470,6 +893,14 @@ class JobManager_Client(object):
                 print("{}: calculation:{:.2%} communication:{:.2%}".format(identifier, time_calc/(time_calc+time_queue), time_queue/(time_calc+time_queue)))
             except:
                 pass
+            if wire_codec is not None:
+                for line in wire_codec.statistics():
+                    print("{}: wire {}".format(identifier, line))
+            if (heartbeat is not None) and (heartbeat.num_skipped > 0):
+                print("{}: skipped {} jobs done by other clients".format(identifier, heartbeat.num_skipped))
+            if blob_cache.fetched + blob_cache.hits > 0:
+                print("{}: blobs: {} fetched from the server ({} bytes), {} found in the host cache".format(
+                      identifier, blob_cache.fetched, blob_cache.bytes_fetched, blob_cache.hits))
         if verbose > 1:
             print("{}: JobManager_Client.__worker_func at end (PID {})".format(identifier, os.getpid()))
             
@@ -504,6 +935,13 @@ class JobManager_Client(object):
         if not self.show_counter_only:
             m_set_by_function = m_progress
             
+        # new versions of the const_arg are fetched by the client for its workers
+        const_arg_switch = _ConstArgSwitch(const_arg = self.manager_objects[3],
+                                           version   = self.manager_objects[6],
+                                           fetch     = self._switch_const_arg,
+                                           nproc     = self.nproc)
+        const_arg_switch.start()
+            
         if (self.show_statusbar_for_jobs) and (self.verbose > 0):
             Progress = progress.ProgressBarCounter
         else:
@@ -535,7 +973,17 @@ class JobManager_Client(object):
                                                                 c[i],
                                                                 m_set_by_function[i],
                                                                 reset_pbc,
-                                                                self.njobs))
+                                                                self.njobs,
+                                                                self.batch_size,
+                                                                self.result_batch_size,
+                                                                self.result_flush_interval,
+                                                                self.prefetch,
+                                                                self.combine,
+                                                                self.combine_interval,
+                                                                self.combine_max_jobs,
+                                                                const_arg_switch,
+                                                                self.blob_cache_dir,
+                                                                self.blob_cache_size))
                 self.procs.append(p)
                 p.start()
                 time.sleep(0.3)
@@ -571,6 +1019,22 @@ class JobManager_Client(object):
                                         
         if self.verbose > 2:
             print("{}: progressBar context has been left".format(self._identifier))
+        
+        const_arg_switch.close(timeout=10)
+        self._switch_manager = None
+        # a later start begins with the const_arg switched to
+        job_q, result_q, fail_q, const_arg, result_port, transport, const_arg_version, blob_store = self.manager_objects
+        self.manager_objects = (job_q, result_q, fail_q, const_arg_switch.const_arg, result_port, transport, 
+                                const_arg_switch.version, blob_store)
+        # the files are removed unless other clients on the host still use them
+        for lock in self._shared_locks:
+            lock.release()
+        self._shared_locks = []
+        for seeder in self._seeders:
+            if self.verbose > 1:
+                print("{}: served {} bytes of the const_arg to other clients".format(self._identifier, seeder.bytes_served))
+            seeder.close()
+        self._seeders = []
 
 
 class JobManager_Server(object):
@@ -584,6 +1048,10 @@ class JobManager_Server(object):
         - start the JobManager_Server (start), which means to wait for incoming 
         results and to process them. Afterwards process all obtained data.
         
+    Each argument is given an integer job id (see put_arg). Only these ids
+    travel back with the results and the failed jobs, the server keeps the
+    single copy of the argument in args_dict until its result has arrived.
+    
     The default behavior of handling each incoming new result is to simply
     add the pair (arg, result) to the final_result list.
     
@@ -593,7 +1061,8 @@ class JobManager_Server(object):
     To change this behavior you may subclass the JobManager_Server
     and implement
         - an extended __init__ to change the type of the final_result attribute
-        - process_new_result
+        - process_new_result, or process_new_results to handle all results
+          received at once in bulk
         - process_final_result(self)
         
     In case of any exceptions the JobManager_Server will call process_final_result
@@ -624,13 +1093,38 @@ class JobManager_Server(object):
                   verbose=1, 
                   msg_interval=1,
                   fname_dump='auto',
-                  speed_calc_cycles=50):
+                  speed_calc_cycles=50,
+                  chunk_overhead=0.02,
+                  max_chunk_size=1000,
+                  result_port=None,
+                  max_jobs_in_memory=None,
+                  spill_dir=None,
+                  fname_journal=None,
+                  result_sink=None,
+                  result_schema=None,
+                  handler_pool=None,
+                  handler_workers=None,
+                  handler_ordered=True,
+                  result_handler=None,
+                  zero_copy=False,
+                  compression=None,
+                  compression_level=None,
+                  compression_threshold=1024,
+                  serializer=None,
+                  const_arg_broadcast=False,
+                  broadcast_chunk_size=2**22,
+                  lease_time=None,
+                  speculative_copies=0,
+                  speculative_min_age=10,
+                  retry_policy=None):
         """
         authkey [string] - authentication key used by the SyncManager. 
         Server and Client must have the same authkey.
         
         const_arg [dict] - some constant keyword arguments additionally passed to the
-        worker function (see JobManager_Client).
+        worker function (see JobManager_Client). It is identified by a version, counting 
+        from 1, and the hash of its content, which lets clients cache it. A new version 
+        can be published between rounds of jobs, see set_const_arg.
         
         port [int] - network port to use
         
@@ -650,6 +1144,109 @@ class JobManager_Server(object):
         of not successfully processed arguments, if there are any. 
         (None: do not dump, 'auto' choose filename 'YYYY_MM_DD_hh_mm_ss_fail.dump')
         
+        chunk_overhead [float] - for clients with batch_size='auto' the number of
+        arguments per request is chosen such that the communication takes at most
+        that fraction of the calculation time (see ChunkSizer)
+        
+        max_chunk_size [int] - upper limit for the number of arguments per request
+        of such clients
+        
+        result_port [int/None] - if not None, the clients send their results as pickled
+        bytes directly to the server process listening on that port (0: choose a free port)
+        instead of putting them to the result_q hosted by the SyncManager. This saves
+        two (un)pickle steps per result on the server side.
+        
+        max_jobs_in_memory [int/None] - if not None, at most that many pending jobs
+        are held in memory (in args_dict and the job_q). Further jobs are appended to
+        segment files on disk and read back in order as the jobs in memory are done
+        (see _JobSpill). If the state is dumped, the segment files are kept and
+        referenced by the dump, so that read_old_state does not load them into memory.
+        
+        spill_dir [string/None] - directory for the segment files (None: the current
+        working directory)
+        
+        fname_journal [string/None] - if not None, every argument, result and failure
+        is appended to that file as it occurs (see _Journal) and the file is synced to
+        disk regularly. So after a crash read_old_state restores the state by replaying
+        the journal. Instead of dumping the state, shutdown only appends a checkpoint
+        record. An existing journal must be read with read_old_state before new
+        jobs can be added.
+        
+        result_sink [ResultSink/None] - if not None, process_new_result puts the results
+        to that sink (e.g. PickleFileSink, NpyDirSink) instead of appending them to the
+        final_result list, so the memory used does not grow with the number of results.
+        The sink is flushed before process_final_result and closed on shutdown.
+        
+        result_schema [list/None] - if not None, the results are stored in numpy columns
+        indexed by the job id (see ResultColumns for the schema), available as 
+        result_columns, instead of being passed to the result_sink or final_result
+        (process_new_result is still called). The columns are part of the dump.
+        Accumulators of combined results (see JobManager_Client.combine) are not stored
+        in the columns, handle them in process_combined_result.
+        
+        handler_pool [None/'thread'/'process'] - None: the results received in one wakeup
+        are passed to process_new_results on the main thread. 'thread' or 'process': 
+        the batches are handled by a pool of threads or processes while the main loop
+        keeps receiving results and doing the accounting. In the thread pool the handler
+        is process_new_results, which then has to be thread safe unless handler_ordered.
+        The process pool calls result_handler(batch) (a picklable function, required),
+        which can not change the state of the server.
+        
+        handler_workers [int/None] - number of workers of the pool (None: number of CPUs)
+        
+        handler_ordered [bool] - handle the batches one after the other in the order 
+        received (by a single worker), otherwise concurrently by handler_workers workers
+        
+        result_handler [callable/None] - see handler_pool
+        
+        zero_copy [bool] - send the results and const_arg over the direct result channel
+        (requires result_port) with pickle protocol 5, where the data of numpy arrays are
+        transferred as out-of-band buffers (see _send_oob). So large arrays are sent from
+        their memory without being copied into a pickle blob, on the receiving side they 
+        are copied once (see _recv_oob). The arguments are still passed through the job_q.
+        
+        compression [string/None] - if not None, the arguments and the results are 
+        compressed with that codec ('zlib', 'bz2', 'lzma', if installed 'lz4', 'zstd')
+        when their pickled size is at least compression_threshold bytes, using the
+        compression_level (None: default of the codec). The clients learn the settings
+        from the server. The compression ratio and time are shown by show_statistics.
+        Can not be combined with zero_copy.
+        
+        serializer [Serializer/None] - converts the arguments and the results to bytes
+        in place of the default pickle, e.g. NumpySerializer() for numpy arrays or 
+        FloatTupleSerializer() for tuples of floats (see Serializer). It is sent to the 
+        clients along with the compression settings. Can not be combined with zero_copy.
+        
+        const_arg_broadcast [bool] - distribute the pickled const_arg in chunks of 
+        broadcast_chunk_size bytes, which the clients fetch from each other where 
+        possible. The server only serves chunks no client holds yet, so its upload 
+        is about the size of the const_arg, independent of the number of clients.
+        A tracker in the SyncManager process knows which client holds which chunk, 
+        each chunk is verified by its SHA-1 (see _fetch_broadcast). The clients have
+        to be able to connect to each other.
+        
+        lease_time [float/None] - if not None, a client holds the jobs it took for that
+        many seconds (see JobQueue). Its workers renew the lease by a heartbeat every 
+        lease_time/3 seconds until the results are received. The jobs of a client that 
+        died (or got disconnected) are put back to the job_q when the lease expires, 
+        so another client processes them. A result (or failure) arriving late for a job 
+        already done is dropped. The number of reassigned jobs and dropped results is 
+        shown by show_statistics.
+        
+        speculative_copies [int] - (requires lease_time) at most that many copies of a 
+        job are handed out to idle clients which find the job_q empty, if the job has 
+        been in flight for at least speculative_min_age seconds, the oldest jobs first. 
+        So the stragglers at the end of the jobs are also processed by the fast clients.
+        The first result (or failure) received counts, the clients still holding a copy 
+        skip it if they did not start it yet. show_statistics reports a lower bound of the 
+        tail time saved, the time between the result of a copy and the late result of the 
+        original (or the end of start, if it has not arrived by then).
+        
+        retry_policy [RetryPolicy/None] - if not None, a failed job is put to the job_q 
+        again after a delay, as long as the RetryPolicy permits, instead of going to the
+        fail_list for good. The waiting jobs do not block the dispatch of other jobs.
+        Retrying on another host (see RetryPolicy other_host) requires lease_time.
+        
         This init actually starts the SyncManager as a new process. As a next step
         the job_q has to be filled, see put_arg().
         """
@@ -662,6 +1259,8 @@ class JobManager_Server(object):
             print("{}: I'm the JobManager_Server main process".format(self._identifier))
         
         self.__wait_before_stop = 2
+        self.__feed_interval = 0.1  # check the job_q for refill (see args_from_iterable)
+        self.__max_messages_per_wakeup = 100  # result messages handled as one batch
         
         self.port = port
 
@@ -672,19 +1271,43 @@ class JobManager_Server(object):
             
       
         self.const_arg = const_arg
+        self.const_arg_version = 1
+        self.const_arg_hash = _content_hash(const_arg)
+        # what the SyncManager process hands out to the clients
+        self._const_arg_store = _ConstArgStore(const_arg, self.const_arg_version, self.const_arg_hash)
+        self._const_arg_store_proxy = None
         
         
         self.fname_dump = fname_dump        
         self.msg_interval = msg_interval
         self.speed_calc_cycles = speed_calc_cycles
 
-        # to do some redundant checking, might be removed
-        # the args_set holds all arguments to be processed
-        # in contrast to the job_q, an argument will only be removed
-        # from the set if it was caught by the result_q
+        # each argument gets an integer job id, the job_q holds (job_id, arg)
+        # and the clients return (job_id, result)
+        # the args_dict maps the job id to the argument for all jobs to
+        # be processed, in contrast to the job_q, a job will only be removed
+        # from the dict if its result has been received
         # so iff all results have been processed successfully,
-        # the args_set will be empty
-        self.args_set = set()
+        # the args_dict will be empty
+        self.args_dict = {}
+        
+        # see args_from_iterable
+        self._arg_iterator = None
+        self._high_water = None
+        self._low_water = None
+        self._job_buffer = None
+        
+        # pending jobs exceeding max_jobs_in_memory go to disk
+        if (max_jobs_in_memory is not None) and (max_jobs_in_memory < 1):
+            raise RuntimeError("max_jobs_in_memory must be None or >= 1")
+        self.max_jobs_in_memory = max_jobs_in_memory
+        self.spill_dir = spill_dir
+        self._spill = None
+        
+        # write-ahead journal, opened when the first record is written
+        self.fname_journal = fname_journal
+        self._journal = None
+        self._journal_replayed = False
         
         # thread safe integer values  
         self._numresults = mp.Value('i', 0)  # count the successfully processed jobs
@@ -692,12 +1315,110 @@ class JobManager_Server(object):
         
         # final result as list, other types can be achieved by subclassing 
         self.final_result = []
+        # chunks of the final_result of a dump not loaded by read_old_state
+        self._final_result_from = None
+        self.result_sink = result_sink
+        
+        # handling of the results in a pool (see __start_handler_pool)
+        if handler_pool not in [None, 'thread', 'process']:
+            raise RuntimeError("handler_pool must be None, 'thread' or 'process'")
+        if (handler_pool == 'process') and (result_handler is None):
+            raise RuntimeError("handler_pool 'process' requires a result_handler")
+        self.handler_pool = handler_pool
+        self.handler_workers = handler_workers
+        self.handler_ordered = handler_ordered
+        self.result_handler = result_handler
+        self._handler_executor = None
+        self._handler_futures = collections.deque()
+        self._handler_max_pending = 0
+        if result_schema is not None:
+            self.result_columns = ResultColumns(result_schema)
+        else:
+            self.result_columns = None
         
+        self.job_q = JobQueue()   # queue holding args to process (lives in the SyncManager, see __start_SyncManager)
         # NOTE: it only works using multiprocessing.Queue()
         # the Queue class from the module queue does NOT work  
-        self.job_q = myQueue()    # queue holding args to process
         self.result_q = myQueue() # queue holding returned results
         self.fail_q = myQueue()   # queue holding args where processing failed
+        # the items of the fail_q taken by the server (see __collect_failures)
+        self.fail_list = []
+        
+        # sizes the chunks of clients with batch_size='auto', lives next to
+        # the job_q in the SyncManager process
+        self.chunk_sizer = ChunkSizer(overhead=chunk_overhead, max_chunk_size=max_chunk_size)
+        
+        # the direct result channel, see __start_result_listener
+        self.result_port = result_port
+        if zero_copy:
+            if result_port is None:
+                raise RuntimeError("zero_copy requires the direct result channel (result_port)")
+            if pickle.HIGHEST_PROTOCOL < 5:
+                raise RuntimeError("zero_copy requires pickle protocol 5 (python >= 3.8)")
+        self.zero_copy = zero_copy
+        
+        if (serializer is not None) and not isinstance(serializer, Serializer):
+            raise RuntimeError("serializer must be an instance of Serializer")
+        if (compression is not None) or (serializer is not None):
+            if zero_copy:
+                raise RuntimeError("zero_copy can not be combined with compression or a serializer")
+            self._wire_codec = _WireCodec(codec      = compression, 
+                                          level      = compression_level, 
+                                          threshold  = compression_threshold,
+                                          serializer = serializer)
+        else:
+            self._wire_codec = None
+        if compression is not None:
+            self._compression = (compression, compression_level, compression_threshold)
+        else:
+            self._compression = None
+        self.serializer = serializer
+        
+        self.const_arg_broadcast = const_arg_broadcast
+        self.broadcast_chunk_size = broadcast_chunk_size
+        
+        if (lease_time is not None) and (lease_time <= 0):
+            raise RuntimeError("lease_time must be None or > 0")
+        self.lease_time = lease_time
+        # results and failures of jobs done already (see lease_time)
+        self._num_duplicates = 0
+        self._fail_ids = set()
+        
+        if speculative_copies < 0:
+            raise RuntimeError("speculative_copies must be >= 0")
+        if (speculative_copies > 0) and (lease_time is None):
+            raise RuntimeError("speculative_copies requires lease_time")
+        self.speculative_copies = speculative_copies
+        self.speculative_min_age = speculative_min_age
+        # job_id -> time the result of a copy was received, the original is still out
+        self._copies_won = {}
+        self._num_copies_won = 0
+        self._num_originals_out = 0
+        self._tail_saved = 0.
+        
+        if (retry_policy is not None) and not isinstance(retry_policy, RetryPolicy):
+            raise RuntimeError("retry_policy must be an instance of RetryPolicy")
+        if (retry_policy is not None) and retry_policy.other_host and (lease_time is None):
+            raise RuntimeError("retry_policy with other_host requires lease_time")
+        self.retry_policy = retry_policy
+        # job_id -> number of failures, for the jobs retried
+        self._num_failures = {}
+        # job_id -> hosts the job failed on (see RetryPolicy other_host)
+        self._failed_hosts = {}
+        # heap of (time due, job_id) of the jobs waiting for their retry
+        self._retries = []
+        self._num_retries = 0
+        self._num_jobs_retried = 0
+        self._broadcast_seeder = None
+        self._broadcast_tracker = None
+        self._broadcast_tracker_proxy = None
+        
+        # large inputs referred to by the arguments, see put_blob
+        self._blob_store = _BlobStore()
+        self._blob_store_proxy = None
+        self._result_listener = None
+        self._result_accept_thread = None
+        self._result_inbox = queue.Queue()  # raw bytes received by the listener
         self.manager = None
         self.hostname = socket.gethostname()
         
@@ -708,6 +1429,16 @@ class JobManager_Server(object):
         manager_proc = self.manager._process
         manager_identifier = progress.get_identifier(name='SyncManager')
         
+        # the job_q lives in the SyncManager process, keep a local copy
+        # of the remaining arguments
+        if isinstance(self.job_q, BaseProxy):
+            try:
+                self.job_q = self.job_q._getvalue()
+            except:
+                if self.verbose > 0:
+                    print("{}: could not copy job_q from SyncManager".format(self._identifier))
+                self.job_q = JobQueue()
+        
         # stop SyncManager
         self.manager.shutdown()
         
@@ -716,9 +1447,15 @@ class JobManager_Server(object):
                                   timeout=2, 
                                   verbose=self.verbose, 
                                   auto_kill_on_last_resort=True)
+        self.manager = None
+        self._const_arg_store_proxy = None
+        self._blob_store_proxy = None
 
     def __check_bind(self):
         s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        # same as the listener of the SyncManager, otherwise the test fails
+        # for connections of a previous run still in TIME_WAIT state
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         try:
             s.bind((self.hostname, self.port))
         except:
@@ -732,11 +1469,36 @@ class JobManager_Server(object):
         class JobQueueManager(SyncManager):
             pass
 
+        # the job_q might have been replaced when reading an old state
+        self.job_q.chunk_sizer = self.chunk_sizer
+        self.job_q.lease_time = self.lease_time
+        self.job_q.speculative_copies = self.speculative_copies
+        self.job_q.speculative_min_age = self.speculative_min_age
+        
         # make job_q, result_q, fail_q, const_arg available via network
         JobQueueManager.register('get_job_q', callable=lambda: self.job_q)
         JobQueueManager.register('get_result_q', callable=lambda: self.result_q)
         JobQueueManager.register('get_fail_q', callable=lambda: self.fail_q)
-        JobQueueManager.register('get_const_arg', callable=lambda: self.const_arg)
+        # exposed given explicitly, otherwise the manager inspects all attributes
+        # of const_arg, which fails for some (e.g. ndarray.mT of a 1d array), the 
+        # clients get a copy anyway
+        JobQueueManager.register('get_const_arg', callable=lambda: self._const_arg_store.const_arg, exposed=('__str__', ))
+        JobQueueManager.register('get_const_arg_info', callable=lambda: self._const_arg_store.info())
+        JobQueueManager.register('get_const_arg_store', callable=lambda: self._const_arg_store)
+        # the seeder of the server has to be listening before the SyncManager process is
+        # started, the tracker in the SyncManager process needs its port
+        self.__start_broadcast()
+        JobQueueManager.register('get_const_arg_tracker', callable=lambda: self._broadcast_tracker)
+        JobQueueManager.register('get_blob_store', callable=lambda: self._blob_store)
+        # the listener has to be set up before the SyncManager process is
+        # started, otherwise the manager would not know the actual port
+        self.__start_result_listener()
+        JobQueueManager.register('get_result_port', callable=lambda: self._result_address_port)
+        JobQueueManager.register('get_transport', callable=lambda: {'zero_copy'   : self.zero_copy,
+                                                                    'compression' : self._compression,
+                                                                    'serializer'  : self.serializer,
+                                                                    'broadcast'   : self.const_arg_broadcast,
+                                                                    'lease_time'  : self.lease_time})
     
         address=('', self.port)   #ip='' means local
         authkey=self.authkey
@@ -768,8 +1530,131 @@ class JobManager_Server(object):
                                                                   self.hostname, 
                                                                   self.port,  
                                                                   authkey))
+            
+        # from now on the job_q copied to the SyncManager process is the
+        # one to use, also for the server process
+        self.job_q = self.manager.get_job_q()
+        self._const_arg_store_proxy = self.manager.get_const_arg_store()
+        # the blobs put so far were copied to the SyncManager process as well
+        self._blob_store_proxy = self.manager.get_blob_store()
+        self._blob_store = _BlobStore()
+        if self._broadcast_tracker is not None:
+            self._broadcast_tracker_proxy = self.manager.get_const_arg_tracker()
         return True
     
+    def __start_broadcast(self):
+        """serve the chunks of the pickled const_arg (see const_arg_broadcast)"""
+        if (not self.const_arg_broadcast) or (self._broadcast_seeder is not None):
+            return
+        self._broadcast_seeder = _BroadcastSeeder(authkey    = self.authkey, 
+                                                  data       = pickle.dumps(self.const_arg, protocol=pickle.HIGHEST_PROTOCOL),
+                                                  chunk_size = self.broadcast_chunk_size)
+        self._broadcast_tracker = _BroadcastTracker(self._broadcast_seeder.manifest())
+        if self.verbose > 1:
+            print("{}: broadcast const_arg ({} bytes in {} chunks) from port {}".format(
+                  self._identifier, self._broadcast_seeder.size, self._broadcast_seeder.num_chunks, self._broadcast_seeder.port))
+    
+    def __start_result_listener(self):
+        """open the listener for the direct result channel (if requested)
+        
+        accepting connections and receiving the data is done by background
+        threads of the server process, see start
+        """
+        self._result_address_port = None
+        if self.result_port is None:
+            return
+        try:
+            self._result_listener = mp_connection.Listener(address=('', self.result_port), 
+                                                           authkey=bytes(self.authkey))
+        except OSError:
+            print("{}: can not listen for results on port {}".format(progress.ESC_RED + self._identifier, self.result_port))
+            raise
+        self._result_address_port = self._result_listener.address[1]
+        if self.verbose > 1:
+            print("{}: listen for results on port {}".format(self._identifier, self._result_address_port))
+            
+    def __stop_result_listener(self):
+        if self._result_listener is not None:
+            self._result_listener.close()
+            self._result_listener = None
+            
+    def __accept_result_connections(self):
+        """runs as thread, receive from each connection in a new thread"""
+        listener = self._result_listener
+        while True:
+            try:
+                conn = listener.accept()
+            except mp_connection.AuthenticationError:
+                if self.verbose > 0:
+                    print("{}: result connection with wrong authkey rejected".format(self._identifier))
+                continue
+            # listener was closed
+            except (OSError, EOFError):
+                return
+            t = threading.Thread(target=self.__receive_results, args=(conn,))
+            t.daemon = True
+            t.start()
+            
+    def __receive_results(self, conn):
+        """runs as thread, pass the raw bytes to the main loop in start
+        
+        With zero_copy the pickled data and the out-of-band buffers are passed
+        on, the const_arg is sent on request.
+        """
+        try:
+            while True:
+                if not self.zero_copy:
+                    self._result_inbox.put(conn.recv_bytes())
+                    continue
+                kind, data, buffers = _recv_oob(conn)
+                if kind == _OOB_CONST_ARG:
+                    _send_oob(conn, self.const_arg, kind=_OOB_CONST_ARG)
+                else:
+                    self._result_inbox.put((data, buffers))
+        # client closed the connection 
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+            
+    def __get_results(self, timeout):
+        """get a list of (job_id, result) pairs, raise queue.Empty after timeout
+        
+        After the first message has arrived, the messages already waiting are 
+        taken as well (up to __max_messages_per_wakeup), so the results of 
+        several uploads are handled together.
+        """
+        results = self.__get_result_message(block=True, timeout=timeout)
+        for i in range(self.__max_messages_per_wakeup - 1):
+            try:
+                results += self.__get_result_message(block=False)
+            except queue.Empty:
+                break
+        return results
+        
+    def __get_result_message(self, block, timeout=None):
+        """get the list of (job_id, result) pairs of a single upload"""
+        if self._result_listener is not None:
+            raw = self._result_inbox.get(block=block, timeout=timeout)
+            if isinstance(raw, tuple):
+                # the numpy arrays of the results use the received buffers
+                data, buffers = raw
+                results = pickle.loads(data, buffers=buffers)
+            elif self._wire_codec is not None:
+                results = self._wire_codec.loads_results(raw)
+            else:
+                results = pickle.loads(raw)
+        else:
+            results = self.result_q.get(block=block, timeout=timeout)
+            # encoded by the _WireCodec of the client
+            if isinstance(results, bytes):
+                results = self._wire_codec.loads_results(results)
+        # the clients send lists of (job_id, result) pairs
+        # (see _ResultUploader), a single pair is accepted as well
+        if not isinstance(results, list):
+            results = [results]
+        return results
+
     def __restart_SyncManager(self):
         self.__stop_SyncManager()
         if not self.__start_SyncManager():
@@ -818,13 +1703,26 @@ class JobManager_Server(object):
         """
         # will only be False when _shutdown was started in subprocess
         
+        self.__stop_handler_pool()
+        if self.result_sink is not None:
+            self.result_sink.flush()
         # do user defined final processing
         self.process_final_result()
         if self.verbose > 1:
             print("{}: process_final_result done!".format(self._identifier))
+        if self.result_sink is not None:
+            self.result_sink.close()
         
-        # print(self.fname_dump)
-        if self.fname_dump is not None:
+        dumped = False
+        if self.fname_journal is not None:
+            # the journal holds the state already, just mark the consistent end
+            self.__collect_failures()
+            self.__journal_append(('checkpoint', self.numjobs, self.numresults, len(self.fail_list)))
+            self._journal.close()
+            self._journal = None
+            if self.verbose > 0:
+                print("{}: checkpoint written to journal '{}'".format(self._identifier, self.fname_journal))
+        elif self.fname_dump is not None:
             if self.fname_dump == 'auto':
                 fname = "{}_{}.dump".format(self.authkey.decode('utf8'), getDateForFileName(includePID=False))
             else:
@@ -832,8 +1730,13 @@ class JobManager_Server(object):
 
             if self.verbose > 0:
                 print("{}: dump current state to '{}'".format(self._identifier, fname))    
-            with open(fname, 'wb') as f:
+            # the old dump might be read while writing the new one (see
+            # read_old_state with load_final_result=False)
+            fname_tmp = fname + '.tmp'
+            with open(fname_tmp, 'wb') as f:
                 self.__dump(f)
+            os.rename(fname_tmp, fname)
+            dumped = True
 
             if self.verbose > 1:
                 print("{}:dump state done!".format(self._identifier))
@@ -848,9 +1751,20 @@ class JobManager_Server(object):
         
         self.show_statistics()
         
+        if self._spill is not None:
+            if dumped:
+                # the new dump replaces the one the spill might have been 
+                # restored from
+                self._spill.release_loaded()
+            # the dump refers to the segment files of the spilled jobs
+            self._spill.close(remove = (not dumped) or (len(self._spill) == 0))
+        
         self.__stop_SyncManager()
         if self.verbose > 1:
             print("{}: SyncManager stop done!".format(self._identifier))
+        self.__stop_result_listener()
+        if self._broadcast_seeder is not None:
+            self._broadcast_seeder.close()
         
         
         print("{}: JobManager_Server was successfully shut down".format(self._identifier))
@@ -859,7 +1773,7 @@ class JobManager_Server(object):
         if self.verbose > 0:
             all_jobs = self.numjobs
             succeeded = self.numresults
-            failed = self.fail_q.qsize()
+            failed = len(self.fail_list) + self.fail_q.qsize()
             all_processed = succeeded + failed
             
             id  = self._identifier + ": "
@@ -873,70 +1787,235 @@ class JobManager_Server(object):
             print("{}    failed    : {}".format(id2, failed))
             
             all_not_processed = all_jobs - all_processed
-            not_queried = self.job_q.qsize()
+            num_spilled = self.__num_spilled()
+            not_queried = self.job_q.qsize() + num_spilled
             queried_but_not_processed = all_not_processed - not_queried  
             
             print("{}  not processed     : {}".format(id2, all_not_processed))
             print("{}    queried         : {}".format(id2, queried_but_not_processed))
             print("{}    not queried yet : {}".format(id2, not_queried))
-            print("{}len(args_set) : {}".format(id2, len(self.args_set)))
-            if (all_not_processed + failed) != len(self.args_set):
-                raise RuntimeWarning("'all_not_processed != len(self.args_set)' something is inconsistent!")
+            print("{}len(args_dict) : {}".format(id2, len(self.args_dict)))
+            if num_spilled > 0:
+                print("{}spilled to disk : {}".format(id2, num_spilled))
+            if self._arg_iterator is not None:
+                print("{}more arguments left in iterable (not part of the dump)".format(id2))
+            if self._wire_codec is not None:
+                for line in self._wire_codec.statistics():
+                    print("{}wire {}".format(id2, line))
+            if self.lease_time is not None:
+                num_leased, num_reassigned = self.job_q.lease_info()
+                print("{}leases : {} jobs held by clients, {} reassigned, {} late results dropped".format(
+                      id2, num_leased, num_reassigned, self._num_duplicates))
+            if self.retry_policy is not None:
+                print("{}retries : {} retries of {} jobs, {} waiting".format(
+                      id2, self._num_retries, self._num_jobs_retried, len(self._retries)))
+            if self.speculative_copies > 0:
+                print("{}speculation : {} copies handed out, {} finished first, tail time saved >= {:.1f}s "
+                      "({} originals not finished by the end)".format(
+                      id2, self.job_q.speculation_info(), self._num_copies_won, 
+                      self._tail_saved, self._num_originals_out))
+            if (self._broadcast_seeder is not None) and (self._broadcast_seeder.size > 0):
+                print("{}const_arg broadcast : served {} bytes ({:.2f} times its size)".format(
+                      id2, self._broadcast_seeder.bytes_served, 
+                      self._broadcast_seeder.bytes_served / self._broadcast_seeder.size))
+            if (all_not_processed + failed) != len(self.args_dict) + num_spilled:
+                raise RuntimeWarning("'all_not_processed != len(self.args_dict)' something is inconsistent!")
             
 
     @staticmethod
-    def static_load(f):
+    def static_load(f, load_final_result=True):
+        """read the state dumped to the file object f
+        
+        Returns a dict with the keys 'numjobs', 'numresults', 'final_result',
+        'args_dict', 'fail_list', 'fail_ids', 'fail_q', 'job_q' and 'spill'.
+        
+        In the chunked dump format (see _write_dump) the pending arguments are
+        loaded chunk by chunk. If load_final_result is False, the final_result 
+        is not read at all ('final_result' is None), its chunks are given 
+        by 'final_result_chunks' (see iter_final_result). Dumps of the former
+        sequential format are read entirely (see convert_dump).
+        """
+        index = _read_dump_index(f)
+        if index is None:
+            return JobManager_Server._static_load_sequential(f)
+        
+        sections = index['sections']
         data = {}
-        data['numjobs'] = pickle.load(f)
-#         print(data['numjobs'])
+        data['numjobs'] = index['numjobs']
+        data['numresults'] = index['numresults']
+        data['final_result_chunks'] = sections['final_result']
+        data['final_result_is_list'] = index['final_result_is_list']
+        if not load_final_result:
+            data['final_result'] = None
+        elif index['final_result_is_list']:
+            data['final_result'] = list(_read_dump_chunks(f, sections['final_result']))
+        else:
+            offset, n = sections['final_result'][0]
+            f.seek(offset)
+            data['final_result'] = pickle.loads(_read_frame(f))
         
-        data['numresults'] = pickle.load(f)
-#         print(data['numresults'])
+        fail_list = list(_read_dump_chunks(f, sections['fail_list']))
+        data['fail_ids'] = {fail_item[0] for fail_item in fail_list}
         
-        data['final_result'] = pickle.load(f)
+        # the args are dumped sorted by job id
+        data['args_dict'] = {}
+        pending = collections.deque()
+        for offset, n in sections['args']:
+            chunk = list(_read_dump_chunks(f, [(offset, n)]))
+            data['args_dict'].update(chunk)
+            pending.extend([item for item in chunk if item[0] not in data['fail_ids']])
         
-        data['args_set'] = pickle.load(f)
-#         print(len(data['args_set']))
+        JobManager_Server._static_load_finish(data, fail_list, pending)
+        data['spill'] = index['spill']
+        return data
+    
+    @staticmethod
+    def _static_load_sequential(f):
+        """read a dump of the former format, sequential pickles of the parts of the state"""
+        data = {}
+        data['numjobs'] = pickle.load(f)
+        data['numresults'] = pickle.load(f)
+        data['final_result'] = pickle.load(f)
+        data['final_result_chunks'] = None
+        data['final_result_is_list'] = isinstance(data['final_result'], list)
+        data['args_dict'] = pickle.load(f)
         
         fail_list = pickle.load(f)
-        data['fail_set'] = {fail_item[0] for fail_item in fail_list}
         
-        data['fail_q'] = myQueue()
-        data['job_q'] = myQueue()
+        if isinstance(data['args_dict'], set):
+            # dump written before job ids were introduced, it holds the
+            # set of arguments and the fail_list refers to the arguments
+            # -> assign new ids (the arguments are hashable in that case)
+            args_set = data['args_dict']
+            data['args_dict'] = dict(enumerate(args_set))
+            arg_to_id = {a: job_id for job_id, a in data['args_dict'].items()}
+            fail_list = [(arg_to_id[fail_item[0]],) + tuple(fail_item[1:]) for fail_item in fail_list]
+        
+        data['fail_ids'] = {fail_item[0] for fail_item in fail_list}
+        pending = [(job_id, a) for job_id, a in sorted(data['args_dict'].items()) 
+                                   if job_id not in data['fail_ids']]
+        JobManager_Server._static_load_finish(data, fail_list, pending)
         
-        for fail_item in fail_list:
-            data['fail_q'].put_nowait(fail_item)
-        for arg in (data['args_set'] - data['fail_set']):
-            data['job_q'].put_nowait(arg)
+        # state of the jobs spilled to disk (see _JobSpill), 
+        # not present in older dumps
+        try:
+            data['spill'] = pickle.load(f)
+        except EOFError:
+            data['spill'] = None
 
         return data
+    
+    @staticmethod
+    def _static_load_finish(data, fail_list, pending):
+        data['fail_list'] = fail_list
+        data['fail_q'] = myQueue()
+        data['fail_q'].put_many(fail_list)
+        data['job_q'] = JobQueue(pending)
+        
+    @staticmethod
+    def iter_final_result(fname_dump):
+        """yield the items of the final_result list of the dump fname_dump one by one
+        
+        Only a single chunk is held in memory at a time (see static_load). For
+        dumps of the former sequential format the whole final_result is loaded.
+        """
+        with open(fname_dump, 'rb') as f:
+            index = _read_dump_index(f)
+            if index is None:
+                pickle.load(f)
+                pickle.load(f)
+                final_result = pickle.load(f)
+                for item in final_result:
+                    yield item
+                return
+            if not index['final_result_is_list']:
+                raise RuntimeError("final_result of dump '{}' is not a list".format(fname_dump))
+            for item in _read_dump_chunks(f, index['sections']['final_result']):
+                yield item
+    
+    @staticmethod
+    def convert_dump(fname_old, fname_new=None):
+        """convert the dump fname_old to the chunked format and write it to fname_new 
+        (default: replace fname_old)
+        
+        Dumps of the former sequential format (also with a set of arguments 
+        instead of job ids) as well as chunked dumps are accepted.
+        """
+        if fname_new is None:
+            fname_new = fname_old
+        with open(fname_old, 'rb') as f:
+            data = JobManager_Server.static_load(f)
+        # the items of the fail_q are part of the fail_list, the fail_q
+        # is not read, so do not wait for its feeder thread at exit
+        data['fail_q'].cancel_join_thread()
+        fname_tmp = fname_new + '.tmp'
+        with open(fname_tmp, 'wb') as f:
+            _write_dump(f, 
+                        numjobs      = data['numjobs'], 
+                        numresults   = data['numresults'], 
+                        final_result = data['final_result'], 
+                        args_items   = sorted(data['args_dict'].items()), 
+                        fail_list    = data['fail_list'], 
+                        spill_state  = data['spill'])
+        os.rename(fname_tmp, fname_new)
 
-    def __load(self, f):
-        data = JobManager_Server.static_load(f)
-        for key in ['numjobs', 'numresults', 'final_result',
-                    'args_set', 'fail_q','job_q']:
+    def __load(self, f, load_final_result=True):
+        data = JobManager_Server.static_load(f, load_final_result=load_final_result)
+        for key in ['numjobs', 'numresults', 'args_dict', 'fail_q','job_q']:
             self.__setattr__(key, data[key])
+        self.job_q = JobQueue([self.__encode_job(job) for job in self.job_q._items])
+        if isinstance(data['final_result'], ResultColumns):
+            self.result_columns = data['final_result']
+        elif data['final_result'] is not None:
+            self.final_result = data['final_result']
+        else:
+            # the results of the dump are copied to the next dump (see __dump)
+            self._final_result_from = (f.name, data['final_result_chunks'])
+        if data['spill'] is not None:
+            self._spill = _JobSpill(directory=self.spill_dir, state=data['spill'])
         
     def __dump(self, f):
-        pickle.dump(self.numjobs, f, protocol=pickle.HIGHEST_PROTOCOL)
-        pickle.dump(self.numresults, f, protocol=pickle.HIGHEST_PROTOCOL)
-        pickle.dump(self.final_result, f, protocol=pickle.HIGHEST_PROTOCOL)
-        pickle.dump(self.args_set, f, protocol=pickle.HIGHEST_PROTOCOL)
-        fail_list = []
+        fail_list = list(self.fail_list)
         try:
             while True:
                 fail_list.append(self.fail_q.get_nowait())
         except queue.Empty:
             pass
-        pickle.dump(fail_list, f, protocol=pickle.HIGHEST_PROTOCOL)
+        if self.__num_spilled() > 0:
+            spill_state = self._spill.get_state()
+        else:
+            spill_state = None
+        # the result columns take the place of the final_result
+        if self.result_columns is not None:
+            final_result = self.result_columns
+        else:
+            final_result = self.final_result
+        _write_dump(f, 
+                    numjobs           = self.numjobs, 
+                    numresults        = self.numresults, 
+                    final_result      = final_result, 
+                    args_items        = sorted(self.args_dict.items()), 
+                    fail_list         = fail_list, 
+                    spill_state       = spill_state,
+                    final_result_from = self._final_result_from)
         
-#         print('numjobs', self.numjobs)
-#         print('numresults', self.numresults)
-#         print('final_result', self.final_result)
-#         print('args_set', self.args_set)
-#         print('fail_list', fail_list)
+    def read_old_state(self, fname_dump=None, load_final_result=True):
+        """restore the state from the dump fname_dump (default: self.fname_dump) or,
+        if the server has a journal (see fname_journal), by replaying the journal
         
-    def read_old_state(self, fname_dump=None):
+        load_final_result [bool] - if False, the final_result of the dump is not 
+        loaded (fast resume). The final_result starts empty and the results of the
+        dump are copied to the next dump as they are (see static_load). Requires 
+        a dump in the chunked format with a final_result list.
+        """
+        if self.fname_journal is not None:
+            if not os.path.isfile(self.fname_journal):
+                raise RuntimeError("journal '{}' to read old state from not found".format(self.fname_journal))
+            if self.verbose > 0:
+                print("{}: replay journal '{}'".format(self._identifier, self.fname_journal))
+            self.__replay_journal()
+            self.show_statistics()
+            return
         
         if fname_dump == None:
             fname_dump = self.fname_dump
@@ -949,67 +2028,484 @@ class JobManager_Server(object):
         if self.verbose > 0:
             print("{}: load state from file '{}'".format(self._identifier, fname_dump))
         
+        if not load_final_result:
+            with open(fname_dump, 'rb') as f:
+                index = _read_dump_index(f)
+            if (index is None) or (not index['final_result_is_list']):
+                raise RuntimeError("can not skip the final_result of '{}', "
+                                   "the dump has to be converted first (see convert_dump)".format(fname_dump))
+        
         with open(fname_dump, 'rb') as f:
-            self.__load(f)
+            self.__load(f, load_final_result=load_final_result)
         
         self.show_statistics()
             
+    def set_const_arg(self, const_arg):
+        """publish const_arg as the next version of the const_arg
+        
+        Meant for iterative campaigns, where the jobs of a round depend on the
+        results of the previous one. Call it between rounds, i.e. when start has
+        returned and before the arguments of the next round are added, then call
+        start again. The SyncManager keeps running. The arguments added from now
+        on carry the new version, clients still connected load it when they get
+        such an argument, new clients get it right away (from their const_arg_cache 
+        if the hash is found there).
+        """
+        if self.job_q.qsize() + self.__num_spilled() > 0:
+            raise RuntimeError("the const_arg can not be changed while jobs are waiting in the job_q")
+        self.const_arg = const_arg
+        self.const_arg_version += 1
+        self.const_arg_hash = _content_hash(const_arg)
+        self._const_arg_store.set(const_arg, self.const_arg_version, self.const_arg_hash)
+        if self._const_arg_store_proxy is not None:
+            self._const_arg_store_proxy.set(const_arg, self.const_arg_version, self.const_arg_hash)
+        if self._broadcast_seeder is not None:
+            self._broadcast_seeder.reset(pickle.dumps(const_arg, protocol=pickle.HIGHEST_PROTOCOL))
+            self._broadcast_tracker.reset(self._broadcast_seeder.manifest())
+            if self._broadcast_tracker_proxy is not None:
+                self._broadcast_tracker_proxy.reset(self._broadcast_seeder.manifest())
+        if self.verbose > 0:
+            print("{}: published const_arg version {} (hash {})".format(self._identifier, self.const_arg_version, self.const_arg_hash))
+        
+    def __encode_job(self, job):
+        """the (job_id, arg) pair as put to the job_q"""
+        if self._wire_codec is not None:
+            job = self._wire_codec.encode_job(job)
+        if self.const_arg_version > 1:
+            job_id, arg = job
+            job = (job_id, _VersionedArg(self.const_arg_version, arg))
+        return job
+            
+    def put_blob(self, obj):
+        """store obj, a large input shared by some of the arguments, and return 
+        the BlobRef to be used in these arguments in place of obj
+        
+        The clients fetch the blob once per host, when the first argument referring 
+        to it is processed there, and keep it in their host-local cache (see 
+        JobManager_Client blob_cache_size). The worker function gets the arguments 
+        with the references replaced by the objects, numpy arrays are mapped read-only
+        from the cache. References are resolved in the argument itself and within 
+        tuples and dicts.
+        
+        Putting the same object again returns the same reference. The blobs are not
+        part of the dump.
+        """
+        data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+        ref = BlobRef(hashlib.sha1(data).hexdigest())
+        if self._blob_store_proxy is not None:
+            self._blob_store_proxy.put(ref.hash, data)
+        else:
+            self._blob_store.put(ref.hash, data)
+        return ref
+            
     def put_arg(self, a):
         """add argument a to the job_q
-        """
-        if (not hasattr(a, '__hash__')) or (a.__hash__ == None):
-            # try to add hashability
-            if isinstance(a, dict):
-                a = hashDict(a)
-            elif isinstance(a, np.ndarray):
-                a = hashableCopyOfNumpyArray(a)
-            else:
-                raise AttributeError("'{}' is not hashable".format(type(a)))
         
-        self.args_set.add(copy.copy(a))
-        self.job_q.put(copy.copy(a))
+        The argument gets the next job id, which is the number of jobs
+        added so far. If max_jobs_in_memory pending jobs are held in memory
+        the job is spilled to disk.
         
+        The argument does not need to be hashable and is passed on as it is,
+        dicts and numpy arrays are no longer converted to hashDict and 
+        hashableCopyOfNumpyArray.
+        """
+        a = copy.copy(a)
         with self._numjobs.get_lock():
+            job_id = self._numjobs.value
             self._numjobs.value += 1
         
+        if self.fname_journal is not None:
+            self.__journal_append(('arg', job_id, a))
+        self.__add_job(job_id, a)
+        
+    def __add_job(self, job_id, a):
+        """put the job to args_dict and the job_q, or to disk (see max_jobs_in_memory)"""
+        # once jobs have been spilled, all further jobs go to disk as
+        # well to keep the order
+        if ( (self.__num_spilled() > 0) or 
+             ((self.max_jobs_in_memory is not None) and (self.__num_in_memory() >= self.max_jobs_in_memory)) ):
+            if self._spill is None:
+                self._spill = _JobSpill(directory=self.spill_dir)
+                if self.verbose > 1:
+                    print("{}: more than {} pending jobs, spill jobs to disk".format(self._identifier, self.max_jobs_in_memory))
+            self._spill.append((job_id, a))
+            return
+            
+        self.args_dict[job_id] = a
+        job = self.__encode_job((job_id, a))
+        # collected by __feed_job_q to be put to the job_q at once
+        if self._job_buffer is not None:
+            self._job_buffer.append(job)
+        else:
+            self.job_q.put(job)
+        
     def args_from_list(self, args):
         """serialize a list of arguments to the job_q
         """
         for a in args:
             self.put_arg(a)
-
-    def process_new_result(self, arg, result):
-        """Will be called when the result_q has data available.      
-        result is the computed result to the argument arg.
+            
+    def args_from_iterable(self, iterable, high_water=10000, low_water=None):
+        """lazily take the arguments from iterable (e.g. a generator)
         
-        Should be overwritten by subclassing!
-        """
-        self.final_result.append((arg, result))
-    
-    def process_final_result(self):
-        """to implement user defined final processing"""
-        pass
-
-    def start(self):
+        Only high_water arguments are put to the job_q (using put_arg) right
+        away. While the server is running (see start) the job_q is refilled
+        up to high_water whenever it holds at most low_water arguments
+        (default high_water // 2), until the iterable is exhausted.
+        So the total number of jobs (numjobs) grows while running.
+        
+        Note that arguments not taken from the iterable yet are not part 
+        of the dump.
         """
-        starts to loop over incoming results
+        if self._arg_iterator is not None:
+            raise RuntimeError("there is already an iterable providing arguments")
+        if low_water is None:
+            low_water = high_water // 2
+        if not (0 <= low_water < high_water):
+            raise RuntimeError("Invalid water marks, 0 <= low_water < high_water is required")
         
-        When finished, or on exception call stop() afterwards to shut down gracefully.
+        self._arg_iterator = iter(iterable)
+        self._high_water = high_water
+        self._low_water = low_water
+        self.__feed_job_q()
+        
+    def __journal_append(self, record):
+        if self._journal is None:
+            if ( (not self._journal_replayed) and os.path.isfile(self.fname_journal) and 
+                 (os.path.getsize(self.fname_journal) > 0) ):
+                raise RuntimeError("journal '{}' exists, use read_old_state to continue or remove it".format(self.fname_journal))
+            self._journal = _Journal(self.fname_journal)
+        self._journal.append(record)
+        
+    def __replay_journal(self):
+        """restore args_dict, final_result and the failures from the journal
+        
+        The results are passed to process_new_result in the order they had 
+        been received. Only the arguments of jobs done are kept in memory until 
+        their result is replayed, pending jobs are added as by put_arg
+        (so they can go to disk, see max_jobs_in_memory).
         """
+        # first pass: which jobs are done or failed
+        done_ids = set()
+        fail_ids = set()
+        for record in _Journal.read(self.fname_journal):
+            if record[0] == 'result':
+                done_ids.add(record[1])
+            elif record[0] == 'combined':
+                done_ids.update(record[1])
+            elif record[0] == 'fail':
+                fail_ids.add(record[1])
+                
+        numjobs = 0
+        numresults = 0
+        awaiting_result = {}
+        for record in _Journal.read(self.fname_journal):
+            kind = record[0]
+            if kind == 'arg':
+                job_id, a = record[1:]
+                numjobs = max(numjobs, job_id + 1)
+                if job_id in done_ids:
+                    awaiting_result[job_id] = a
+                elif job_id in fail_ids:
+                    # failed jobs are not put to the job_q again
+                    self.args_dict[job_id] = a
+                else:
+                    self.__add_job(job_id, a)
+            elif kind == 'result':
+                job_id, result = record[1:]
+                arg = awaiting_result.pop(job_id)
+                if self.result_columns is not None:
+                    self.result_columns.set(job_id, arg, result)
+                self.process_new_result(arg, result)
+                numresults += 1
+            elif kind == 'combined':
+                job_ids, acc = record[1:]
+                self.process_combined_result([awaiting_result.pop(job_id) for job_id in job_ids], acc)
+                numresults += len(job_ids)
+            elif kind == 'fail':
+                self.fail_list.append(record[1:])
+                self._fail_ids.add(record[1])
         
-        if not self.__start_SyncManager():
-            raise RuntimeError("could not start server")
+        self.numjobs = numjobs
+        self.numresults = numresults
+        self._journal_replayed = True
         
-        if self._pid != os.getpid():
+    def __collect_failures(self):
+        """move the items of the fail_q to fail_list (and the journal)
+        
+        returns the number of failed jobs
+        """
+        job_ids = []
+        try:
+            while True:
+                fail_item = self.fail_q.get_nowait()
+                # the job was reassigned (see lease_time) or copied (see 
+                # speculative_copies) and is done already
+                if not self.__first_result(fail_item[0]):
+                    continue
+                job_id = int(fail_item[0])
+                fail_item = (job_id,) + tuple(fail_item[1:])
+                job_ids.append(job_id)
+                if self.__schedule_retry(fail_item):
+                    continue
+                if self.fname_journal is not None:
+                    self.__journal_append(('fail',) + tuple(fail_item))
+                self.fail_list.append(fail_item)
+                self._fail_ids.add(job_id)
+                self._num_failures.pop(job_id, None)
+                self._failed_hosts.pop(job_id, None)
+        except queue.Empty:
+            pass
+        if (self.lease_time is not None) and (len(job_ids) > 0):
+            self.job_q.release(job_ids)
+        return len(self.fail_list)
+    
+    def __schedule_retry(self, fail_item):
+        """if the retry_policy permits, schedule the job for another attempt 
+        and return True"""
+        if self.retry_policy is None:
+            return False
+        job_id, err_name, hostname = fail_item[:3]
+        num_failures = self._num_failures.get(job_id, 0) + 1
+        if not self.retry_policy.retry(err_name, num_failures):
+            return False
+        self._num_failures[job_id] = num_failures
+        if self.retry_policy.other_host:
+            self._failed_hosts.setdefault(job_id, set()).add(hostname)
+        t_due = time.time() + self.retry_policy.delay(num_failures)
+        heapq.heappush(self._retries, (t_due, job_id))
+        # idle clients wait for it
+        self.job_q.expect(1)
+        self._num_retries += 1
+        if num_failures == 1:
+            self._num_jobs_retried += 1
+        if self.verbose > 1:
+            print("{}: job {} failed with {} on {}, retry in {:.1f}s".format(
+                  self._identifier, job_id, err_name, hostname, t_due - time.time()))
+        return True
+    
+    def __put_due_retries(self):
+        """put the jobs whose retry is due to the job_q"""
+        t = time.time()
+        jobs = []
+        num_due = 0
+        while (len(self._retries) > 0) and (self._retries[0][0] <= t):
+            job_id = heapq.heappop(self._retries)[1]
+            num_due += 1
+            # a copy of the job might have succeeded in the meantime
+            if self.__is_pending(job_id):
+                jobs.append((job_id, self.args_dict[job_id]))
+        if num_due == 0:
+            return
+        if self.retry_policy.other_host:
+            avoid_hosts = {job_id: self._failed_hosts[job_id] for job_id, arg in jobs}
+        else:
+            avoid_hosts = {}
+        self.job_q.put_retries([self.__encode_job(job) for job in jobs], avoid_hosts, num_due)
+    
+    def __is_pending(self, job_id):
+        """True if neither the result nor a failure of the job has been received"""
+        return (job_id in self.args_dict) and (job_id not in self._fail_ids)
+    
+    def __first_result(self, job_id):
+        """True if job_id refers to the first result (or failure) of the job, 
+        otherwise it is counted as duplicate (see lease_time and speculative_copies)"""
+        t = time.time()
+        if not self.__is_pending(job_id):
+            self._num_duplicates += 1
+            t_copy = self._copies_won.pop(job_id, None)
+            if (t_copy is not None) and not isinstance(job_id, _CopyId):
+                # the original finished that much later than its copy
+                self._tail_saved = max(self._tail_saved, t - t_copy)
+            return False
+        if isinstance(job_id, _CopyId):
+            self._copies_won[int(job_id)] = t
+            self._num_copies_won += 1
+        return True
+    
+    def __num_in_memory(self):
+        """number of pending jobs in memory, failed jobs are not counted"""
+        return len(self.args_dict) - len(self.fail_list)
+    
+    def __num_spilled(self):
+        if self._spill is None:
+            return 0
+        return len(self._spill)
+    
+    def __more_args(self):
+        """True if there are jobs on disk or arguments left in the iterable"""
+        return (self.__num_spilled() > 0) or (self._arg_iterator is not None)
+        
+    def __feed_job_q(self):
+        """refill the job_q from the jobs spilled to disk or, if there are none,
+        from the iterable given to args_from_iterable
+        
+        returns True if there might be more arguments to come
+        """
+        if self.__num_spilled() > 0:
+            self.__read_spill()
+            return self.__more_args()
+        
+        if self._arg_iterator is None:
+            return False
+        n_queued = self.job_q.qsize()
+        if n_queued > self._low_water:
+            return True
+        
+        # put_arg appends to the buffer instead of putting to the job_q, 
+        # so that a subclass overwriting put_arg keeps working
+        self._job_buffer = []
+        try:
+            while len(self._job_buffer) < self._high_water - n_queued:
+                self.put_arg(next(self._arg_iterator))
+                if self.__num_spilled() > 0:
+                    # max_jobs_in_memory reached, take more arguments
+                    # when the spilled job has been read back
+                    break
+        except StopIteration:
+            self._arg_iterator = None
+            if self.verbose > 1:
+                print("{}: all arguments taken from iterable".format(self._identifier))
+        finally:
+            buffer = self._job_buffer
+            self._job_buffer = None
+            if len(buffer) > 0:
+                self.job_q.put_many(buffer)
+                
+        return self.__more_args()
+    
+    def __read_spill(self):
+        """move spilled jobs back to memory as far as max_jobs_in_memory allows"""
+        if self.max_jobs_in_memory is None:
+            n = self.__num_spilled()
+        else:
+            # failed jobs stay in args_dict for good, they must not block
+            # the spilled ones
+            self.__collect_failures()
+            n = self.max_jobs_in_memory - self.__num_in_memory()
+        if n <= 0:
+            return
+        
+        jobs = self._spill.read(n)
+        for job_id, a in jobs:
+            self.args_dict[job_id] = a
+        self.job_q.put_many([self.__encode_job(job) for job in jobs])
+
+    def process_new_result(self, arg, result):
+        """Will be called when the result_q has data available.      
+        result is the computed result to the argument arg.
+        
+        Should be overwritten by subclassing! By default the pair (arg, result) 
+        is put to the result_sink or, if there is none, appended to final_result.
+        With a result_schema the result has already been stored in the result_columns.
+        """
+        if self.result_columns is not None:
+            return
+        if self.result_sink is not None:
+            self.result_sink.put(arg, result)
+        else:
+            self.final_result.append((arg, result))
+    
+    def process_combined_result(self, args, acc):
+        """Will be called when a client sends the accumulator acc of the results 
+        of the arguments args (a list), see JobManager_Client.combine.
+        
+        Calls process_new_result(args, acc), overwrite to merge the accumulators.
+        """
+        self.process_new_result(args, acc)
+        
+    def process_new_results(self, batch):
+        """Will be called with the list of (arg, result) pairs received in one wakeup
+        (see also handler_pool).
+        
+        Calls process_new_result for each pair, overwrite to handle the results
+        in bulk.
+        """
+        for arg, result in batch:
+            self.process_new_result(arg, result)
+    
+    def __start_handler_pool(self):
+        if (self.handler_pool is None) or (self._handler_executor is not None):
+            return
+        import concurrent.futures
+        if self.handler_ordered:
+            workers = 1
+        elif self.handler_workers is None:
+            workers = mp.cpu_count()
+        else:
+            workers = self.handler_workers
+        if self.handler_pool == 'thread':
+            self._handler_executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        else:
+            self._handler_executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+        self._handler_max_pending = 2*workers
+        if self.verbose > 1:
+            print("{}: handle results by a {} pool of {} worker(s)".format(self._identifier, self.handler_pool, workers))
+    
+    def __handle_results(self, batch):
+        if self._handler_executor is None:
+            self.process_new_results(batch)
+            return
+        if self.handler_pool == 'thread':
+            handler = self.process_new_results
+        else:
+            handler = self.result_handler
+        self._handler_futures.append(self._handler_executor.submit(handler, batch))
+        # do not pile up the batches if the handlers are too slow
+        self.__reap_handler_futures(max_pending = self._handler_max_pending)
+        
+    def __reap_handler_futures(self, max_pending=0):
+        """wait until at most max_pending batches are in the pool, 
+        raise the exception of a failed handler"""
+        while self._handler_futures:
+            f = self._handler_futures[0]
+            if (not f.done()) and (len(self._handler_futures) <= max_pending):
+                return
+            self._handler_futures.popleft()
+            # re-raises the exception of the handler
+            f.result()
+            
+    def __stop_handler_pool(self):
+        if self._handler_executor is None:
+            return
+        try:
+            self.__reap_handler_futures()
+        finally:
+            self._handler_executor.shutdown(wait=True)
+            self._handler_executor = None
+            self._handler_futures.clear()
+
+    def process_final_result(self):
+        """to implement user defined final processing"""
+        pass
+
+    def start(self):
+        """
+        starts to loop over incoming results
+        
+        When finished, or on exception call stop() afterwards to shut down gracefully.
+        """
+        
+        # the SyncManager keeps running after a round of jobs, so start
+        # may be called again with new arguments (see set_const_arg)
+        if (self.manager is None) and (not self.__start_SyncManager()):
+            raise RuntimeError("could not start server")
+        
+        if self._pid != os.getpid():
             raise RuntimeError("do not run JobManager_Server.start() in a subprocess")
 
-        if (self.numjobs - self.numresults) != len(self.args_set):
+        if (self.numjobs - self.numresults) != len(self.args_dict) + self.__num_spilled():
             if self.verbose > 1:
                 print("numjobs: {}".format(self.numjobs))
                 print("numresults: {}".format(self.numresults))
-                print("len(self.args_set): {}".format(len(self.args_set)))
+                print("len(self.args_dict): {}".format(len(self.args_dict)))
+                print("spilled jobs: {}".format(self.__num_spilled()))
                 
-            raise RuntimeError("inconsistency detected! (self.numjobs - self.numresults) != len(self.args_set)! use JobManager_Server.put_arg to put arguments to the job_q")
+            raise RuntimeError("inconsistency detected! (self.numjobs - self.numresults) != len(self.args_dict)! use JobManager_Server.put_arg to put arguments to the job_q")
+        
+        if self._journal is not None:
+            # the arguments have to be on disk before their results can arrive
+            self._journal.sync()
         
         if self.numjobs == 0:
             print("{}: WARNING no jobs to process! use JobManager_Server.put_arg to put arguments to the job_q".format(self._identifier))
@@ -1021,6 +2517,8 @@ class JobManager_Server(object):
         Signal_to_sys_exit(signals=[signal.SIGTERM, signal.SIGINT], verbose = self.verbose)
         pid = os.getpid()
         
+        self.__start_handler_pool()
+        
         if self.verbose > 1:
             print("{}: start processing incoming results".format(self._identifier))
         
@@ -1038,15 +2536,87 @@ class JobManager_Server(object):
                        sigterm='ign') as stat:
 
             stat.start()
-        
-            while (len(self.args_set) - self.fail_q.qsize()) > 0:
+            
+            if (self._result_listener is not None) and (self._result_accept_thread is None):
+                self._result_accept_thread = threading.Thread(target=self.__accept_result_connections)
+                self._result_accept_thread.daemon = True
+                self._result_accept_thread.start()
+            
+            # the number of failed jobs is only needed to decide whether
+            # all jobs are done, so the failures are collected when no 
+            # results arrive
+            numfailed = self.__collect_failures()
+            # more arguments might come from disk (see max_jobs_in_memory) 
+            # or from the iterable (see args_from_iterable)
+            more_args = self.__more_args()
+            t_feed = t_retry = time.time()
+            while more_args or ((len(self.args_dict) - numfailed) > 0):
+                # refill the job_q regularly and as soon as all arguments
+                # in memory are done
+                if more_args and ((time.time() - t_feed > self.__feed_interval) or 
+                                  ((len(self.args_dict) - numfailed) <= 0)):
+                    more_args = self.__feed_job_q()
+                    t_feed = time.time()
+                    continue
+                # failed jobs are retried (see retry_policy), so the failures 
+                # have to be collected also while the results keep coming
+                if (self.retry_policy is not None) and (time.time() - t_retry > self.__feed_interval):
+                    numfailed = self.__collect_failures()
+                    self.__put_due_retries()
+                    t_retry = time.time()
                 try:
-                    arg, result = self.result_q.get(timeout=1)
-                    self.args_set.remove(arg)
-                    self.numresults = self.numjobs - len(self.args_set)
-                    self.process_new_result(arg, result)
+                    results = self.__get_results(timeout=1)
                 except queue.Empty:
-                    pass
+                    numfailed = self.__collect_failures()
+                    if self.retry_policy is not None:
+                        self.__put_due_retries()
+                    if self._journal is not None:
+                        self._journal.sync()
+                    if self.result_sink is not None:
+                        self.result_sink.flush()
+                    self.__reap_handler_futures(max_pending = self._handler_max_pending)
+                    continue
+                batch = []
+                combined = []
+                done_ids = []
+                for job_id, result in results:
+                    if isinstance(job_id, tuple):
+                        # accumulator of the results of several jobs, some of them
+                        # might be done already if they were reassigned (see lease_time)
+                        done_ids.extend(job_id)
+                        job_id = tuple(int(i) for i in job_id if self.__first_result(i))
+                        if len(job_id) == 0:
+                            continue
+                        if self.fname_journal is not None:
+                            self.__journal_append(('combined', job_id, result))
+                        args = [self.args_dict.pop(i) for i in job_id]
+                        self.numresults = self.numjobs - len(self.args_dict) - self.__num_spilled()
+                        combined.append((args, result))
+                        continue
+                    done_ids.append(job_id)
+                    if not self.__first_result(job_id):
+                        continue
+                    job_id = int(job_id)
+                    if self.fname_journal is not None:
+                        self.__journal_append(('result', job_id, result))
+                    if self.result_columns is not None:
+                        self.result_columns.set(job_id, self.args_dict[job_id], result)
+                    arg = self.args_dict.pop(job_id)
+                    self.numresults = self.numjobs - len(self.args_dict) - self.__num_spilled()
+                    batch.append((arg, result))
+                if self.lease_time is not None:
+                    self.job_q.release(done_ids)
+                if len(batch) > 0:
+                    self.__handle_results(batch)
+                for args, acc in combined:
+                    self.process_combined_result(args, acc)
+        
+        # the originals of the copies which finished first are still out
+        t_end = time.time()
+        for t_copy in self._copies_won.values():
+            self._tail_saved = max(self._tail_saved, t_end - t_copy)
+        self._num_originals_out = len(self._copies_won)
+        self._copies_won.clear()
         
         if self.verbose > 1:
             print("{}: wait {}s before trigger clean up".format(self._identifier, self.__wait_before_stop))
@@ -1133,6 +2703,382 @@ class JobManager_Local(JobManager_Server):
                                            verbose=self.verbose_client)
 
 
+class ResultSink(object):
+    """
+    destination of the results of a JobManager_Server (see result_sink)
+    
+    The server passes each result together with its argument to put. The
+    (arg, result) pairs are buffered and handed over to write in batches of
+    batch_size items, and whenever flush is called (the server flushes 
+    the sink when no results arrive and before process_final_result).
+    close flushes the buffer and releases the resources of the sink, it is
+    called by the server on shutdown.
+    
+    Subclasses implement write and, if needed, close.
+    """
+    def __init__(self, batch_size=1000):
+        if batch_size < 1:
+            raise RuntimeError("batch_size must be >= 1")
+        self.batch_size = batch_size
+        self._buffer = []
+        # put and flush may be called by several threads (see handler_pool)
+        self._lock = threading.RLock()
+        
+    def put(self, arg, result):
+        with self._lock:
+            self._buffer.append((arg, result))
+            if len(self._buffer) >= self.batch_size:
+                self.flush()
+            
+    def put_many(self, items):
+        """put all (arg, result) pairs of the iterable items"""
+        for arg, result in items:
+            self.put(arg, result)
+            
+    def flush(self):
+        with self._lock:
+            if len(self._buffer) > 0:
+                self.write(self._buffer)
+                self._buffer = []
+    
+    def write(self, items):
+        """write the list of (arg, result) pairs items"""
+        raise NotImplementedError
+    
+    def close(self):
+        self.flush()
+        
+
+class PickleFileSink(ResultSink):
+    """
+    appends the results to a file, each batch as a frame (see _write_frame)
+    holding the pickled list of (arg, result) pairs
+    
+    An existing file is continued. read yields the (arg, result) pairs of
+    such a file, it stops at an incomplete frame as left by a crash.
+    
+    fsync [bool] - sync the file to disk after each batch
+    """
+    def __init__(self, fname, batch_size=1000, fsync=False):
+        super(PickleFileSink, self).__init__(batch_size=batch_size)
+        self.fname = fname
+        self.fsync = fsync
+        self._f = open(fname, 'ab')
+        
+    def write(self, items):
+        _write_frame(self._f, pickle.dumps(items, protocol=pickle.HIGHEST_PROTOCOL))
+        self._f.flush()
+        if self.fsync:
+            os.fsync(self._f.fileno())
+            
+    def close(self):
+        super(PickleFileSink, self).close()
+        self._f.close()
+        
+    @staticmethod
+    def read(fname):
+        with open(fname, 'rb') as f:
+            while True:
+                data = _read_frame(f)
+                if data is None:
+                    return
+                for item in pickle.loads(data):
+                    yield item
+                    
+
+class NpyDirSink(ResultSink):
+    """
+    writes results of a fixed shape and dtype to memory mapped .npy files
+    in directory
+    
+    The results are stored row by row in the segment files 'result_<n>.npy'
+    of segment_size rows each, the arguments are appended to the file 'args'
+    (see PickleFileSink), so the row of a result is the position of its 
+    argument in that file. An existing directory is continued.
+    
+    load returns the arguments and the results (as single array) 
+    written to a directory (None if there are no results).
+    """
+    def __init__(self, directory, shape, dtype=np.float64, segment_size=10000, batch_size=1000):
+        super(NpyDirSink, self).__init__(batch_size=batch_size)
+        self.directory = directory
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.segment_size = segment_size
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        
+        fname_args = os.path.join(directory, 'args')
+        self._num_rows = 0
+        if os.path.isfile(fname_args):
+            for a in PickleFileSink.read(fname_args):
+                self._num_rows += 1
+        self._args = PickleFileSink(fname_args, batch_size=batch_size)
+        self._segment = None
+        self._segment_idx = None
+        
+    def __open_segment(self, idx):
+        if self._segment is not None:
+            self._segment.flush()
+        fname = os.path.join(self.directory, 'result_{:06d}.npy'.format(idx))
+        if os.path.isfile(fname):
+            self._segment = np.lib.format.open_memmap(fname, mode='r+')
+        else:
+            self._segment = np.lib.format.open_memmap(fname, mode='w+', dtype=self.dtype, 
+                                                      shape=(self.segment_size,) + self.shape)
+        self._segment_idx = idx
+        
+    def write(self, items):
+        for arg, result in items:
+            result = np.asarray(result, dtype=self.dtype)
+            if result.shape != self.shape:
+                raise RuntimeError("result of shape {} does not match the shape {} of the sink".format(result.shape, self.shape))
+            idx, row = divmod(self._num_rows, self.segment_size)
+            if idx != self._segment_idx:
+                self.__open_segment(idx)
+            self._segment[row] = result
+            self._num_rows += 1
+            self._args.put(arg, None)
+        self._segment.flush()
+        self._args.flush()
+        
+    def close(self):
+        super(NpyDirSink, self).close()
+        if self._segment is not None:
+            self._segment.flush()
+            self._segment = None
+        self._args.close()
+        
+    @staticmethod
+    def load(directory, mmap_mode=None):
+        """return the list of arguments and the array of results"""
+        args = [a for a, none in PickleFileSink.read(os.path.join(directory, 'args'))]
+        segments = []
+        n = len(args)
+        while n > 0:
+            seg = np.load(os.path.join(directory, 'result_{:06d}.npy'.format(len(segments))), mmap_mode=mmap_mode)
+            segments.append(seg[:n])
+            n -= len(segments[-1])
+        if len(segments) == 0:
+            return args, None
+        return args, np.concatenate(segments)
+
+
+class ResultColumns(object):
+    """
+    results of a fixed schema stored in numpy columns indexed by the job id
+    (see JobManager_Server result_schema)
+    
+    schema [list] - (name, dtype, shape) of each column, the shape of a single
+    entry, e.g. [('t', np.float64, (N,)), ('x', np.complex128, (N, 2))]. A result 
+    is a tuple with one entry per column, for a single column the result itself.
+    
+    capacity [int] - number of rows allocated initially, the columns double 
+    their size when a larger job id arrives
+    
+    store_args [bool] - keep the arguments in the object column 'arg'
+    
+    columns[name] returns the column up to the largest job id stored so far, 
+    the mask done tells which of these rows hold a result.
+    """
+    def __init__(self, schema, capacity=1024, store_args=True):
+        self.schema = [(name, np.dtype(dtype), tuple(shape)) for name, dtype, shape in schema]
+        if len(self.schema) == 0:
+            raise RuntimeError("schema must have at least one column")
+        self.store_args = store_args
+        
+        self._columns = collections.OrderedDict()
+        for name, dtype, shape in self.schema:
+            self._columns[name] = np.zeros(shape=(capacity,) + shape, dtype=dtype)
+        if store_args:
+            self._columns['arg'] = np.empty(shape=(capacity,), dtype=object)
+        self._done = np.zeros(shape=(capacity,), dtype=np.bool_)
+        self._size = 0      # largest job id stored + 1
+        
+    def __grow(self, size):
+        capacity = len(self._done)
+        while capacity < size:
+            capacity *= 2
+        for name, col in self._columns.items():
+            new_col = np.zeros(shape=(capacity,) + col.shape[1:], dtype=col.dtype)
+            new_col[:len(col)] = col
+            self._columns[name] = new_col
+        new_done = np.zeros(shape=(capacity,), dtype=np.bool_)
+        new_done[:len(self._done)] = self._done
+        self._done = new_done
+    
+    def set(self, job_id, arg, result):
+        if len(self.schema) == 1:
+            result = (result, )
+        elif len(result) != len(self.schema):
+            raise RuntimeError("result has {} entries, the schema {} columns".format(len(result), len(self.schema)))
+        values = []
+        for (name, dtype, shape), value in zip(self.schema, result):
+            value = np.asarray(value, dtype=dtype)
+            if value.shape != shape:
+                raise RuntimeError("entry '{}' of the result has shape {}, expected {}".format(name, value.shape, shape))
+            values.append(value)
+        
+        if job_id >= len(self._done):
+            self.__grow(job_id + 1)
+        for (name, dtype, shape), value in zip(self.schema, values):
+            self._columns[name][job_id] = value
+        if self.store_args:
+            self._columns['arg'][job_id] = arg
+        self._done[job_id] = True
+        self._size = max(self._size, job_id + 1)
+        
+    def __getitem__(self, name):
+        return self._columns[name][:self._size]
+    
+    def __len__(self):
+        """number of results stored"""
+        return int(np.count_nonzero(self.done))
+    
+    @property
+    def names(self):
+        return list(self._columns.keys())
+    
+    @property
+    def done(self):
+        return self._done[:self._size]
+    
+    @property
+    def job_ids(self):
+        """job ids of the results stored"""
+        return np.flatnonzero(self.done)
+
+
+
+class Serializer(object):
+    """
+    converts the arguments and results sent between server and clients to bytes
+    (see JobManager_Server serializer)
+    
+    Subclasses implement dumps(obj) -> bytes and loads(data) -> obj, where data
+    may be any bytes-like object. The serializer itself is pickled to tell the 
+    clients how to decode, so it should hold nothing but its settings.
+    
+    The built-in serializers fall back to pickle for objects they do not
+    handle, the first byte tells which way an object was encoded.
+    """
+    name = 'serializer'
+    
+    def dumps(self, obj):
+        raise NotImplementedError
+    
+    def loads(self, data):
+        raise NotImplementedError
+    
+
+class PickleSerializer(Serializer):
+    """
+    pickle at the given protocol (None: pickle.HIGHEST_PROTOCOL), e.g. to stay
+    readable by clients running an older python
+    """
+    def __init__(self, protocol=None):
+        if protocol is None:
+            protocol = pickle.HIGHEST_PROTOCOL
+        if protocol > pickle.HIGHEST_PROTOCOL:
+            raise RuntimeError("pickle protocol {} is not supported (highest {})".format(protocol, pickle.HIGHEST_PROTOCOL))
+        self.protocol = protocol
+        
+    @property
+    def name(self):
+        return 'pickle{}'.format(self.protocol)
+        
+    def dumps(self, obj):
+        return pickle.dumps(obj, protocol=self.protocol)
+    
+    def loads(self, data):
+        return pickle.loads(data)
+    
+
+class NumpySerializer(Serializer):
+    """
+    numpy arrays (not of dtype object) as a short header, holding the dtype and 
+    the shape, followed by the raw data in C order, anything else pickled
+    
+    Decoded arrays are plain writable numpy arrays (a subclass such as 
+    hashableCopyOfNumpyArray is not kept).
+    """
+    name = 'numpy'
+    _HEADER = struct.Struct('<BB')  # length of dtype.str, ndim
+    
+    def dumps(self, obj):
+        if isinstance(obj, np.ndarray) and not obj.dtype.hasobject and (obj.dtype.fields is None):
+            obj = np.ascontiguousarray(obj)
+            dtype = obj.dtype.str.encode('ascii')
+            return b''.join([b'A', 
+                             NumpySerializer._HEADER.pack(len(dtype), obj.ndim), 
+                             dtype,
+                             struct.pack('<{}Q'.format(obj.ndim), *obj.shape),
+                             obj.tobytes()])
+        return b'P' + pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    
+    def loads(self, data):
+        data = memoryview(data)
+        if data[:1] == b'P':
+            return pickle.loads(data[1:])
+        len_dtype, ndim = NumpySerializer._HEADER.unpack_from(data, 1)
+        pos = 1 + NumpySerializer._HEADER.size
+        dtype = np.dtype(data[pos:pos+len_dtype].tobytes().decode('ascii'))
+        pos += len_dtype
+        shape = struct.unpack_from('<{}Q'.format(ndim), data, pos)
+        pos += 8*ndim
+        # copy, the received bytes are read only
+        return np.frombuffer(data, dtype=dtype, offset=pos).reshape(shape).copy()
+    
+
+class FloatTupleSerializer(Serializer):
+    """
+    tuples of floats (including numpy.float64), such as the parameters of a fit, 
+    packed as little endian doubles, anything else pickled
+    
+    A packed tuple is decoded as a tuple of python floats.
+    """
+    name = 'floattuple'
+    
+    def dumps(self, obj):
+        if (type(obj) is tuple) and all(isinstance(x, float) for x in obj):
+            return b'F' + struct.pack('<{}d'.format(len(obj)), *obj)
+        return b'P' + pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    
+    def loads(self, data):
+        data = memoryview(data)
+        if data[:1] == b'P':
+            return pickle.loads(data[1:])
+        return struct.unpack_from('<{}d'.format((len(data) - 1) // 8), data, 1)
+
+
+class BlobRef(object):
+    """
+    reference to a blob stored by the server, identified by the SHA-1 of
+    its pickled data (see JobManager_Server.put_blob)
+    """
+    __slots__ = ('hash', )
+    def __init__(self, hash):
+        self.hash = hash
+        
+    def __getstate__(self):
+        return self.hash
+    
+    def __setstate__(self, hash):
+        self.hash = hash
+        
+    def __eq__(self, other):
+        return isinstance(other, BlobRef) and (self.hash == other.hash)
+    
+    def __ne__(self, other):
+        return not self.__eq__(other)
+    
+    def __hash__(self):
+        return hash(self.hash)
+    
+    def __repr__(self):
+        return "BlobRef('{}')".format(self.hash)
+
+
 class Signal_handler_for_Jobmanager_client(object):
     def __init__(self, client_object, exit_handler, signals=[signal.SIGINT], verbose=0):
         self.client_object = client_object
@@ -1222,6 +3168,10 @@ class Signal_to_terminate_process_list(object):
                                                auto_kill_on_last_resort=False)
 
 
+# The job manager keys its jobs by id and does not require hashable arguments
+# anymore (see JobManager_Server.put_arg). hashDict and hashableCopyOfNumpyArray 
+# are kept, as dumps written before contain arguments of these types, and for 
+# code which uses arguments as keys of its own dicts or sets.
 class hashDict(dict):
     def __hash__(self):
         try:
@@ -1247,6 +3197,16 @@ class hashableCopyOfNumpyArray(np.ndarray):
 
     def __eq__(self, other):
         return np.all(np.equal(self, other))
+    
+    def __reduce_ex__(self, protocol):
+        # numpy pickles subclasses in-band, use an out-of-band buffer
+        # with protocol 5 as for plain arrays (see _send_oob)
+        if (protocol >= 5) and self.flags.c_contiguous and (not self.dtype.hasobject):
+            return (_rebuild_hashableCopyOfNumpyArray, (pickle.PickleBuffer(self), self.dtype, self.shape))
+        return super(hashableCopyOfNumpyArray, self).__reduce_ex__(protocol)
+    
+def _rebuild_hashableCopyOfNumpyArray(buffer, dtype, shape):
+    return np.frombuffer(buffer, dtype=dtype).reshape(shape).view(hashableCopyOfNumpyArray)
 
 
 def copyQueueToList(q):
@@ -1326,7 +3286,1947 @@ def try_pickle(obj, show_exception=False):
 
 
 
-myQueue = mp.Queue
+class myQueue(mp_queues.Queue):
+    """
+    multiprocessing.Queue providing additional bulk operations
+    
+    get_many and put_many transfer several items with a single call.
+    When the queue is accessed via a SyncManager proxy this reduces
+    the number of network round trips (see JobManager_Client batch_size).
+    """
+    def __init__(self, maxsize=0):
+        if sys.version_info[0] == 2:
+            super(myQueue, self).__init__(maxsize)
+        else:
+            super(myQueue, self).__init__(maxsize, ctx=mp.get_context())
+    
+    def get_many(self, n, block=True, timeout=None):
+        """return a list of at most n items
+        
+        Waits (as specified by block and timeout) for the first item only.
+        Raises queue.Empty if not even a single item is available.
+        """
+        items = [self.get(block=block, timeout=timeout)]
+        try:
+            while len(items) < n:
+                items.append(self.get_nowait())
+        except queue.Empty:
+            pass
+        return items
+    
+    def put_many(self, items, block=True, timeout=None):
+        """put all items of the iterable items to the queue"""
+        for item in items:
+            self.put(item, block=block, timeout=timeout)
+
+
+class _JobsPending(Exception):
+    """raised by JobQueue if a client gets no item now, but should ask again"""
+    
+
+class JobQueue(object):
+    """
+    FIFO queue holding the arguments to be processed
+    
+    The job_q of the JobManager_Server. It lives in the SyncManager process
+    and is accessed via proxy by the clients as well as by the server process.
+    In contrast to a multiprocessing.Queue the items are simply kept in a deque
+    guarded by a condition variable, no additional pipe and feeder thread are
+    involved and qsize is exact.
+    
+    get_many, put_many and get_chunk transfer several items with a single
+    (proxy) call. get_chunk lets the chunk_sizer choose the number of items
+    (see ChunkSizer).
+    
+    If lease_time is not None, the items are (job_id, arg) pairs and the
+    client_id passed to the get methods holds a lease on the items it got.
+    The lease lasts lease_time seconds and is renewed by the heartbeat of
+    the client. Items are handed back by release (their result or failure
+    was received) or by putting them to the queue again. When the lease of
+    a client expires, its items go back to the front of the queue, which
+    is checked whenever items are requested.
+    
+    If in addition speculative_copies > 0, a client asking for items while 
+    the queue is empty gets a copy of the job in flight longest, once it has
+    been out for speculative_min_age seconds, as long as there are less than 
+    speculative_copies copies of that job. The job id of a copy is a _CopyId. 
+    When the first result of a copied job is released, the heartbeat tells 
+    the other holders that they may skip the job.
+    
+    Failed jobs to be retried are announced by expect. put_retries adds them, 
+    also to be avoided by certain hosts (the host is the part of the client_id 
+    before the last ':'), unless no client on another host has been seen (asking
+    for items or holding a lease) within lease_time.
+    
+    If a client gets no item within the timeout of its request, but items
+    may come up for it later (a job becomes old enough for a copy, leased jobs
+    go back to the queue when their lease expires, announced retries have not 
+    been put yet, or the items at hand are to be avoided by its host), 
+    _JobsPending is raised instead of queue.Empty. So idle clients keep asking
+    and are at hand for the stragglers, the jobs of lost clients and the retries.
+    
+    Pickling a JobQueue (e.g. via proxy._getvalue()) copies its items, 
+    leased items are not included.
+    """
+    def __init__(self, items=()):
+        self._items = collections.deque(items)
+        self._cond = threading.Condition()
+        self.chunk_sizer = None
+        
+        self.lease_time = None
+        # client_id -> [deadline, {job_id: item}]
+        self._leases = {}
+        # job_id -> set of the client_ids holding the job
+        self._holders = {}
+        # job_id -> time the job was first handed out
+        self._t_dispatch = {}
+        # number of items put back because their lease expired
+        self.num_reassigned = 0
+        
+        self.speculative_copies = 0
+        self.speculative_min_age = 0
+        # job_id -> number of copies handed out
+        self._copies = {}
+        # client_id -> ids of the jobs the client may skip
+        self._cancelled = {}
+        self.num_copies = 0
+        
+        # job_id -> hosts the job should not be handed to
+        self._avoid = {}
+        # number of retries announced but not put yet
+        self._num_expected = 0
+        # host -> time a client of the host asked for items or renewed its lease
+        self._t_seen = {}
+        
+    def __getstate__(self):
+        with self._cond:
+            return (list(self._items), self.chunk_sizer, self.lease_time, self.num_reassigned,
+                    self.speculative_copies, self.speculative_min_age, self.num_copies)
+    
+    def __setstate__(self, state):
+        self.__init__(state[0])
+        (self.chunk_sizer, self.lease_time, self.num_reassigned, 
+         self.speculative_copies, self.speculative_min_age, self.num_copies) = state[1:]
+        
+    def qsize(self):
+        return len(self._items)
+    
+    def empty(self):
+        return len(self._items) == 0
+        
+    def put(self, item, block=True, timeout=None, client_id=None):
+        """add item to the queue, never blocks (block and timeout for compatibility only)"""
+        self.put_many([item], client_id=client_id)
+            
+    def put_nowait(self, item):
+        self.put(item)
+            
+    def put_many(self, items, block=True, timeout=None, client_id=None):
+        """add all items of the iterable items to the queue
+        
+        A client putting back items it holds passes its client_id, then an 
+        item is only added if the client still holds it and no other client 
+        holds a copy of it.
+        """
+        with self._cond:
+            if self.lease_time is not None:
+                items = [self._put_back(item, client_id) for item in items]
+                items = [item for item in items if item is not None]
+            self._items.extend(items)
+            self._cond.notify_all()
+            
+    def _get(self, n, block, timeout, client_id):
+        """called with _cond acquired, return a list of at most n items for client_id
+        
+        Waits (as specified by block and timeout) for the first item only.
+        Raises _JobsPending if none is available but one may come up for client_id
+        later, queue.Empty otherwise.
+        """
+        if timeout is not None:
+            t_end = time.time() + timeout
+        if client_id is not None:
+            self._t_seen[client_id.rsplit(':', 1)[0]] = time.time()
+        while True:
+            self._expire()
+            items = self._pop(n, client_id)
+            if len(items) > 0:
+                self._lease(client_id, items)
+                return items
+            copy, t_ready = self._speculate(client_id)
+            if copy is not None:
+                return [copy]
+            
+            if not block:
+                remaining = 0
+            elif timeout is None:
+                remaining = None
+            else:
+                remaining = t_end - time.time()
+            # leased jobs go back to the queue if their lease expires
+            leased = (self.lease_time is not None) and (len(self._holders) > 0)
+            if (remaining is not None) and (remaining <= 0):
+                if (client_id is not None) and ((len(self._items) > 0) or 
+                                                (self._num_expected > 0) or 
+                                                (t_ready is not None) or leased):
+                    raise _JobsPending
+                raise queue.Empty
+            if leased:
+                # the earliest lease expires
+                t_expire = min(lease[0] for lease in self._leases.values())
+                t_ready = t_expire if t_ready is None else min(t_ready, t_expire)
+            if t_ready is not None:
+                # a job becomes old enough for a copy or a lease expires
+                if remaining is None:
+                    remaining = t_ready - time.time()
+                else:
+                    remaining = min(remaining, t_ready - time.time())
+            self._cond.wait(remaining)
+            
+    def _lease(self, client_id, items):
+        """called with _cond acquired, client_id holds the items until released"""
+        if self.lease_time is None:
+            return
+        now = time.time()
+        lease = self._leases.setdefault(client_id, [None, {}])
+        lease[0] = now + self.lease_time
+        for item in items:
+            lease[1][item[0]] = item
+            self._holders.setdefault(item[0], set()).add(client_id)
+            self._t_dispatch.setdefault(item[0], now)
+            
+    def _drop_holder(self, job_id, client_id):
+        """called with _cond acquired, client_id does not hold the job anymore"""
+        lease = self._leases.get(client_id)
+        if lease is not None:
+            lease[1].pop(job_id, None)
+        holders = self._holders.get(job_id)
+        if holders is None:
+            return
+        holders.discard(client_id)
+        if len(holders) == 0:
+            del self._holders[job_id]
+            del self._t_dispatch[job_id]
+            self._copies.pop(job_id, None)
+            
+    def _put_back(self, item, client_id):
+        """called with _cond acquired, returns the item to be queued or None"""
+        job_id = item[0]
+        if client_id is None:
+            self._release([job_id])
+            return item
+        lease = self._leases.get(client_id)
+        if (lease is None) or (job_id not in lease[1]):
+            # the lease expired (the job has been requeued) or the job is done
+            return None
+        self._drop_holder(job_id, client_id)
+        if job_id in self._holders:
+            # another client is working on a copy
+            return None
+        return (int(job_id), item[1])
+            
+    def _release(self, job_ids, cancel=False):
+        """called with _cond acquired, if cancel the holders of copies of the 
+        jobs learn by their heartbeat that they may skip them"""
+        for job_id in job_ids:
+            holders = self._holders.pop(job_id, ())
+            self._t_dispatch.pop(job_id, None)
+            copied = self._copies.pop(job_id, 0) > 0
+            for client_id in holders:
+                del self._leases[client_id][1][job_id]
+                if cancel and copied:
+                    self._cancelled.setdefault(client_id, set()).add(int(job_id))
+                
+    def _expire(self):
+        """called with _cond acquired, put back the items of all expired leases"""
+        if len(self._leases) == 0:
+            return
+        now = time.time()
+        for client_id in [c for c, lease in self._leases.items() if lease[0] < now]:
+            jobs = self._leases.pop(client_id)[1]
+            self._cancelled.pop(client_id, None)
+            for job_id, item in jobs.items():
+                self._drop_holder(job_id, client_id)
+                if job_id not in self._holders:
+                    self._items.appendleft((int(job_id), item[1]))
+                    self.num_reassigned += 1
+                    
+    def _speculate(self, client_id):
+        """called with _cond acquired and no item in the queue for client_id
+        
+        returns a copy of the job in flight longest for client_id (or None), and the
+        time the next job becomes old enough for a copy (or None if there is none)
+        """
+        if (self.speculative_copies == 0) or (client_id is None):
+            return None, None
+        # the dicts keep the order the jobs were dispatched in
+        for job_id, holders in self._holders.items():
+            if (client_id in holders) or (self._copies.get(job_id, 0) >= self.speculative_copies):
+                continue
+            t_ready = self._t_dispatch[job_id] + self.speculative_min_age
+            if t_ready > time.time():
+                return None, t_ready
+            item = self._leases[next(iter(holders))][1][job_id]
+            copy = (_CopyId(job_id), item[1])
+            self._copies[job_id] = self._copies.get(job_id, 0) + 1
+            self.num_copies += 1
+            self._lease(client_id, [copy])
+            return copy, None
+        return None, None
+                    
+    def _pop(self, n, client_id):
+        """called with _cond acquired, pop at most n items suitable for client_id"""
+        if (len(self._avoid) == 0) or (client_id is None):
+            return [self._items.popleft() for i in range(min(n, len(self._items)))]
+        
+        host = client_id.rsplit(':', 1)[0]
+        if self.lease_time is None:
+            active_hosts = set()
+        else:
+            t_min = time.time() - self.lease_time
+            active_hosts = {h for h, t in self._t_seen.items() if t >= t_min}
+        active_hosts.update(c.rsplit(':', 1)[0] for c in self._leases if c is not None)
+        items = []
+        skipped = []
+        while (len(self._items) > 0) and (len(items) < n):
+            item = self._items.popleft()
+            avoid = self._avoid.get(item[0], ())
+            if (host in avoid) and (len(active_hosts - avoid) > 0):
+                skipped.append(item)
+            else:
+                self._avoid.pop(item[0], None)
+                items.append(item)
+        self._items.extendleft(reversed(skipped))
+        return items
+                    
+    def get(self, block=True, timeout=None, client_id=None):
+        with self._cond:
+            return self._get(1, block, timeout, client_id)[0]
+        
+    def get_nowait(self):
+        return self.get(block=False)
+    
+    def get_many(self, n, block=True, timeout=None, client_id=None):
+        """return a list of at most n items
+        
+        Waits (as specified by block and timeout) for the first item only.
+        Raises queue.Empty if not even a single item is available (or 
+        _JobsPending, see above).
+        """
+        with self._cond:
+            return self._get(n, block, timeout, client_id)
+        
+    def expect(self, n):
+        """announce n retries to come (see put_retries)"""
+        with self._cond:
+            self._num_expected += n
+        
+    def put_retries(self, items, avoid_hosts, num_expected):
+        """add the items of failed jobs, avoid_hosts maps their job ids to the 
+        hosts they should not be handed to (see RetryPolicy other_host)
+        
+        num_expected announced retries are done (some of them might not be 
+        included in items, because the job has been done in the meantime)
+        """
+        with self._cond:
+            self._avoid.update(avoid_hosts)
+            self._num_expected -= num_expected
+        self.put_many(items)
+        
+    def heartbeat(self, client_id):
+        """renew the lease of all items held by client_id
+        
+        returns the ids of the jobs the client may skip, because their 
+        result has been received from another client
+        """
+        with self._cond:
+            self._t_seen[client_id.rsplit(':', 1)[0]] = time.time()
+            if client_id in self._leases:
+                self._leases[client_id][0] = time.time() + self.lease_time
+            return list(self._cancelled.pop(client_id, ()))
+                
+    def release(self, job_ids):
+        """the jobs are done (or failed), drop their leases"""
+        with self._cond:
+            self._release(job_ids, cancel=True)
+            # clients waiting for a copy might have to stop waiting
+            self._cond.notify_all()
+            
+    def lease_info(self):
+        """return the number of leased jobs and the number of reassigned jobs"""
+        with self._cond:
+            return len(self._holders), self.num_reassigned
+        
+    def speculation_info(self):
+        """return the number of copies handed out"""
+        return self.num_copies
+            
+    def get_chunk(self, client_id, time_per_job=None, time_per_request=None, n_max=None, block=True, timeout=None):
+        """return a list of items, its length is chosen by the chunk_sizer
+        
+        The client reports its average calculation time per job and its
+        average time per get_chunk request (None if not known yet).
+        n_max limits the number of items returned.
+        """
+        if self.chunk_sizer is None:
+            n = 1
+        else:
+            self.chunk_sizer.report(client_id, time_per_job, time_per_request)
+            n = self.chunk_sizer.chunk_size(client_id, self.qsize())
+        if n_max is not None:
+            n = min(n, n_max)
+        return self.get_many(n, block=block, timeout=timeout, client_id=client_id)
+
+
+class ChunkSizer(object):
+    """
+    chooses the number of arguments handed to a client with a single
+    request (see JobQueue.get_chunk and JobManager_Client batch_size='auto')
+    
+    The chunk is large enough such that the time per request is at most the
+    fraction overhead of the calculation time of the whole chunk, so fast
+    jobs and slow connections yield large chunks. Towards the end of the
+    job_q the chunks shrink to remaining / (tail_factor * number of active
+    clients), so that no client ends up with a large chunk while the others
+    have nothing to do.
+    
+    A client without reported times gets a chunk of size one.
+    """
+    def __init__(self, overhead=0.02, max_chunk_size=1000, tail_factor=2, active_timeout=60):
+        self.overhead = overhead
+        self.max_chunk_size = max_chunk_size
+        self.tail_factor = tail_factor
+        # clients not seen for that many seconds are considered inactive
+        self.active_timeout = active_timeout
+        
+        # client_id -> [time_per_job, time_per_request, time of last report]
+        # the SyncManager serves each client connection in its own thread
+        self.clients = {}
+        self._lock = threading.Lock()
+        
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        with self._lock:
+            state['clients'] = dict(self.clients)
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        
+    def report(self, client_id, time_per_job, time_per_request):
+        with self._lock:
+            self.clients[client_id] = [time_per_job, time_per_request, time.time()]
+        
+    def num_active_clients(self):
+        t_min = time.time() - self.active_timeout
+        with self._lock:
+            return sum(1 for c in self.clients.values() if c[2] > t_min)
+        
+    def chunk_size(self, client_id, remaining):
+        """chunk size for the client, remaining is the number of arguments left"""
+        with self._lock:
+            if client_id not in self.clients:
+                return 1
+            time_per_job, time_per_request = self.clients[client_id][:2]
+        if (time_per_job is None) or (time_per_request is None):
+            return 1
+        
+        if time_per_job > 0:
+            n = int(math.ceil(time_per_request / (self.overhead * time_per_job)))
+        else:
+            n = self.max_chunk_size
+        
+        n_tail = int(math.ceil(remaining / (self.tail_factor * max(1, self.num_active_clients()))))
+        
+        return max(1, min(n, n_tail, self.max_chunk_size))
+
+
+class RetryPolicy(object):
+    """
+    decides whether a failed job is put to the job_q again (see 
+    JobManager_Server retry_policy)
+    
+    A job is tried at most max_attempts times. After the n-th failure it
+    goes back to the job_q after backoff * backoff_factor**(n-1) seconds
+    (at most max_backoff). The exceptions are matched by their name, as
+    the clients report the name only. retry_on lists the exceptions (classes
+    or names) worth a retry (None: any), no_retry_on the ones never retried.
+    
+    If other_host, a retried job is not handed to the hosts it failed on
+    as long as clients on other hosts are connected (see JobQueue). The
+    clients keep asking for jobs while retries are waiting.
+    """
+    def __init__(self, max_attempts=3, backoff=1, backoff_factor=2, max_backoff=600, 
+                 other_host=False, retry_on=None, no_retry_on=()):
+        if max_attempts < 1:
+            raise RuntimeError("max_attempts must be >= 1")
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.other_host = other_host
+        if retry_on is None:
+            self.retry_on = None
+        else:
+            self.retry_on = RetryPolicy._names(retry_on)
+        self.no_retry_on = RetryPolicy._names(no_retry_on)
+        
+    @staticmethod
+    def _names(exceptions):
+        return {e if isinstance(e, str) else e.__name__ for e in exceptions}
+        
+    def retry(self, err_name, num_failures):
+        """True if a job which failed num_failures times, the last time with 
+        the exception named err_name, is to be tried again"""
+        if num_failures >= self.max_attempts:
+            return False
+        if err_name in self.no_retry_on:
+            return False
+        return (self.retry_on is None) or (err_name in self.retry_on)
+    
+    def delay(self, num_failures):
+        """seconds to wait before the job is put to the job_q again"""
+        return min(self.backoff * self.backoff_factor**(num_failures - 1), self.max_backoff)
+
+
+def _fetch_chunk(job_q, batch_size, njobs, client_id=None, time_per_job=None, time_per_request=None):
+    """
+    get the next arguments from the job_q as list, raises queue.Empty
+    if there are none (waits 0.1s for the first one), or _JobsPending if
+    there are none now but the request should be repeated (see JobQueue)
+    
+    batch_size 'auto' lets the server choose the number of arguments, 
+    using the times reported along with the request (see ChunkSizer).
+    A positive njobs limits the number of arguments.
+    """
+    if njobs > 0:
+        n_max = njobs
+    else:
+        n_max = None
+        
+    if batch_size == 'auto':
+        return job_q.get_chunk(client_id, time_per_job, time_per_request, n_max, block = True, timeout = 0.1)
+    
+    if n_max is not None:
+        n = min(batch_size, n_max)
+    else:
+        n = batch_size
+    # the client_id holds the lease of the arguments (see JobQueue), the
+    # other queues do not know about leases
+    if client_id is None:
+        kwargs = {}
+    else:
+        kwargs = {'client_id': client_id}
+    if n == 1:
+        return [job_q.get(block = True, timeout = 0.1, **kwargs)]
+    else:
+        return job_q.get_many(n, block = True, timeout = 0.1, **kwargs)
+
+
+class _ResultUploader(object):
+    """
+    collects the (job_id, result) pairs of a worker process and puts them
+    as a single list to the result_q, done in a background thread
+    
+    For combined results (see JobManager_Client.combine) job_id is the tuple 
+    of the ids of the jobs folded into the accumulator result.
+    
+    The buffer is sent when it holds max_items pairs or when the oldest
+    pair is older than max_delay seconds. close() sends the remaining
+    pairs and waits for the thread to finish.
+    
+    If result_q.put fails the thread stops and the exception is
+    stored as attribute error.
+    
+    With a wire_codec the list is put as the bytes encoded by the codec.
+    """
+    def __init__(self, result_q, max_items=64, max_delay=0.2, identifier=None, verbose=0, wire_codec=None):
+        self.result_q = result_q
+        self.wire_codec = wire_codec
+        self.max_items = max_items
+        self.max_delay = max_delay
+        self.identifier = identifier
+        self.verbose = verbose
+        
+        self.error = None
+        self.time_put = 0.    # overall time spent in result_q.put
+        
+        self._buffer = []
+        self._t_first = None  # time when the oldest pair in _buffer was added
+        self._stop = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        
+    def start(self):
+        self._thread.start()
+        
+    def put(self, job_id, result):
+        with self._cond:
+            self._buffer.append((job_id, result))
+            # the first pair starts the max_delay countdown in _run
+            if len(self._buffer) == 1:
+                self._t_first = time.time()
+                self._cond.notify()
+            elif len(self._buffer) >= self.max_items:
+                self._cond.notify()
+            
+    def close(self, timeout=None):
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        if self._thread.is_alive() and (self.verbose > 0):
+            print("{}: result uploader did not finish within {}s".format(self.identifier, timeout))
+            
+    def _wait_for_items(self):
+        """block until the buffer has to be sent, return its content"""
+        with self._cond:
+            while not self._stop:
+                if len(self._buffer) >= self.max_items:
+                    break
+                if len(self._buffer) == 0:
+                    self._cond.wait()
+                else:
+                    remaining = self._t_first + self.max_delay - time.time()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            items = self._buffer
+            self._buffer = []
+            return items
+        
+    def _run(self):
+        while True:
+            items = self._wait_for_items()
+            if len(items) > 0:
+                try:
+                    t0 = time.time()
+                    if self.wire_codec is not None:
+                        # put as bytes (see JobManager_Server compression)
+                        self.result_q.put(self.wire_codec.dumps_results(items))
+                    else:
+                        self.result_q.put(items)
+                    self.time_put += time.time() - t0
+                except Exception as e:
+                    self.error = e
+                    if self.verbose > 0:
+                        print("{}: failed to send {} results".format(self.identifier, len(items)))
+                    return
+            elif self._stop:
+                return
+
+
+# frame header: length and crc32 of the data that follows (see _write_frame)
+_FRAME_HEADER = struct.Struct('<QI')
+
+def _write_frame(f, data):
+    """write the bytes data to the file f as a frame (length, crc32, data)"""
+    f.write(_FRAME_HEADER.pack(len(data), zlib.crc32(data) & 0xffffffff))
+    f.write(data)
+    
+def _read_frame(f):
+    """return the data of the frame at the current position of the file f
+    
+    None if the frame is incomplete or corrupt (or at the end of the file).
+    """
+    h = f.read(_FRAME_HEADER.size)
+    if len(h) < _FRAME_HEADER.size:
+        return None
+    length, crc = _FRAME_HEADER.unpack(h)
+    # the length of a corrupt header might be huge
+    if length > os.fstat(f.fileno()).st_size - f.tell():
+        return None
+    data = f.read(length)
+    if (len(data) < length) or ((zlib.crc32(data) & 0xffffffff) != crc):
+        return None
+    return data
+
+
+# message of the out-of-band transport (zero_copy): kind and number of out-of-band buffers, 
+# followed by the size of each buffer and the pickled data (see _send_oob)
+_OOB_HEADER = struct.Struct('<BI')
+_OOB_RESULTS = 0
+_OOB_CONST_ARG = 1
+
+def _send_oob(conn, obj, kind=_OOB_RESULTS):
+    """send obj pickled with protocol 5, the buffers of numpy arrays are sent 
+    as separate messages directly from the memory of the arrays
+    """
+    buffers = []
+    data = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+    raw = [b.raw() for b in buffers]
+    sizes = struct.pack('<{}Q'.format(len(raw)), *[r.nbytes for r in raw])
+    conn.send_bytes(_OOB_HEADER.pack(kind, len(raw)) + sizes + data)
+    for r in raw:
+        conn.send_bytes(r)
+        
+def _recv_oob(conn):
+    """receive a message sent by _send_oob, return (kind, pickled data, buffers)
+    
+    Each buffer is received into a newly allocated bytearray, which becomes
+    the memory of the unpickled numpy array (pickle.loads(data, buffers=buffers)).
+    Connection.recv_bytes_into reads the message through an internal buffer 
+    first, so the data are copied once on the receiving side.
+    """
+    msg = conn.recv_bytes()
+    kind, n = _OOB_HEADER.unpack_from(msg)
+    sizes = struct.unpack_from('<{}Q'.format(n), msg, _OOB_HEADER.size)
+    data = memoryview(msg)[_OOB_HEADER.size + 8*n:]
+    buffers = []
+    for size in sizes:
+        buf = bytearray(size)
+        if size > 0:
+            conn.recv_bytes_into(buf)
+        else:
+            conn.recv_bytes()
+        buffers.append(buf)
+    return kind, data, buffers
+
+
+class _WireArg(object):
+    """an argument in the job_q encoded by a _WireCodec"""
+    __slots__ = ('data', )
+    def __init__(self, data):
+        self.data = data
+        
+    def __getstate__(self):
+        return self.data
+    
+    def __setstate__(self, data):
+        self.data = data
+        
+
+class _WireCodec(object):
+    """
+    serializes and compresses the messages sent between server and clients
+    (see JobManager_Server serializer and compression)
+    
+    Objects are converted to bytes by the serializer (None: PickleSerializer()).
+    Messages whose serialized size is at least threshold bytes are compressed
+    with codec ('zlib', 'bz2', 'lzma' or, if installed, 'lz4' and 'zstd', None:
+    no compression) at the given level (None: default level of the codec), unless
+    that does not make them smaller. The first byte of a message tells whether 
+    it is compressed. 
+    
+    The lists of (job_id, result) pairs of the clients are sent with dumps_results,
+    which applies the serializer to each result.
+    
+    The number of bytes before and after compression and the time spent 
+    are counted for the messages sent (dumps) and received (loads).
+    """
+    def __init__(self, codec='zlib', level=None, threshold=1024, serializer=None):
+        self.codec = codec
+        self.level = level
+        self.threshold = threshold
+        if codec is not None:
+            self._compress, self._decompress = _WireCodec.get_compressor(codec, level)
+        if serializer is None:
+            serializer = PickleSerializer()
+        self.serializer = serializer
+        # the list of results can be pickled as a whole
+        self._plain = isinstance(serializer, PickleSerializer)
+        
+        self.bytes_raw_sent = 0
+        self.bytes_sent = 0
+        self.time_compress = 0.
+        self.time_serialize = 0.
+        self.bytes_raw_received = 0
+        self.bytes_received = 0
+        self.time_decompress = 0.
+        self.time_deserialize = 0.
+        
+    @staticmethod
+    def get_compressor(codec, level):
+        """return the functions (compress, decompress) of codec"""
+        if codec == 'zlib':
+            if level is None:
+                level = -1
+            return (lambda data: zlib.compress(data, level)), zlib.decompress
+        elif codec == 'bz2':
+            import bz2
+            if level is None:
+                level = 9
+            return (lambda data: bz2.compress(data, level)), bz2.decompress
+        elif codec == 'lzma':
+            import lzma
+            return (lambda data: lzma.compress(data, preset=level)), lzma.decompress
+        elif codec == 'lz4':
+            try:
+                import lz4.frame
+            except ImportError:
+                raise RuntimeError("codec 'lz4' requires the package lz4")
+            if level is None:
+                level = 0
+            return (lambda data: lz4.frame.compress(data, compression_level=level)), lz4.frame.decompress
+        elif codec == 'zstd':
+            try:
+                import zstandard
+            except ImportError:
+                raise RuntimeError("codec 'zstd' requires the package zstandard")
+            if level is None:
+                level = 3
+            return zstandard.ZstdCompressor(level=level).compress, zstandard.ZstdDecompressor().decompress
+        else:
+            raise RuntimeError("unknown compression codec '{}'".format(codec))
+        
+    def _serialize(self, obj):
+        t0 = time.time()
+        data = self.serializer.dumps(obj)
+        self.time_serialize += time.time() - t0
+        return data
+    
+    def _deserialize(self, data):
+        t0 = time.time()
+        obj = self.serializer.loads(data)
+        self.time_deserialize += time.time() - t0
+        return obj
+    
+    def _pack(self, data):
+        self.bytes_raw_sent += len(data)
+        if (self.codec is not None) and (len(data) >= self.threshold):
+            t0 = time.time()
+            compressed = self._compress(data)
+            self.time_compress += time.time() - t0
+            if len(compressed) < len(data):
+                self.bytes_sent += len(compressed) + 1
+                return b'\x01' + compressed
+        self.bytes_sent += len(data) + 1
+        return b'\x00' + data
+    
+    def _unpack(self, msg):
+        self.bytes_received += len(msg)
+        data = memoryview(msg)[1:]
+        if msg[:1] == b'\x01':
+            t0 = time.time()
+            data = self._decompress(data)
+            self.time_decompress += time.time() - t0
+        self.bytes_raw_received += len(data)
+        return data
+    
+    def dumps(self, obj):
+        return self._pack(self._serialize(obj))
+    
+    def loads(self, msg):
+        return self._deserialize(self._unpack(msg))
+    
+    def dumps_results(self, items):
+        if self._plain:
+            return self.dumps(items)
+        items = [(job_id, self._serialize(result)) for job_id, result in items]
+        return self._pack(pickle.dumps(items, protocol=pickle.HIGHEST_PROTOCOL))
+    
+    def loads_results(self, msg):
+        if self._plain:
+            return self.loads(msg)
+        items = pickle.loads(self._unpack(msg))
+        if not isinstance(items, list):
+            # a single (job_id, result) pair
+            items = [items]
+        return [(job_id, self._deserialize(data)) for job_id, data in items]
+    
+    def encode_job(self, job):
+        job_id, arg = job
+        return job_id, _WireArg(self.dumps(arg))
+    
+    def decode_arg(self, arg):
+        if isinstance(arg, _WireArg):
+            return self.loads(arg.data)
+        return arg
+    
+    def statistics(self):
+        """return lines describing the size of the messages sent and received and the time spent"""
+        lines = []
+        for what, raw, wire, t, t_ser in [('sent', self.bytes_raw_sent, self.bytes_sent, 
+                                           self.time_compress, self.time_serialize),
+                                          ('received', self.bytes_raw_received, self.bytes_received, 
+                                           self.time_decompress, self.time_deserialize)]:
+            if wire > 0:
+                if self.codec is not None:
+                    line = "{:<8} : {} -> {} bytes (ratio {:.2f}), {} time {}, {} time {}".format(
+                           what, raw, wire, raw / wire, self.serializer.name, progress.humanize_time(t_ser),
+                           self.codec, progress.humanize_time(t))
+                else:
+                    line = "{:<8} : {} bytes, {} time {}".format(
+                           what, wire, self.serializer.name, progress.humanize_time(t_ser))
+                lines.append(line)
+        return lines
+
+
+# chunked dump format (see JobManager_Server.static_load)
+_DUMP_MAGIC = b'JMDUMP02'
+_DUMP_INDEX_POS = struct.Struct('<Q')
+_DUMP_CHUNK_SIZE = 10000    # items per chunk
+
+def _write_dump_chunks(f, items, chunk_size=None):
+    """write the items as frames of pickled lists of at most chunk_size items
+    
+    return the list of (offset, number of items) of the chunks
+    """
+    if chunk_size is None:
+        chunk_size = _DUMP_CHUNK_SIZE
+    chunks = []
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            chunks.append((f.tell(), len(chunk)))
+            _write_frame(f, pickle.dumps(chunk, protocol=pickle.HIGHEST_PROTOCOL))
+            chunk = []
+    if len(chunk) > 0:
+        chunks.append((f.tell(), len(chunk)))
+        _write_frame(f, pickle.dumps(chunk, protocol=pickle.HIGHEST_PROTOCOL))
+    return chunks
+
+def _write_dump(f, numjobs, numresults, final_result, args_items, fail_list, spill_state, 
+                final_result_from=None):
+    """write the state of a JobManager_Server in the chunked dump format
+    
+    The file starts with _DUMP_MAGIC and the position of the index, followed
+    by the chunks (see _write_dump_chunks) of the sections 'final_result',
+    'args' (the (job_id, arg) pairs of the pending jobs) and 'fail_list'. 
+    The index (the last frame) holds the counters, the state of the spill 
+    and the chunks of each section. If final_result is not a list it is
+    written as a single chunk holding the object itself.
+    
+    final_result_from [(fname, chunks)/None] - chunks of the final_result section
+    of the dump fname, copied (without unpickling) in front of final_result.
+    """
+    f.write(_DUMP_MAGIC)
+    pos_of_index_pos = f.tell()
+    f.write(_DUMP_INDEX_POS.pack(0))
+    
+    final_result_is_list = isinstance(final_result, list)
+    final_result_chunks = []
+    if final_result_from is not None:
+        fname_from, chunks = final_result_from
+        with open(fname_from, 'rb') as f_from:
+            for offset, n in chunks:
+                f_from.seek(offset)
+                data = _read_frame(f_from)
+                if data is None:
+                    raise RuntimeError("corrupt chunk in dump '{}' at offset {}".format(fname_from, offset))
+                final_result_chunks.append((f.tell(), n))
+                _write_frame(f, data)
+    if final_result_is_list:
+        final_result_chunks += _write_dump_chunks(f, final_result)
+    else:
+        final_result_chunks.append((f.tell(), 1))
+        _write_frame(f, pickle.dumps(final_result, protocol=pickle.HIGHEST_PROTOCOL))
+    
+    index = {'numjobs'              : numjobs,
+             'numresults'           : numresults,
+             'final_result_is_list' : final_result_is_list,
+             'spill'                : spill_state,
+             'sections'             : {'final_result' : final_result_chunks,
+                                       'args'         : _write_dump_chunks(f, args_items),
+                                       'fail_list'    : _write_dump_chunks(f, fail_list)}}
+    index_pos = f.tell()
+    _write_frame(f, pickle.dumps(index, protocol=pickle.HIGHEST_PROTOCOL))
+    f.seek(pos_of_index_pos)
+    f.write(_DUMP_INDEX_POS.pack(index_pos))
+    f.seek(0, os.SEEK_END)
+    
+def _read_dump_index(f):
+    """return the index of a chunked dump, None for a dump of the former sequential format
+    
+    The file position is reset to the start in the latter case.
+    """
+    if f.read(len(_DUMP_MAGIC)) != _DUMP_MAGIC:
+        f.seek(0)
+        return None
+    index_pos, = _DUMP_INDEX_POS.unpack(f.read(_DUMP_INDEX_POS.size))
+    f.seek(index_pos)
+    data = _read_frame(f)
+    if data is None:
+        raise RuntimeError("dump is incomplete or corrupt (no valid index)")
+    return pickle.loads(data)
+
+def _read_dump_chunks(f, chunks):
+    """yield the items of the chunks [(offset, n), ...] of a chunked dump"""
+    for offset, n in chunks:
+        f.seek(offset)
+        data = _read_frame(f)
+        if data is None:
+            raise RuntimeError("dump is corrupt (chunk at offset {})".format(offset))
+        for item in pickle.loads(data):
+            yield item
+
+
+class _Journal(object):
+    """
+    append-only file of records (any picklable object)
+    
+    Each record is written as a frame: the length and the crc32 of the
+    pickled record followed by the pickled record (see _write_frame). 
+    The file is synced to disk (fsync) when max_unsynced records
+    have been appended or when the last sync is older than sync_interval
+    seconds, and on sync() and close().
+    
+    read yields the records of a journal file. It stops at the first
+    incomplete or corrupt frame, as left by a crash while writing. Opening 
+    the journal to append removes such a frame first.
+    """
+    def __init__(self, fname, max_unsynced=1000, sync_interval=1):
+        self.fname = fname
+        self.max_unsynced = max_unsynced
+        self.sync_interval = sync_interval
+        
+        if os.path.isfile(fname):
+            end = 0
+            for record, end in _Journal._iter_frames(fname):
+                pass
+            if end < os.path.getsize(fname):
+                with open(fname, 'r+b') as f:
+                    f.truncate(end)
+        
+        self._f = open(fname, 'ab')
+        self._n_unsynced = 0
+        self._t_sync = time.time()
+        
+    def append(self, record):
+        _write_frame(self._f, pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL))
+        self._n_unsynced += 1
+        if ( (self._n_unsynced >= self.max_unsynced) or 
+             (time.time() - self._t_sync > self.sync_interval) ):
+            self.sync()
+            
+    def sync(self):
+        if self._n_unsynced > 0:
+            self._f.flush()
+            os.fsync(self._f.fileno())
+            self._n_unsynced = 0
+        self._t_sync = time.time()
+    
+    def close(self):
+        self.sync()
+        self._f.close()
+        
+    @staticmethod
+    def _iter_frames(fname):
+        """yield (record, position after the frame)"""
+        with open(fname, 'rb') as f:
+            while True:
+                data = _read_frame(f)
+                if data is None:
+                    return
+                yield pickle.loads(data), f.tell()
+                
+    @staticmethod
+    def read(fname):
+        for record, pos in _Journal._iter_frames(fname):
+            yield record
+    
+
+class _JobSpill(object):
+    """
+    append-only store of pending jobs (job_id, arg) on disk
+    
+    The jobs are pickled one after another to segment files holding at most
+    segment_size jobs each. read returns the jobs in the order they have been
+    appended. A segment file is removed as soon as all its jobs have been read.
+    
+    get_state returns the segment files and the read position (picklable),
+    passing it as state to a new instance continues reading where the old
+    one stopped. In that case the old instance must be closed with remove=False.
+    The new instance does not remove the segment files of that state (the dump 
+    holding the state may be read again) until release_loaded is called.
+    """
+    def __init__(self, directory=None, segment_size=100000, state=None):
+        self.directory = directory
+        self.segment_size = segment_size
+        
+        self._segments = collections.deque()  # [file name, number of jobs]
+        self._seg_write = None   # the segment appended to
+        self._f_write = None
+        self._f_read = None      # opened for the first segment
+        self._n_read = 0         # number of jobs read from the first segment
+        self._offset = 0         # position in the first segment
+        self._len = 0
+        
+        # segment files of the state passed, kept until release_loaded
+        self._loaded = set()
+        self._loaded_done = []
+        
+        if state is not None:
+            for fname, n in state['segments']:
+                self._segments.append([fname, n])
+                self._loaded.add(fname)
+            self._n_read = state['n_read']
+            self._offset = state['offset']
+            self._len = sum(n for fname, n in self._segments) - self._n_read
+        
+    def __len__(self):
+        return self._len
+    
+    def append(self, job):
+        if (self._seg_write is None) or (self._seg_write[1] >= self.segment_size):
+            if self._f_write is not None:
+                self._f_write.close()
+            fd, fname = tempfile.mkstemp(prefix='jobmanager_spill_', suffix='.seg', dir=self.directory)
+            self._f_write = os.fdopen(fd, 'wb')
+            self._seg_write = [os.path.abspath(fname), 0]
+            self._segments.append(self._seg_write)
+            
+        pickle.dump(job, self._f_write, protocol=pickle.HIGHEST_PROTOCOL)
+        self._seg_write[1] += 1
+        self._len += 1
+        
+    def read(self, n):
+        """return a list of at most n jobs"""
+        jobs = []
+        while (len(jobs) < n) and (self._len > 0):
+            seg = self._segments[0]
+            if self._n_read == seg[1]:
+                # segment done, there are more jobs in the next one
+                self.__remove_first_segment()
+                continue
+            
+            if self._f_read is None:
+                self._f_read = open(seg[0], 'rb')
+                self._f_read.seek(self._offset)
+            if seg is self._seg_write:
+                self._f_write.flush()
+                
+            jobs.append(pickle.load(self._f_read))
+            self._n_read += 1
+            self._len -= 1
+        
+        if self._f_read is not None:
+            self._offset = self._f_read.tell()
+        return jobs
+    
+    def __remove_first_segment(self):
+        seg = self._segments.popleft()
+        if self._f_read is not None:
+            self._f_read.close()
+            self._f_read = None
+        if seg is self._seg_write:
+            self._f_write.close()
+            self._f_write = None
+            self._seg_write = None
+        if seg[0] in self._loaded:
+            self._loaded_done.append(seg[0])
+        elif os.path.isfile(seg[0]):
+            os.remove(seg[0])
+        self._n_read = 0
+        self._offset = 0
+    
+    def get_state(self):
+        if self._f_write is not None:
+            self._f_write.flush()
+        return {'segments': [tuple(seg) for seg in self._segments],
+                'n_read'  : self._n_read,
+                'offset'  : self._offset}
+        
+    def release_loaded(self):
+        """remove the segment files of the state passed to __init__ which have
+        been read completely, call when that state is not needed anymore"""
+        for fname in self._loaded_done:
+            if os.path.isfile(fname):
+                os.remove(fname)
+        self._loaded = set()
+        self._loaded_done = []
+        
+    def close(self, remove=True):
+        """close the files, remove=True also removes the segment files
+        (except those of the state passed to __init__, see release_loaded)"""
+        if self._f_read is not None:
+            self._f_read.close()
+            self._f_read = None
+        if self._f_write is not None:
+            self._f_write.close()
+            self._f_write = None
+            self._seg_write = None
+        if remove:
+            while len(self._segments) > 0:
+                fname = self._segments.popleft()[0]
+                if (fname not in self._loaded) and os.path.isfile(fname):
+                    os.remove(fname)
+            self._len = 0
+            
+
+class _ConstArgStore(object):
+    """
+    holds the current const_arg with its version and hash in the SyncManager 
+    process (see JobManager_Server.set_const_arg)
+    """
+    def __init__(self, const_arg, version, hash):
+        self.set(const_arg, version, hash)
+        
+    def set(self, const_arg, version, hash):
+        self.const_arg = const_arg
+        self.version = version
+        self.hash = hash
+        
+    def info(self):
+        """return (version, hash)"""
+        return self.version, self.hash
+
+
+class _CopyId(int):
+    """the job id of a speculative copy of a job (see JobQueue), it equals the 
+    job id and tells the server that the result came from the copy"""
+    __slots__ = ()
+    
+
+class _VersionedArg(object):
+    """an argument in the job_q which requires const_arg of the given version"""
+    __slots__ = ('version', 'arg')
+    def __init__(self, version, arg):
+        self.version = version
+        self.arg = arg
+        
+    def __getstate__(self):
+        return (self.version, self.arg)
+    
+    def __setstate__(self, state):
+        self.version, self.arg = state
+        
+
+class _ConstArgSwitch(object):
+    """
+    switches the workers of a client to a new version of the const_arg 
+    (see JobManager_Server.set_const_arg), which is fetched once per client
+    
+    A background thread of the client process serves the requests of the
+    workers, one after the other. If a worker asks for a version other than
+    the current one, fetch() is called to get the current (const_arg, version)
+    of the server (see JobManager_Client._switch_const_arg). The workers get 
+    it through a pipe of their own, or the exception raised by fetch.
+    
+    Create it before the workers are forked, get(i, version) is called
+    by worker i.
+    """
+    def __init__(self, const_arg, version, fetch, nproc):
+        self.const_arg = const_arg
+        self.version = version
+        self.fetch = fetch
+        self._requests = mp.Queue()
+        self._pipes = [mp.Pipe(duplex=False) for i in range(nproc)]
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        
+    def start(self):
+        self._thread.start()
+        
+    def get(self, i, version):
+        """return (const_arg, version), the current one if it is not version"""
+        self._requests.put((i, version))
+        answer = self._pipes[i][0].recv()
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+    
+    def close(self, timeout=None):
+        self._requests.put(None)
+        self._thread.join(timeout)
+        for r, w in self._pipes:
+            r.close()
+            w.close()
+        self._requests.close()
+    
+    def _run(self):
+        while True:
+            request = self._requests.get()
+            if request is None:
+                return
+            i, version = request
+            try:
+                if version != self.version:
+                    self.const_arg, self.version = self.fetch()
+                answer = (self.const_arg, self.version)
+            except Exception as e:
+                answer = e
+            try:
+                self._pipes[i][1].send(answer)
+            # e.g. the exception can not be pickled
+            except Exception as e:
+                self._pipes[i][1].send(RuntimeError("could not get const_arg version {}: {}".format(version, e)))
+            
+
+# numpy arrays of const_arg shared among the processes of a host
+# (see JobManager_Client shared_const_arg)
+_SHARED_MIN_NBYTES = 2**16  # smaller arrays are simply copied
+
+def _host_local_dir():
+    """/dev/shm if available, otherwise the default temporary directory"""
+    if os.path.isdir('/dev/shm'):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+class _SharedArray(object):
+    """reference to a numpy array stored in a host-local .npy file"""
+    __slots__ = ('fname', )
+    def __init__(self, fname):
+        self.fname = fname
+        
+    def __getstate__(self):
+        return self.fname
+    
+    def __setstate__(self, fname):
+        self.fname = fname
+    
+    def load(self):
+        """map the array read-only"""
+        return np.load(self.fname, mmap_mode='r')
+
+def _content_hash(obj):
+    """SHA-1 hex digest of obj
+    
+    The data of numpy arrays (also within tuples, lists and dicts) are hashed
+    directly, anything else is pickled first.
+    """
+    h = hashlib.sha1()
+    def update(obj):
+        if isinstance(obj, np.ndarray) and not obj.dtype.hasobject:
+            h.update(b'ndarray' + obj.dtype.str.encode('ascii') + str(obj.shape).encode('ascii'))
+            h.update(memoryview(np.ascontiguousarray(obj)).cast('B'))
+        elif type(obj) in (tuple, list):
+            h.update('{}{}'.format(type(obj).__name__, len(obj)).encode('ascii'))
+            for x in obj:
+                update(x)
+        elif type(obj) is dict:
+            h.update('dict{}'.format(len(obj)).encode('ascii'))
+            for k, v in obj.items():
+                update(k)
+                update(v)
+        else:
+            h.update(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+    update(obj)
+    return h.hexdigest()
+
+class _SharedFileLock(object):
+    """
+    shared lock (flock) on a file of shared_const_arg, held by every client 
+    using the file as long as it may be needed
+    
+    release removes the file if no other client holds a lock on it, so the
+    file stays as long as any client on the host uses it.
+    """
+    def __init__(self, fname):
+        self.fname = fname
+        self.fd = os.open(fname, os.O_RDONLY)
+        try:
+            fcntl.flock(self.fd, fcntl.LOCK_SH)
+            # the last client using the file may have removed it in the meantime
+            st = os.fstat(self.fd)
+            st_name = os.stat(fname)
+            if (st.st_dev, st.st_ino) != (st_name.st_dev, st_name.st_ino):
+                raise FileNotFoundError(fname)
+        except:
+            os.close(self.fd)
+            raise
+        
+    def release(self):
+        try:
+            fcntl.flock(self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        # still used by other clients
+        except OSError:
+            pass
+        else:
+            try:
+                os.remove(self.fname)
+            except OSError:
+                pass
+        finally:
+            os.close(self.fd)
+
+def _share_array(a, directory):
+    """store the array a in directory in a file named by the hash of its content,
+    unless the file exists already
+    
+    return the _SharedArray and the _SharedFileLock held on the file
+    """
+    a = np.ascontiguousarray(a)
+    fname = os.path.join(directory, 'jobmanager_const_arg_{}.npy'.format(_content_hash(a)))
+    while True:
+        try:
+            return _SharedArray(fname), _SharedFileLock(fname)
+        except FileNotFoundError:
+            pass
+        # write under a temporary name, so other clients never see a partial file
+        fname_tmp = '{}.{}.tmp'.format(fname, os.getpid())
+        with open(fname_tmp, 'wb') as f:
+            np.save(f, a, allow_pickle=False)
+        try:
+            # unlike rename, link does not replace a file created by another client
+            os.link(fname_tmp, fname)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(fname_tmp)
+
+def _share_const_arg(const_arg, directory):
+    """replace the numpy arrays (of at least _SHARED_MIN_NBYTES) in const_arg, also 
+    within tuples, lists and dicts, by _SharedArray references
+    
+    return the new const_arg and the list of _SharedFileLocks held on the files, 
+    release them when the files are not needed anymore
+    """
+    locks = []
+    def share(obj):
+        if isinstance(obj, np.ndarray):
+            if obj.dtype.hasobject or (obj.nbytes < _SHARED_MIN_NBYTES):
+                return obj
+            ref, lock = _share_array(obj, directory)
+            locks.append(lock)
+            return ref
+        elif type(obj) is tuple:
+            return tuple(share(x) for x in obj)
+        elif type(obj) is list:
+            return [share(x) for x in obj]
+        elif type(obj) is dict:
+            return {k: share(v) for k, v in obj.items()}
+        return obj
+    return share(const_arg), locks
+
+def _load_shared_const_arg(const_arg):
+    """replace the _SharedArray references in const_arg by the read-only mapped arrays"""
+    if isinstance(const_arg, _SharedArray):
+        return const_arg.load()
+    elif type(const_arg) is tuple:
+        return tuple(_load_shared_const_arg(x) for x in const_arg)
+    elif type(const_arg) is list:
+        return [_load_shared_const_arg(x) for x in const_arg]
+    elif type(const_arg) is dict:
+        return {k: _load_shared_const_arg(v) for k, v in const_arg.items()}
+    return const_arg
+    
+
+class _BlobStore(object):
+    """the pickled blobs by their hash, lives in the SyncManager process (see JobManager_Server.put_blob)"""
+    def __init__(self):
+        self._blobs = {}
+        
+    def put(self, hash, data):
+        self._blobs[hash] = data
+        
+    def get(self, hash):
+        """the pickled blob, None if unknown"""
+        return self._blobs.get(hash)
+    
+    def __len__(self):
+        return len(self._blobs)
+    
+
+class _BlobCache(object):
+    """
+    host-local cache of the blobs referred to by the arguments (see BlobRef)
+    
+    Each blob is a file in directory named by its hash, numpy arrays as .npy 
+    (mapped read-only), anything else pickled. All clients of a host share 
+    the files. Using a blob updates the modification time of its file, when 
+    the files exceed max_bytes in total, the least recently used are removed.
+    Processes still mapping a removed file are not affected.
+    """
+    def __init__(self, directory, max_bytes=2**30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.fetched = 0
+        self.bytes_fetched = 0
+        
+    def __fname(self, hash, ext):
+        return os.path.join(self.directory, 'jobmanager_blob_{}{}'.format(hash, ext))
+        
+    def get(self, hash):
+        """return (True, blob) if hash is in the cache, (False, None) otherwise"""
+        for ext in ['.npy', '.pickle']:
+            fname = self.__fname(hash, ext)
+            try:
+                if ext == '.npy':
+                    blob = np.load(fname, mmap_mode='r')
+                else:
+                    with open(fname, 'rb') as f:
+                        blob = pickle.load(f)
+                os.utime(fname, None)
+            # not cached (or just removed by another process)
+            except (IOError, OSError):
+                continue
+            return True, blob
+        return False, None
+    
+    def put(self, hash, blob):
+        if isinstance(blob, np.ndarray) and not blob.dtype.hasobject:
+            fname = self.__fname(hash, '.npy')
+            write = lambda f: np.save(f, blob, allow_pickle=False)
+        else:
+            fname = self.__fname(hash, '.pickle')
+            write = lambda f: pickle.dump(blob, f, protocol=pickle.HIGHEST_PROTOCOL)
+        # other processes must never see a partial file
+        fname_tmp = '{}.{}.tmp'.format(fname, os.getpid())
+        with open(fname_tmp, 'wb') as f:
+            write(f)
+        os.rename(fname_tmp, fname)
+        self.evict(keep=fname)
+        
+    def evict(self, keep=None):
+        """remove the least recently used blobs until at most max_bytes are left"""
+        files = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.startswith('jobmanager_blob_') or name.endswith('.tmp'):
+                continue
+            fname = os.path.join(self.directory, name)
+            try:
+                st = os.stat(fname)
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, fname))
+            total += st.st_size
+        files.sort()
+        for mtime, size, fname in files:
+            if total <= self.max_bytes:
+                break
+            if fname == keep:
+                continue
+            try:
+                os.remove(fname)
+            except OSError:
+                pass
+            total -= size
+            
+    def fetch(self, hash, blob_store):
+        """the blob from the cache, or from the blob_store (proxy) of the server"""
+        found, blob = self.get(hash)
+        if found:
+            self.hits += 1
+            return blob
+        data = blob_store.get(hash)
+        if data is None:
+            raise RuntimeError("blob {} is unknown to the server".format(hash))
+        if hashlib.sha1(data).hexdigest() != hash:
+            raise RuntimeError("blob {} corrupted during transfer".format(hash))
+        self.fetched += 1
+        self.bytes_fetched += len(data)
+        blob = pickle.loads(data)
+        self.put(hash, blob)
+        return blob
+    
+    def resolve(self, arg, blob_store):
+        """replace the BlobRefs in arg, also within tuples and dicts, by the blobs"""
+        if isinstance(arg, BlobRef):
+            return self.fetch(arg.hash, blob_store)
+        elif type(arg) is tuple:
+            return tuple(self.resolve(x, blob_store) for x in arg)
+        elif type(arg) is dict:
+            return {k: self.resolve(v, blob_store) for k, v in arg.items()}
+        return arg
+
+
+class _BroadcastSeeder(object):
+    """
+    serves the chunks of a byte string (the pickled const_arg) to other
+    processes (see JobManager_Server const_arg_broadcast)
+    
+    The server starts it with the complete data, a client with size only 
+    and adds the chunks as it receives them (put). A request is the index 
+    of a chunk, the answer the chunk or empty bytes if it is not available 
+    (yet). The listener is bound to all interfaces on port (0: any free port).
+    """
+    def __init__(self, authkey, data=None, size=None, chunk_size=2**22, port=0):
+        self.authkey = bytes(authkey)
+        self.chunk_size = chunk_size
+        self._lock = threading.Lock()
+        self.bytes_served = 0
+        if data is not None:
+            self.reset(data)
+        else:
+            self.size = size
+            self._data = bytearray(size)
+            self._have = set()
+        self._closed = False
+        self._listener = mp_connection.Listener(address=('', port), authkey=self.authkey)
+        self.port = self._listener.address[1]
+        t = threading.Thread(target=self.__accept)
+        t.daemon = True
+        t.start()
+        
+    @property
+    def num_chunks(self):
+        return (self.size + self.chunk_size - 1) // self.chunk_size
+        
+    def reset(self, data):
+        """serve the complete data from now on"""
+        with self._lock:
+            self.size = len(data)
+            self._data = data
+            self._have = set(range(self.num_chunks))
+            
+    def manifest(self):
+        """size, chunk size and SHA-1 of each chunk of the data"""
+        view = memoryview(self._data)
+        return {'size'         : self.size,
+                'chunk_size'   : self.chunk_size,
+                'port'         : self.port,
+                'chunk_hashes' : [hashlib.sha1(view[i*self.chunk_size:(i+1)*self.chunk_size]).hexdigest() 
+                                  for i in range(self.num_chunks)]}
+                                  
+    def put(self, index, chunk):
+        self._data[index*self.chunk_size:index*self.chunk_size + len(chunk)] = chunk
+        with self._lock:
+            self._have.add(index)
+            
+    def getvalue(self):
+        return bytes(self._data)
+    
+    def __accept(self):
+        while True:
+            try:
+                conn = self._listener.accept()
+            except mp_connection.AuthenticationError:
+                continue
+            # listener was closed
+            except (OSError, EOFError):
+                return
+            if self._closed:
+                conn.close()
+                return
+            t = threading.Thread(target=self.__serve, args=(conn,))
+            t.daemon = True
+            t.start()
+            
+    def __serve(self, conn):
+        try:
+            while True:
+                index = conn.recv()
+                # closing the listener does not interrupt a pending accept
+                if self._closed:
+                    break
+                with self._lock:
+                    data = self._data
+                    have = index in self._have
+                if have:
+                    start = index*self.chunk_size
+                    size = min(self.chunk_size, len(data) - start)
+                    # counted before sending, the receiver may check the count
+                    # as soon as it has the chunk
+                    with self._lock:
+                        self.bytes_served += size
+                    conn.send_bytes(data, start, size)
+                else:
+                    conn.send_bytes(b'')
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+            
+    def close(self):
+        self._closed = True
+        self._listener.close()
+        
+
+class _BroadcastTracker(object):
+    """
+    knows the manifest (see _BroadcastSeeder.manifest) of the broadcast 
+    const_arg and which clients hold which chunk, lives in the SyncManager
+    process (see JobManager_Server const_arg_broadcast)
+    """
+    def __init__(self, manifest):
+        self.reset(manifest)
+        
+    def reset(self, manifest):
+        self._manifest = manifest
+        self._holders = [[] for i in range(len(manifest['chunk_hashes']))]
+        
+    def manifest(self):
+        return self._manifest
+    
+    def have(self, address, index):
+        """the seeder at address holds chunk index"""
+        self._holders[index].append(tuple(address))
+        
+    def sources(self, index, n=3):
+        """up to n randomly chosen addresses of seeders holding chunk index"""
+        holders = self._holders[index]
+        return random.sample(holders, min(n, len(holders)))
+    
+    def remove(self, address):
+        """the seeder at address is gone"""
+        address = tuple(address)
+        for holders in self._holders:
+            if address in holders:
+                holders.remove(address)
+
+def _local_address(server, port):
+    """the ip address of this host as seen from the network to server"""
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        s.connect((server, port))
+        return s.getsockname()[0]
+    finally:
+        s.close()
+
+def _fetch_broadcast(server, authkey, tracker, seed=True, identifier=None, verbose=0):
+    """receive the broadcast const_arg (see JobManager_Server const_arg_broadcast)
+    
+    The chunks are fetched in random order, so that the clients starting at 
+    the same time hold different chunks. For each chunk the tracker names a 
+    few other clients holding it, the server is asked only if none of them 
+    delivers. A chunk is accepted if its SHA-1 matches the manifest. With seed
+    a _BroadcastSeeder serves the chunks received so far to other clients.
+    
+    return the const_arg and the seeder (None without seed)
+    """
+    authkey = bytes(authkey)
+    manifest = copy.deepcopy(tracker.manifest())
+    num_chunks = len(manifest['chunk_hashes'])
+    server_address = (server, manifest['port'])
+    if seed:
+        seeder = _BroadcastSeeder(authkey=authkey, size=manifest['size'], chunk_size=manifest['chunk_size'])
+        address = (_local_address(server, manifest['port']), seeder.port)
+        data = seeder._data
+    else:
+        seeder = None
+        data = bytearray(manifest['size'])
+    
+    conns = {}
+    def get_chunk(address, index):
+        """the chunk from the seeder at address, None if that fails"""
+        try:
+            if address not in conns:
+                conns[address] = mp_connection.Client(address, authkey=authkey)
+            conns[address].send(index)
+            return conns[address].recv_bytes()
+        except (OSError, EOFError, mp_connection.AuthenticationError):
+            conns.pop(address, None)
+            if address != server_address:
+                tracker.remove(address)
+            return None
+    
+    bytes_from_server = 0
+    order = list(range(num_chunks))
+    random.shuffle(order)
+    try:
+        for index in order:
+            sources = [tuple(a) for a in copy.deepcopy(tracker.sources(index))] + [server_address]
+            for source in sources:
+                chunk = get_chunk(source, index)
+                if (chunk is not None) and (hashlib.sha1(chunk).hexdigest() == manifest['chunk_hashes'][index]):
+                    break
+            else:
+                raise RuntimeError("chunk {} of the const_arg is not available".format(index))
+            if source == server_address:
+                bytes_from_server += len(chunk)
+            if seeder is not None:
+                seeder.put(index, chunk)
+                tracker.have(address, index)
+            else:
+                data[index*manifest['chunk_size']:index*manifest['chunk_size'] + len(chunk)] = chunk
+    finally:
+        for conn in conns.values():
+            conn.close()
+    if verbose > 1:
+        print("{}: received const_arg ({} bytes), {} bytes from the server, the rest from other clients".format(
+              identifier, manifest['size'], bytes_from_server))
+    return pickle.loads(data), seeder
+
+
+class _DirectResultChannel(object):
+    """
+    sends lists of results as pickled bytes directly to the server
+    process (see JobManager_Server result_port)
+    
+    Provides the put method of the result_q, so it can be used by the
+    _ResultUploader instead. The connection is established on the first put.
+    
+    With zero_copy the data of numpy arrays are sent as out-of-band
+    buffers (see _send_oob), get_const_arg receives the const_arg that way.
+    """
+    def __init__(self, address, authkey, zero_copy=False):
+        self.address = address
+        self.authkey = bytes(authkey)
+        self.zero_copy = zero_copy
+        self._conn = None
+        
+    def __connect(self):
+        if self._conn is None:
+            self._conn = mp_connection.Client(self.address, authkey=self.authkey)
+        
+    def put(self, results):
+        self.__connect()
+        if self.zero_copy:
+            _send_oob(self._conn, results)
+        elif isinstance(results, bytes):
+            # already encoded by a _WireCodec
+            self._conn.send_bytes(results)
+        else:
+            self._conn.send_bytes(pickle.dumps(results, protocol=pickle.HIGHEST_PROTOCOL))
+            
+    def get_const_arg(self):
+        self.__connect()
+        _send_oob(self._conn, None, kind=_OOB_CONST_ARG)
+        kind, data, buffers = _recv_oob(self._conn)
+        return pickle.loads(data, buffers=buffers)
+        
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class _JobFetcher(object):
+    """
+    fetches chunks of arguments from the job_q in a background thread
+    
+    At most depth chunks of (at most) batch_size arguments are held
+    ahead. get() returns the next chunk as list, or None if there will
+    be no more chunks, because the job_q was found empty, njobs arguments
+    have been fetched or job_q.get failed. In the latter case the exception
+    is stored as attribute error.
+    
+    close() stops the thread and returns all arguments fetched but not
+    passed on via get(), so they can be put back to the job_q. It waits 
+    for a pending request of the thread, also beyond its timeout.
+    """
+    def __init__(self, job_q, batch_size=1, depth=1, njobs=-1, identifier=None, verbose=0, client_id=None):
+        self.job_q = job_q
+        self.batch_size = batch_size
+        self.depth = depth
+        self.njobs = njobs    # negative means no limit
+        self.identifier = identifier
+        self.client_id = client_id  # see ChunkSizer
+        self.verbose = verbose
+        
+        self.error = None
+        
+        # reported to the server when batch_size is 'auto' (see ChunkSizer),
+        # time_per_job is set by the worker
+        self.time_per_job = None
+        self.time_per_request = None
+        self._time_get = 0.
+        self._cnt_get = 0
+        
+        self._chunks = collections.deque()
+        self._done = False    # no more chunks will be added
+        self._stop = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        
+    def start(self):
+        self._thread.start()
+        
+    def get(self):
+        with self._cond:
+            while (len(self._chunks) == 0) and (not self._done):
+                self._cond.wait()
+            if len(self._chunks) == 0:
+                return None
+            chunk = self._chunks.popleft()
+            self._cond.notify_all()
+            return chunk
+        
+    def close(self, timeout=None):
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        
+        with self._cond:
+            if not self._done:
+                if self.verbose > 0:
+                    print("{}: job fetcher did not finish within {}s, wait for its request".format(self.identifier, timeout))
+                # the chunk of the pending request has to be put back as well
+                while not self._done:
+                    self._cond.wait()
+            args = [a for chunk in self._chunks for a in chunk]
+            self._chunks.clear()
+        return args
+    
+    def _run(self):
+        try:
+            while self.njobs != 0:
+                with self._cond:
+                    while (len(self._chunks) >= self.depth) and (not self._stop):
+                        self._cond.wait()
+                    if self._stop:
+                        return
+                
+                try:
+                    t0 = time.time()
+                    chunk = _fetch_chunk(self.job_q, self.batch_size, self.njobs, self.client_id,
+                                         self.time_per_job, self.time_per_request)
+                    self._time_get += time.time() - t0
+                    self._cnt_get += 1
+                    self.time_per_request = self._time_get / self._cnt_get
+                except _JobsPending:
+                    continue
+                except queue.Empty:
+                    return
+                except Exception as e:
+                    self.error = e
+                    return
+                
+                self.njobs -= len(chunk)
+                # also when stopped in the meantime, close() will
+                # return the chunk to be put back to the job_q 
+                with self._cond:
+                    self._chunks.append(chunk)
+                    self._cond.notify_all()
+        finally:
+            with self._cond:
+                self._done = True
+                self._cond.notify_all()
+
+
+class _Heartbeat(object):
+    """
+    renews the lease of the jobs held by a worker (see JobManager_Server
+    lease_time) by calling job_q.heartbeat(client_id) every interval 
+    seconds in a background thread
+    
+    If the call fails, the thread stops, the worker itself notices a
+    server gone down by its next queue operation.
+    
+    The heartbeat returns the ids of jobs done by other clients (see 
+    JobManager_Server speculative_copies), skip(job_id) tells the worker
+    not to process such a job.
+    """
+    def __init__(self, job_q, client_id, interval, identifier=None, verbose=0):
+        self.job_q = job_q
+        self.client_id = client_id
+        self.interval = interval
+        self.identifier = identifier
+        self.verbose = verbose
+        
+        self._cancelled = set()
+        self._lock = threading.Lock()
+        self.num_skipped = 0
+        
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        
+    def start(self):
+        self._thread.start()
+        
+    def close(self, timeout=None):
+        self._stop.set()
+        self._thread.join(timeout)
+        
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                cancelled = self.job_q.heartbeat(self.client_id)
+            except Exception as e:
+                if self.verbose > 1:
+                    print("{}: heartbeat failed ({}), stop sending heartbeats".format(self.identifier, e))
+                return
+            with self._lock:
+                self._cancelled.update(cancelled)
+                
+    def skip(self, job_id):
+        """True if the result of the job has been received from another client"""
+        with self._lock:
+            if job_id in self._cancelled:
+                self._cancelled.remove(job_id)
+                self.num_skipped += 1
+                return True
+        return False
+
 
 # a list of all names of the implemented python signals
 all_signals = [s for s in dir(signal) if (s.startswith('SIG') and s[3] != '_')]
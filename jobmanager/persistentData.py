@@ -400,6 +400,22 @@ class PersistentDataStructure(object):
             self.db.commit()
         
         
+    def update(self, items):
+        """
+            write the (key, value) pairs of items to the data base
+            
+            same as the '[]' operator for each pair, but with a single
+            commit at the end
+        """
+        self.need_open()
+        for key, value in items:
+            self.__check_key(key)
+            if isinstance(value, PersistentDataStructure):
+                self.setDataFromSubData(key, value)
+            else:
+                self.db[key] = value
+        self.db.commit()
+        
     # implements '[]' operator deletion
     def __delitem__(self, key):
         self.need_open()
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-from .jobmanager import JobManager_Server
+from .jobmanager import JobManager_Server, ResultSink
 import pickle 
 
 def recursive_scan_for_instance(obj, type, explicit_exclude = None ):
@@ -95,3 +95,23 @@ class PersistentData_Server(JobManager_Server):
         
         return False
         
+
+
+class PersistentDataSink(ResultSink):
+    """
+    result sink (see JobManager_Server result_sink) storing (arg, result) 
+    in a PersistentDataStructure
+    
+    The key is given by key(arg), default data_as_binary_key(arg). Each 
+    batch is written with a single commit (see PersistentDataStructure.update).
+    The data structure is not closed by the sink.
+    """
+    def __init__(self, persistent_data_structure, key=None, batch_size=1000):
+        super(PersistentDataSink, self).__init__(batch_size=batch_size)
+        self.pds = persistent_data_structure
+        if key is None:
+            key = data_as_binary_key
+        self.key = key
+        
+    def write(self, items):
+        self.pds.update([(self.key(arg), (arg, result)) for arg, result in items])
@@ -2,10 +2,15 @@
 # -*- coding: utf-8 -*-
 from __future__ import division, print_function
 
+import hashlib
 import os
+import pickle
+import shutil
 import sys
+import tempfile
 import time
 import signal
+import threading
 import multiprocessing as mp
 import numpy as np
 import traceback
@@ -19,6 +24,24 @@ from jobmanager import jobmanager, progress
 PORT = 42525
 AUTHKEY = 'testing'
 
+# the tests write dumps, journals and tracebacks to the working
+# directory, so run them in a temporary one
+_CWD = None
+_TMP_DIR = None
+
+def setup_module(module):
+    global _CWD, _TMP_DIR
+    _CWD = os.getcwd()
+    _TMP_DIR = tempfile.mkdtemp(prefix='jobmanager_tests_')
+    os.chdir(_TMP_DIR)
+    
+def teardown_module(module):
+    # remove the directory of setup_module only, the current working
+    # directory may be another one by then
+    os.chdir(_CWD)
+    if _TMP_DIR is not None:
+        shutil.rmtree(_TMP_DIR, ignore_errors=True)
+
 
 def test_Signal_to_SIG_IGN():
     def f():
@@ -118,27 +141,33 @@ def test_Signal_to_terminate_process_list():
     
 
  
-def start_server(n, read_old_state=False, verbose=1):
+def start_server(n, read_old_state=False, verbose=1, result_port=None, max_jobs_in_memory=None,
+                 result_schema=None):
     print("START SERVER")
     args = range(1,n)
-    with jobmanager.JobManager_Server(authkey      = AUTHKEY,
-                                      port         = PORT,
-                                      verbose      = verbose,
-                                      msg_interval = 1,
-                                      fname_dump   = 'jobmanager.dump') as jm_server:
+    with jobmanager.JobManager_Server(authkey            = AUTHKEY,
+                                      port               = PORT,
+                                      verbose            = verbose,
+                                      msg_interval       = 1,
+                                      fname_dump         = 'jobmanager.dump',
+                                      result_port        = result_port,
+                                      max_jobs_in_memory = max_jobs_in_memory,
+                                      result_schema      = result_schema) as jm_server:
         if not read_old_state:
             jm_server.args_from_list(args)
         else:
             jm_server.read_old_state()
         jm_server.start()
     
-def start_client(verbose=1):
+def start_client(verbose=1, batch_size=1, prefetch=0):
     print("START CLIENT")
-    jm_client = jobmanager.JobManager_Client(server = 'localhost', 
-                                             authkey = AUTHKEY, 
-                                             port    = PORT, 
-                                             nproc   = 0,
-                                             verbose = verbose)
+    jm_client = jobmanager.JobManager_Client(server     = 'localhost', 
+                                             authkey    = AUTHKEY, 
+                                             port       = PORT, 
+                                             nproc      = 0,
+                                             verbose    = verbose,
+                                             batch_size = batch_size,
+                                             prefetch   = prefetch)
     jm_client.start()
     if verbose > 1:
         print("jm_client returned")    
@@ -180,6 +209,445 @@ def test_jobmanager_basic():
     
     
     
+def test_jobmanager_batch_size():
+    """
+    start server, start client which fetches the arguments in chunks,
+    process trivial jobs, quit
+    
+    check if all arguments are found in final_result of dump
+    """
+    n = 50
+    p_server = mp.Process(target=start_server, args=(n,))
+    p_server.start()
+    
+    time.sleep(1)
+     
+    p_client = mp.Process(target=start_client, args=(1, 7))
+    p_client.start()
+     
+    p_client.join(30)
+    p_server.join(30)
+ 
+    assert not p_client.is_alive(), "the client did not terminate on time!"
+    assert not p_server.is_alive(), "the server did not terminate on time!"
+    print("[+] client and server terminated")
+     
+    fname = 'jobmanager.dump'
+    with open(fname, 'rb') as f:
+        data = jobmanager.JobManager_Server.static_load(f)
+    
+    final_res_args = [a[0] for a in data['final_result']]
+    
+    assert len(final_res_args) == n-1, "final result contains duplicates or misses arguments!"
+    assert set(final_res_args) == set(range(1,n)), "final result does not contain all arguments!"
+    print("[+] all arguments found exactly once in final_results")
+    
+def test_args_from_iterable():
+    server = jobmanager.JobManager_Server(authkey=AUTHKEY, port=PORT, verbose=0, fname_dump=None)
+    server.args_from_iterable(range(100), high_water=20)
+    assert server.numjobs == 20
+    assert server.job_q.qsize() == 20
+    assert len(server.args_dict) == 20
+    print("[+] took high_water arguments from iterable")
+    
+    try:
+        server.args_from_iterable(range(10))
+    except RuntimeError:
+        print("[+] second iterable rejected")
+    else:
+        assert False, "a second iterable should not be accepted"
+        
+def start_server_iterable(n, high_water, low_water):
+    print("START SERVER")
+    args = (i for i in range(1,n))
+    with jobmanager.JobManager_Server(authkey      = AUTHKEY,
+                                      port         = PORT,
+                                      verbose      = 1,
+                                      msg_interval = 1,
+                                      fname_dump   = 'jobmanager.dump') as jm_server:
+        jm_server.args_from_iterable(args, high_water=high_water, low_water=low_water)
+        jm_server.start()
+        
+def test_jobmanager_args_from_iterable():
+    """
+    the server takes the arguments from a generator while running,
+    keeping at most 10 arguments in the job_q
+    
+    check if all arguments are found in final_result of dump
+    """
+    n = 100
+    p_server = mp.Process(target=start_server_iterable, args=(n, 10, 3))
+    p_server.start()
+    
+    time.sleep(1)
+     
+    p_client = mp.Process(target=start_client, args=(1, 4))
+    p_client.start()
+     
+    p_client.join(30)
+    p_server.join(30)
+ 
+    assert not p_client.is_alive(), "the client did not terminate on time!"
+    assert not p_server.is_alive(), "the server did not terminate on time!"
+    print("[+] client and server terminated")
+     
+    fname = 'jobmanager.dump'
+    with open(fname, 'rb') as f:
+        data = jobmanager.JobManager_Server.static_load(f)
+    
+    final_res_args = [a[0] for a in data['final_result']]
+    
+    assert data['numjobs'] == n-1
+    assert len(final_res_args) == n-1, "final result contains duplicates or misses arguments!"
+    assert set(final_res_args) == set(range(1,n)), "final result does not contain all arguments!"
+    print("[+] all arguments found exactly once in final_results")
+
+def test_jobmanager_direct_results():
+    """
+    the clients send the results directly to the server process
+    
+    check if all arguments are found in final_result of dump
+    """
+    n = 100
+    p_server = mp.Process(target=start_server, args=(n, False, 1, 0))
+    p_server.start()
+    
+    time.sleep(1)
+     
+    p_client = mp.Process(target=start_client, args=(2,))
+    p_client.start()
+     
+    p_client.join(30)
+    p_server.join(30)
+ 
+    assert not p_client.is_alive(), "the client did not terminate on time!"
+    assert not p_server.is_alive(), "the server did not terminate on time!"
+    print("[+] client and server terminated")
+     
+    fname = 'jobmanager.dump'
+    with open(fname, 'rb') as f:
+        data = jobmanager.JobManager_Server.static_load(f)
+    
+    final_res_args = [a[0] for a in data['final_result']]
+    
+    assert len(final_res_args) == n-1, "final result contains duplicates or misses arguments!"
+    assert set(final_res_args) == set(range(1,n)), "final result does not contain all arguments!"
+    print("[+] all arguments found exactly once in final_results")
+    
+def test_myQueue_bulk_operations():
+    q = jobmanager.myQueue()
+    q.put_many(range(10))
+    time.sleep(0.1)
+    
+    assert q.get_many(4) == [0, 1, 2, 3]
+    assert q.get_many(100, timeout=1) == [4, 5, 6, 7, 8, 9]
+    
+    try:
+        q.get_many(4, timeout=0.1)
+    except jobmanager.queue.Empty:
+        print("[+] caught queue.Empty on empty queue")
+    else:
+        assert False, "get_many on empty queue should raise queue.Empty"
+
+def test_ChunkSizer():
+    sizer = jobmanager.ChunkSizer(overhead=0.02, max_chunk_size=100)
+    
+    # unknown client and client without times get single arguments
+    assert sizer.chunk_size('c1', 1000) == 1
+    sizer.report('c1', None, 0.005)
+    assert sizer.chunk_size('c1', 1000) == 1
+    
+    # 5ms per request must be at most 2% of the chunk calculation time 
+    sizer.report('c1', 0.01, 0.005)
+    assert sizer.chunk_size('c1', 1000) == 25
+    
+    # limited by max_chunk_size
+    sizer.report('c1', 0.0001, 0.005)
+    assert sizer.chunk_size('c1', 1000) == 100
+    
+    # shrinks at the end of the queue, considering the active clients
+    assert sizer.chunk_size('c1', 40) == 20
+    sizer.report('c2', 0.0001, 0.005)
+    assert sizer.chunk_size('c1', 40) == 10
+    assert sizer.chunk_size('c1', 1) == 1
+    print("[+] chunk sizes as expected")
+    
+    q = jobmanager.JobQueue(range(50))
+    assert q.get_chunk('c1', 0.01, 0.005, timeout=1) == [0]
+    q.chunk_sizer = sizer
+    sizer.report('c1', 0.01, 0.005)
+    # 49 remaining with two active clients -> tail limit 13
+    assert q.get_chunk('c1', 0.01, 0.005, timeout=1) == list(range(1, 14))
+    assert q.get_chunk('c1', 0.01, 0.005, n_max=3, timeout=1) == [14, 15, 16]
+    print("[+] JobQueue.get_chunk uses the chunk_sizer")
+    
+    # the SyncManager serves the clients in separate threads
+    def report_many(k):
+        for i in range(2000):
+            sizer.report('{}:{}'.format(k, i), 0.01, 0.005)
+    threads = [threading.Thread(target=report_many, args=(k,)) for k in range(4)]
+    for t in threads:
+        t.start()
+    while any(t.is_alive() for t in threads):
+        sizer.num_active_clients()
+    for t in threads:
+        t.join()
+    assert sizer.num_active_clients() == 8002
+    print("[+] concurrent reports of new clients")
+    
+    sizer2 = pickle.loads(pickle.dumps(sizer))
+    assert sizer2.num_active_clients() == 8002
+    print("[+] ChunkSizer can be pickled")
+
+def test_jobmanager_auto_batch_size():
+    """
+    the server chooses the number of arguments fetched by the client
+    
+    check if all arguments are found in final_result of dump
+    """
+    n = 200
+    p_server = mp.Process(target=start_server, args=(n,))
+    p_server.start()
+    
+    time.sleep(1)
+     
+    p_client = mp.Process(target=start_client, args=(1, 'auto', 1))
+    p_client.start()
+     
+    p_client.join(60)
+    p_server.join(60)
+ 
+    assert not p_client.is_alive(), "the client did not terminate on time!"
+    assert not p_server.is_alive(), "the server did not terminate on time!"
+    print("[+] client and server terminated")
+     
+    fname = 'jobmanager.dump'
+    with open(fname, 'rb') as f:
+        data = jobmanager.JobManager_Server.static_load(f)
+    
+    final_res_args = [a[0] for a in data['final_result']]
+    
+    assert len(final_res_args) == n-1, "final result contains duplicates or misses arguments!"
+    assert set(final_res_args) == set(range(1,n)), "final result does not contain all arguments!"
+    print("[+] all arguments found exactly once in final_results")
+
+def test_ResultUploader():
+    q = jobmanager.myQueue()
+    uploader = jobmanager._ResultUploader(result_q=q, max_items=3, max_delay=0.5)
+    uploader.start()
+    
+    for i in range(3):
+        uploader.put(i, i**2)
+    
+    # full buffer is sent immediately
+    assert q.get(timeout=0.3) == [(0, 0), (1, 1), (2, 4)]
+    print("[+] got full batch")
+    
+    for i in range(3, 5):
+        uploader.put(i, i**2)
+    
+    # remaining pairs are sent when max_delay is reached
+    try:
+        q.get(timeout=0.1)
+    except jobmanager.queue.Empty:
+        pass
+    else:
+        assert False, "incomplete batch was sent before max_delay"
+    assert q.get(timeout=1) == [(3, 9), (4, 16)]
+    print("[+] got incomplete batch after max_delay")
+    
+    uploader.put(5, 25)
+    uploader.close(timeout=1)
+    assert q.get(timeout=1) == [(5, 25)]
+    assert uploader.error is None
+    print("[+] close flushed the buffer")
+
+def test_JobFetcher():
+    q = jobmanager.myQueue()
+    q.put_many(range(10))
+    time.sleep(0.1)
+    
+    fetcher = jobmanager._JobFetcher(job_q=q, batch_size=3, depth=2, njobs=8)
+    fetcher.start()
+    
+    assert fetcher.get() == [0, 1, 2]
+    assert fetcher.get() == [3, 4, 5]
+    # njobs limits the last chunk
+    assert fetcher.get() == [6, 7]
+    assert fetcher.get() is None
+    assert fetcher.error is None
+    assert q.get(timeout=1) == 8
+    print("[+] fetched chunks, stopped after njobs")
+    
+    q.put_many(range(10))
+    time.sleep(0.1)
+    fetcher = jobmanager._JobFetcher(job_q=q, batch_size=3, depth=2)
+    fetcher.start()
+    assert fetcher.get() == [9, 0, 1]
+    time.sleep(0.3)
+    # two chunks are held ahead, the rest remains in the queue
+    assert fetcher.close(timeout=1) == [2, 3, 4, 5, 6, 7]
+    assert q.get_many(10, timeout=1) == [8, 9]
+    print("[+] close returned prefetched arguments")
+    
+    class SlowQueue(object):
+        def get_many(self, n, block=True, timeout=None):
+            time.sleep(0.5)
+            return list(range(n))
+    fetcher = jobmanager._JobFetcher(job_q=SlowQueue(), batch_size=3, depth=2)
+    fetcher.start()
+    time.sleep(0.1)
+    # the chunk of the request pending beyond the timeout is returned too
+    assert fetcher.close(timeout=0.1) == [0, 1, 2]
+    print("[+] close waited for the pending request")
+
+def test_JobQueue():
+    q = jobmanager.JobQueue([0, 1])
+    q.put(2)
+    q.put_many(range(3, 10))
+    assert q.qsize() == 10
+    
+    assert q.get() == 0
+    assert q.get_many(4) == [1, 2, 3, 4]
+    assert q.get_many(100, timeout=1) == [5, 6, 7, 8, 9]
+    assert q.empty()
+    
+    t0 = time.time()
+    try:
+        q.get(timeout=0.2)
+    except jobmanager.queue.Empty:
+        assert time.time() - t0 >= 0.2
+        print("[+] caught queue.Empty after timeout")
+    else:
+        assert False, "get on empty queue should raise queue.Empty"
+    
+    try:
+        q.get_nowait()
+    except jobmanager.queue.Empty:
+        pass
+    else:
+        assert False, "get_nowait on empty queue should raise queue.Empty"
+    
+    # a waiting get returns as soon as an item is available
+    def put_later():
+        time.sleep(0.2)
+        q.put('late')
+    jobmanager.threading.Thread(target=put_later).start()
+    assert q.get_many(2, timeout=5) == ['late']
+    
+    # pickling copies the items
+    q.put_many([1, 2, 3])
+    q2 = pickle.loads(pickle.dumps(q))
+    assert q2.get_many(10) == [1, 2, 3]
+    assert q.qsize() == 3
+    print("[+] JobQueue works as expected")
+    
+def test_JobQueue_leases():
+    q = jobmanager.JobQueue([(i, 'arg{}'.format(i)) for i in range(6)])
+    q.lease_time = 0.3
+    
+    assert q.get_many(2, client_id='A') == [(0, 'arg0'), (1, 'arg1')]
+    job = q.get(client_id='B')
+    assert q.lease_info() == (3, 0)
+    # the result of job 0 arrived, B put its job back
+    q.release([0])
+    q.put(job)
+    assert q.lease_info() == (1, 0)
+    print("[+] released and put back jobs are not leased")
+    
+    # A keeps its lease by the heartbeat
+    time.sleep(0.2)
+    q.heartbeat('A')
+    time.sleep(0.2)
+    assert q.get(client_id='C') == (3, 'arg3')
+    assert q.lease_info() == (2, 0)
+    
+    # no more heartbeats, the job of A goes back to the front of the queue
+    time.sleep(0.4)
+    q.heartbeat('C')
+    assert q.get_many(10, client_id='C') == [(1, 'arg1'), (4, 'arg4'), (5, 'arg5'), (2, 'arg2')]
+    assert q.lease_info() == (5, 1)
+    print("[+] expired lease reassigned")
+    
+    q2 = pickle.loads(pickle.dumps(q))
+    assert q2.lease_time == 0.3
+    assert q2.lease_info() == (0, 1)
+    
+    # an idle client keeps asking while another one holds the last job,
+    # and gets it as soon as that lease expires
+    q = jobmanager.JobQueue([(0, 'arg0')])
+    q.lease_time = 0.3
+    q.get(client_id='h1:1')
+    try:
+        q.get(timeout=0.1, client_id='h2:1')
+    except jobmanager._JobsPending:
+        pass
+    else:
+        assert False, "_JobsPending expected"
+    t0 = time.time()
+    assert q.get(timeout=5, client_id='h2:1') == (0, 'arg0')
+    assert time.time() - t0 < 1
+    assert q.lease_info() == (1, 1)
+    print("[+] job of a lost client handed to an idle one")
+    
+    # the lost client puts back the job it does not hold anymore, 
+    # and so does the new holder once the job is done
+    q.put((0, 'arg0'), client_id='h1:1')
+    assert q.qsize() == 0
+    q.release([0])
+    q.put((0, 'arg0'), client_id='h2:1')
+    assert q.qsize() == 0
+    print("[+] jobs not held anymore are not put back")
+    
+def test_JobQueue_speculation():
+    q = jobmanager.JobQueue([(i, 'arg{}'.format(i)) for i in range(2)])
+    q.lease_time = 5
+    q.speculative_copies = 1
+    q.speculative_min_age = 0.3
+    
+    assert q.get_many(2, client_id='A') == [(0, 'arg0'), (1, 'arg1')]
+    # B has to ask again once the jobs of A are old enough, its
+    # request returns after its timeout
+    t0 = time.time()
+    try:
+        q.get(timeout=0.1, client_id='B')
+    except jobmanager._JobsPending:
+        assert time.time() - t0 < 0.25
+    else:
+        assert False, "_JobsPending expected"
+    time.sleep(0.2)
+    copy = q.get(timeout=0.1, client_id='B')
+    assert copy == (0, 'arg0')
+    assert isinstance(copy[0], jobmanager._CopyId)
+    assert q.get_many(10, client_id='C', block=False) == [(1, 'arg1')]
+    print("[+] idle clients got copies of the oldest jobs")
+    
+    # at most one copy per job, A does not get a copy of its own jobs,
+    # they keep asking as long as the jobs are leased
+    for client_id in ['A', 'D']:
+        try:
+            q.get(block=False, client_id=client_id)
+        except jobmanager._JobsPending:
+            pass
+        else:
+            assert False, "no more copies expected"
+    assert q.speculation_info() == 2
+    
+    # the result of the copy of job 0 arrived first, A may skip job 0
+    q.release([copy[0]])
+    assert q.heartbeat('A') == [0]
+    assert q.heartbeat('B') == [0]
+    assert q.heartbeat('A') == []
+    # A puts back job 1, C still works on it
+    q.put((1, 'arg1'), client_id='A')
+    assert q.qsize() == 0
+    assert q.lease_info() == (1, 0)
+    print("[+] holders of a job done by another client are told to skip it")
+    
+    q.release([1])
+    assert q.heartbeat('C') == [1]
+    assert q.lease_info() == (0, 0)
+
 def test_jobmanager_server_signals():
     print("## TEST SIGTERM ##")
     p_server = mp.Process(target=start_server, args=(30,))
@@ -197,12 +665,12 @@ def test_jobmanager_server_signals():
     with open(fname, 'rb') as f:
         data = jobmanager.JobManager_Server.static_load(f)    
     
-    args_set = data['args_set']
+    args_set = set(data['args_dict'].values())
     ref_set = set(range(1,30))
     
     assert len(args_set) == len(ref_set)
     assert len(ref_set - args_set) == 0
-    print("[+] args_set from dump contains all arguments")
+    print("[+] args_dict from dump contains all arguments")
     
 
     print("## TEST SIGINT ##")    
@@ -221,12 +689,12 @@ def test_jobmanager_server_signals():
     with open(fname, 'rb') as f:
         data = jobmanager.JobManager_Server.static_load(f)    
     
-    args_set = data['args_set']
+    args_set = set(data['args_dict'].values())
     
     ref_set = set(range(1,30))
     assert len(args_set) == len(ref_set)
     assert len(ref_set - args_set) == 0
-    print("[+] args_set from dump contains all arguments")
+    print("[+] args_dict from dump contains all arguments")
  
     
 def test_shutdown_server_while_client_running():
@@ -277,7 +745,7 @@ def test_shutdown_server_while_client_running():
     with open(fname, 'rb') as f:
         data = jobmanager.JobManager_Server.static_load(f)    
 
-    args_set = data['args_set']
+    args_set = set(data['args_dict'].values())
     final_result = data['final_result']
 
     final_res_args = {a[0] for a in final_result}
@@ -296,8 +764,11 @@ def test_shutdown_server_while_client_running():
 def test_shutdown_client():
     shutdown_client(signal.SIGTERM)
     shutdown_client(signal.SIGINT)
+    
+def test_shutdown_client_prefetch():
+    shutdown_client(signal.SIGTERM, batch_size=3, prefetch=2)
 
-def shutdown_client(sig):
+def shutdown_client(sig, batch_size=1, prefetch=0):
     """
     start server with 100 elements in queue
     
@@ -321,7 +792,7 @@ def shutdown_client(sig):
     
     time.sleep(2)
     
-    p_client = mp.Process(target=start_client)
+    p_client = mp.Process(target=start_client, args=(1, batch_size, prefetch))
     p_client.start()
     
     time.sleep(5)
@@ -351,8 +822,8 @@ def shutdown_client(sig):
     with open(fname, 'rb') as f:
         data = jobmanager.JobManager_Server.static_load(f)    
     
-    assert len(data['args_set']) == 0
-    print("[+] args_set is empty -> all args processed & none failed")
+    assert len(data['args_dict']) == 0
+    print("[+] args_dict is empty -> all args processed & none failed")
     
     final_res_args_set = {a[0] for a in data['final_result']}
          
@@ -417,14 +888,15 @@ def test_check_fail():
     
     set_ref = set(range(1,n))
     
-    print(data['args_set'])
-    print(data['fail_set'])
+    print(data['args_dict'])
+    print(data['fail_ids'])
     
-    assert data['args_set'] == data['fail_set']
+    assert set(data['args_dict'].keys()) == data['fail_ids']
     
     final_result_args_set = {a[0] for a in data['final_result']}
+    fail_set = set(data['args_dict'].values())
     
-    all_set = final_result_args_set | data['fail_set']
+    all_set = final_result_args_set | fail_set
     
     assert len(set_ref - all_set) == 0, "final result union with reported failure do not correspond to all args!" 
     print("[+] all argumsents found in final_results | reported failure")
@@ -486,6 +958,1761 @@ def test_jobmanager_read_old_stat():
     assert len(intersect) == 0, "final result does not contain all arguments!"
     print("[+] all arguments found in final_results")    
     
+def test_JobSpill():
+    spill = jobmanager._JobSpill(segment_size=3)
+    for i in range(5):
+        spill.append((i, {'a': i}))
+    assert len(spill) == 5
+    assert spill.read(2) == [(0, {'a': 0}), (1, {'a': 1})]
+    # append to the segment currently read
+    spill.append((5, {'a': 5}))
+    assert [job_id for job_id, a in spill.read(2)] == [2, 3]
+    assert len(spill) == 2
+    print("[+] jobs read back in order across segments")
+    
+    state = spill.get_state()
+    spill.close(remove=False)
+    loaded_fnames = [seg[0] for seg in state['segments']]
+    spill = jobmanager._JobSpill(segment_size=3, state=state)
+    assert len(spill) == 2
+    spill.append((6, {'a': 6}))
+    assert [job_id for job_id, a in spill.read(10)] == [4, 5, 6]
+    assert len(spill) == 0
+    print("[+] continue reading from state")
+    
+    for fname in loaded_fnames:
+        assert os.path.isfile(fname)
+    spill2 = jobmanager._JobSpill(segment_size=3, state=state)
+    assert [job_id for job_id, a in spill2.read(10)] == [4, 5]
+    spill2.close()
+    print("[+] state can be read again")
+    
+    fnames = [seg[0] for seg in spill.get_state()['segments']]
+    spill.release_loaded()
+    spill.close()
+    for fname in fnames + loaded_fnames:
+        assert not os.path.isfile(fname)
+    print("[+] segment files removed")
+    
+def test_args_from_iterable_spill():
+    """do not take more arguments from the iterable than fit into memory"""
+    taken = [0]
+    def args():
+        for i in range(100000):
+            taken[0] += 1
+            yield i
+    
+    server = jobmanager.JobManager_Server(authkey=AUTHKEY, port=PORT, verbose=0, fname_dump=None,
+                                          max_jobs_in_memory=100)
+    try:
+        server.args_from_iterable(args(), high_water=1000)
+        assert taken[0] <= 101
+        assert len(server.args_dict) == 100
+        assert server.job_q.qsize() == 100
+        print("[+] iterable stops at max_jobs_in_memory")
+    finally:
+        if server._spill is not None:
+            server._spill.close()
+    
+def test_spill_with_failures():
+    """
+    failed jobs stay in args_dict, but must not prevent the spilled 
+    jobs from being read back
+    """
+    server = jobmanager.JobManager_Server(authkey=AUTHKEY, port=PORT, verbose=0, fname_dump=None,
+                                          max_jobs_in_memory=2)
+    try:
+        server.args_from_list(range(5))
+        assert len(server.args_dict) == 2
+        # the first two jobs are fetched by a client and fail
+        for job_id, a in server.job_q.get_many(2, block=False):
+            server.fail_q.put((job_id, 'RuntimeError', 'host'))
+        time.sleep(0.2)
+        
+        assert server._JobManager_Server__feed_job_q()
+        assert [a for job_id, a in server.job_q.get_many(10, block=False)] == [2, 3]
+        assert len(server.fail_list) == 2
+        print("[+] spilled jobs read back, failed jobs do not count")
+    finally:
+        if server._spill is not None:
+            server._spill.close()
+    
+def test_jobmanager_spill():
+    """
+    start server holding at most 10 jobs in memory, start client, 
+    interrupt in between, restore state from dump, finish.
+    
+    check if all arguments are found in final_result of dump
+    """
+    n = 300
+    p_server = mp.Process(target=start_server, args=(n, False, 1, None, 10))
+    p_server.start()
+    
+    time.sleep(1)
+     
+    p_client = mp.Process(target=start_client)
+    p_client.start()
+    
+    time.sleep(3)
+    
+    p_server.terminate()
+     
+    p_client.join(10)
+    p_server.join(10)
+ 
+    assert not p_client.is_alive(), "the client did not terminate on time!"
+    assert not p_server.is_alive(), "the server did not terminate on time!"
+    print("[+] client and server terminated")
+    
+    fname = 'jobmanager.dump'
+    with open(fname, 'rb') as f:
+        data = jobmanager.JobManager_Server.static_load(f)
+    assert len(data['args_dict']) <= 10
+    assert data['spill'] is not None
+    for seg in data['spill']['segments']:
+        assert os.path.isfile(seg[0])
+    print("[+] dump refers to the segment files of the spilled jobs")
+    
+    time.sleep(2)
+    
+    p_server = mp.Process(target=start_server, args=(n, True, 1, None, 10))
+    p_server.start()
+    
+    time.sleep(2)
+     
+    p_client = mp.Process(target=start_client)
+    p_client.start()
+
+    p_client.join(60)
+    p_server.join(60)
+ 
+    assert not p_client.is_alive(), "the client did not terminate on time!"
+    assert not p_server.is_alive(), "the server did not terminate on time!"
+    print("[+] client and server terminated")    
+     
+    with open(fname, 'rb') as f:
+        data = jobmanager.JobManager_Server.static_load(f)
+    
+    final_res_args = [a[0] for a in data['final_result']]
+    assert sorted(final_res_args) == list(range(1,n)), "final result does not contain all arguments exactly once!"
+    assert data['spill'] is None
+    print("[+] all arguments found exactly once in final_results")
+    
+def test_Journal():
+    fname = 'jobmanager_test.journal'
+    if os.path.isfile(fname):
+        os.remove(fname)
+    
+    try:
+        journal = jobmanager._Journal(fname)
+        for i in range(10):
+            journal.append(('arg', i, np.arange(i)))
+        journal.close()
+    
+        records = list(jobmanager._Journal.read(fname))
+        assert len(records) == 10
+        assert np.all(records[9][2] == np.arange(9))
+        print("[+] records read back")
+    
+        # simulate a crash while writing the last record
+        size = os.path.getsize(fname)
+        with open(fname, 'ab') as f:
+            f.write(b'\x40\x00\x00\x00\x01\x02')
+        assert len(list(jobmanager._Journal.read(fname))) == 10
+        print("[+] incomplete frame ignored")
+    
+        journal = jobmanager._Journal(fname)
+        assert os.path.getsize(fname) == size
+        journal.append(('checkpoint',))
+        journal.close()
+        records = list(jobmanager._Journal.read(fname))
+        assert len(records) == 11
+        assert records[-1] == ('checkpoint',)
+        print("[+] incomplete frame removed when appending")
+    finally:
+        if os.path.isfile(fname):
+            os.remove(fname)
+    
+class Server_Crash(jobmanager.JobManager_Server):
+    """terminates without shutdown after crash_after results"""
+    def __init__(self, crash_after, **kwargs):
+        super(Server_Crash, self).__init__(**kwargs)
+        self.crash_after = crash_after
+        
+    def process_new_result(self, arg, result):
+        super(Server_Crash, self).process_new_result(arg, result)
+        if len(self.final_result) >= self.crash_after:
+            # the SyncManager (ignores SIGTERM) and the progress bar
+            for p in mp.active_children():
+                os.kill(p.pid, signal.SIGKILL)
+                p.join()
+            os._exit(1)
+
+def start_server_journal(n, read_old_state, crash_after):
+    print("START SERVER")
+    with Server_Crash(crash_after   = crash_after,
+                      authkey       = AUTHKEY,
+                      port          = PORT,
+                      verbose       = 1,
+                      msg_interval  = 1,
+                      fname_dump    = None,
+                      fname_journal = 'jobmanager.journal') as jm_server:
+        if not read_old_state:
+            jm_server.args_from_list(range(1,n))
+        else:
+            jm_server.read_old_state()
+        jm_server.start()
+
+def test_jobmanager_journal():
+    """
+    start server with journal, start client, server crashes after 
+    30 results, restore state from journal, finish.
+    
+    check if all arguments are found exactly once in the final_result 
+    restored from the journal
+    """
+    fname = 'jobmanager.journal'
+    if os.path.isfile(fname):
+        os.remove(fname)
+    n = 100
+    
+    try:
+        p_server = mp.Process(target=start_server_journal, args=(n, False, 30))
+        p_server.start()
+        time.sleep(1)
+        p_client = mp.Process(target=start_client)
+        p_client.start()
+    
+        p_server.join(30)
+        p_client.join(30)
+        assert not p_client.is_alive(), "the client did not terminate on time!"
+        assert not p_server.is_alive(), "the server did not terminate on time!"
+        assert p_server.exitcode == 1
+        print("[+] server crashed")
+    
+        try:
+            jobmanager.JobManager_Server(authkey=AUTHKEY, port=PORT, verbose=0, fname_journal=fname).put_arg(1)
+        except RuntimeError:
+            print("[+] can not add jobs to an existing journal without reading it")
+        else:
+            assert False, "RuntimeError expected"
+        
+        p_server = mp.Process(target=start_server_journal, args=(n, True, n))
+        p_server.start()
+        time.sleep(2)
+        p_client = mp.Process(target=start_client)
+        p_client.start()
+    
+        p_server.join(60)
+        p_client.join(60)
+        assert not p_client.is_alive(), "the client did not terminate on time!"
+        assert not p_server.is_alive(), "the server did not terminate on time!"
+        assert p_server.exitcode == 0
+        print("[+] client and server terminated")
+    
+        records = list(jobmanager._Journal.read(fname))
+        assert records[-1][0] == 'checkpoint'
+    
+        server = jobmanager.JobManager_Server(authkey=AUTHKEY, port=PORT, verbose=0, fname_journal=fname)
+        server.read_old_state()
+        final_res_args = [a[0] for a in server.final_result]
+        assert sorted(final_res_args) == list(range(1,n)), "final result does not contain all arguments exactly once!"
+        assert len(server.args_dict) == 0
+        assert server.numresults == server.numjobs == n-1
+        print("[+] all arguments found exactly once in the replayed final_result")
+    finally:
+        if os.path.isfile(fname):
+            os.remove(fname)
+    
+def test_static_load_old_dump():
+    """
+    a dump written before job ids were introduced holds the set of
+    arguments and the failed arguments, static_load converts it
+    """
+    fname = 'jobmanager_old.dump'
+    with open(fname, 'wb') as f:
+        pickle.dump(5, f)
+        pickle.dump(1, f)
+        pickle.dump([(0, 0)], f)
+        pickle.dump({1, 2, 3, 4}, f)
+        pickle.dump([(3, 'RuntimeError', 'host')], f)
+        
+    with open(fname, 'rb') as f:
+        data = jobmanager.JobManager_Server.static_load(f)
+    os.remove(fname)
+    
+    assert sorted(data['args_dict'].values()) == [1, 2, 3, 4]
+    assert len(data['fail_ids']) == 1
+    fail_id = list(data['fail_ids'])[0]
+    assert data['args_dict'][fail_id] == 3
+    assert data['fail_q'].get(timeout=1) == (fail_id, 'RuntimeError', 'host')
+    print("[+] failed argument refers to its new job id")
+    
+    jobs = data['job_q'].get_many(10, block=False)
+    assert sorted(a for job_id, a in jobs) == [1, 2, 4]
+    for job_id, a in jobs:
+        assert data['args_dict'][job_id] == a
+    print("[+] job_q holds (job_id, arg) of the not failed arguments")
+    
+def test_dump_chunked():
+    """
+    dump a state spread over several chunks, read it back completely, 
+    without the final_result and stream the final_result
+    """
+    fname = 'jobmanager_chunked.dump'
+    chunk_size = jobmanager._DUMP_CHUNK_SIZE
+    jobmanager._DUMP_CHUNK_SIZE = 3
+    server = jobmanager.JobManager_Server(authkey=AUTHKEY, port=PORT, verbose=0, fname_dump=None)
+    try:
+        server.args_from_list(range(20))
+        for job_id in range(10):
+            server.final_result.append((server.args_dict.pop(job_id), job_id**2))
+        server.numresults = 10
+        server.fail_list.append((10, 'RuntimeError', 'host'))
+        with open(fname, 'wb') as f:
+            server._JobManager_Server__dump(f)
+        
+        with open(fname, 'rb') as f:
+            data = jobmanager.JobManager_Server.static_load(f)
+        assert data['numjobs'] == 20
+        assert data['numresults'] == 10
+        assert data['final_result'] == [(i, i**2) for i in range(10)]
+        assert data['args_dict'] == {i: i for i in range(10, 20)}
+        assert data['fail_list'] == [(10, 'RuntimeError', 'host')]
+        assert [a for job_id, a in data['job_q'].get_many(20, block=False)] == list(range(11, 20))
+        print("[+] state restored from chunks")
+        
+        with open(fname, 'rb') as f:
+            data = jobmanager.JobManager_Server.static_load(f, load_final_result=False)
+        assert data['final_result'] is None
+        assert len(data['args_dict']) == 10
+        assert list(jobmanager.JobManager_Server.iter_final_result(fname)) == [(i, i**2) for i in range(10)]
+        print("[+] final_result skipped and streamed")
+    finally:
+        jobmanager._DUMP_CHUNK_SIZE = chunk_size
+        if os.path.exists(fname):
+            os.remove(fname)
+            
+def test_convert_dump():
+    """
+    convert a dump of the former sequential format, resume from the 
+    converted dump without loading the final_result, the next dump holds
+    the old and the new results
+    """
+    fname = 'jobmanager_convert.dump'
+    with open(fname, 'wb') as f:
+        pickle.dump(4, f)
+        pickle.dump(2, f)
+        pickle.dump([(0, 0), (1, 1)], f)
+        pickle.dump({2: 2, 3: 3}, f)
+        pickle.dump([], f)
+        pickle.dump(None, f)
+    try:
+        jobmanager.JobManager_Server.convert_dump(fname)
+        with open(fname, 'rb') as f:
+            assert f.read(len(jobmanager._DUMP_MAGIC)) == jobmanager._DUMP_MAGIC
+        print("[+] dump converted")
+        
+        server = jobmanager.JobManager_Server(authkey=AUTHKEY, port=PORT, verbose=0, fname_dump=fname)
+        server.read_old_state(load_final_result=False)
+        assert server.final_result == []
+        assert server.numjobs == 4
+        job_id, a = server.job_q.get()
+        server.args_dict.pop(job_id)
+        server.final_result.append((a, a))
+        server.numresults += 1
+        with open(fname + '.new', 'wb') as f:
+            server._JobManager_Server__dump(f)
+            
+        assert list(jobmanager.JobManager_Server.iter_final_result(fname + '.new')) == [(0, 0), (1, 1), (2, 2)]
+        with open(fname + '.new', 'rb') as f:
+            data = jobmanager.JobManager_Server.static_load(f)
+        assert data['numresults'] == 3
+        assert data['args_dict'] == {3: 3}
+        print("[+] fast resume keeps the results of the old dump")
+    finally:
+        for fn in [fname, fname + '.new']:
+            if os.path.exists(fn):
+                os.remove(fn)
+    
+def test_PickleFileSink():
+    fname = 'results.pickle'
+    try:
+        sink = jobmanager.PickleFileSink(fname, batch_size=3)
+        for i in range(4):
+            sink.put(i, i**2)
+        assert list(jobmanager.PickleFileSink.read(fname)) == [(0, 0), (1, 1), (2, 4)]
+        print("[+] full batch written")
+        sink.close()
+        assert list(jobmanager.PickleFileSink.read(fname)) == [(i, i**2) for i in range(4)]
+        print("[+] rest written on close")
+        
+        sink = jobmanager.PickleFileSink(fname)
+        sink.put(4, 16)
+        sink.close()
+        with open(fname, 'ab') as f:
+            f.write(b'incomplete frame')
+        assert list(jobmanager.PickleFileSink.read(fname)) == [(i, i**2) for i in range(5)]
+        print("[+] existing file continued, incomplete frame ignored")
+    finally:
+        if os.path.exists(fname):
+            os.remove(fname)
+            
+def test_NpyDirSink():
+    import shutil
+    directory = 'results_npy'
+    try:
+        sink = jobmanager.NpyDirSink(directory, shape=(2,), segment_size=4, batch_size=3)
+        for i in range(6):
+            sink.put(i, [i, -i])
+        try:
+            sink.put(6, [1, 2, 3])
+            sink.flush()
+        except RuntimeError:
+            print("[+] result of wrong shape refused")
+        else:
+            assert False, "RuntimeError expected"
+        sink._buffer = []
+        sink.close()
+        
+        sink = jobmanager.NpyDirSink(directory, shape=(2,), segment_size=4)
+        sink.put(6, [6, -6])
+        sink.close()
+        
+        args, results = jobmanager.NpyDirSink.load(directory)
+        assert args == list(range(7))
+        assert np.all(results == np.array([[i, -i] for i in range(7)]))
+        print("[+] results loaded from segments")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+        
+def test_server_result_sink():
+    """
+    with a result_sink the results do not go to final_result, the sink
+    is flushed and closed on shutdown
+    """
+    fname = 'results.pickle'
+    try:
+        server = jobmanager.JobManager_Server(authkey=AUTHKEY, port=PORT, verbose=0, fname_dump=None,
+                                              result_sink=jobmanager.PickleFileSink(fname))
+        server.args_from_list(range(3))
+        for job_id in range(3):
+            server.process_new_result(server.args_dict.pop(job_id), job_id**2)
+        server.numresults = 3
+        assert server.final_result == []
+        server.shutdown()
+        assert list(jobmanager.PickleFileSink.read(fname)) == [(i, i**2) for i in range(3)]
+        print("[+] results written to the sink")
+    finally:
+        if os.path.exists(fname):
+            os.remove(fname)
+    
+def test_ResultColumns():
+    schema = [('t', np.float64, (3,)), ('x', np.complex128, (3, 2))]
+    cols = jobmanager.ResultColumns(schema, capacity=2)
+    for job_id in [0, 4, 2]:
+        cols.set(job_id, 'arg{}'.format(job_id), (np.arange(3) + job_id, np.ones((3, 2))*1j*job_id))
+    assert len(cols) == 3
+    assert cols['t'].shape == (5, 3)
+    assert list(cols.job_ids) == [0, 2, 4]
+    assert np.all(cols['t'][cols.done][:, 0] == [0, 2, 4])
+    assert np.all(cols['x'][4] == 4j)
+    assert cols['arg'][2] == 'arg2'
+    print("[+] columns grow and are indexed by job id")
+    
+    try:
+        cols.set(5, None, (np.arange(4), np.ones((3, 2))))
+    except RuntimeError:
+        print("[+] result not matching the schema refused")
+    else:
+        assert False, "RuntimeError expected"
+    assert len(cols) == 3
+    
+    cols = jobmanager.ResultColumns([('y', np.float64, ())], store_args=False)
+    cols.set(0, None, 1.5)
+    assert cols['y'][0] == 1.5
+    assert cols.names == ['y']
+    print("[+] single column takes the result itself")
+    
+def test_jobmanager_result_schema():
+    """
+    results of the (default) client are the pids, stored in the result
+    columns, which are part of the dump
+    """
+    n = 20
+    schema = [('pid', np.int64, ())]
+    p_server = mp.Process(target=start_server, args=(n, False, 1, None, None, schema))
+    p_server.start()
+    
+    time.sleep(1)
+    
+    p_client = mp.Process(target=start_client)
+    p_client.start()
+    
+    p_client.join(30)
+    p_server.join(30)
+    
+    assert not p_client.is_alive(), "the client did not terminate on time!"
+    assert not p_server.is_alive(), "the server did not terminate on time!"
+    print("[+] client and server terminated")
+    
+    with open('jobmanager.dump', 'rb') as f:
+        data = jobmanager.JobManager_Server.static_load(f)
+    cols = data['final_result']
+    assert isinstance(cols, jobmanager.ResultColumns)
+    assert len(cols) == n-1
+    assert list(cols['arg']) == list(range(1, n))
+    assert np.all(cols['pid'] > 0)
+    print("[+] all results found in the result columns")
+    
+class Batch_Server(jobmanager.JobManager_Server):
+    """records the batches passed to process_new_results"""
+    def __init__(self, **kwargs):
+        super(Batch_Server, self).__init__(**kwargs)
+        self.batches = []
+        
+    def process_new_results(self, batch):
+        time.sleep(0.05)
+        self.batches.append(batch)
+        
+def _write_batch(batch):
+    """result_handler for the process pool"""
+    with open('handled_batches', 'a') as f:
+        f.write("{}\n".format(len(batch)))
+        
+def _failing_handler(batch):
+    raise ValueError("handler failed")
+    
+def test_handler_pool():
+    batches = [[(i, i), (i+1, i+1)] for i in range(0, 20, 2)]
+    for ordered in [True, False]:
+        server = Batch_Server(authkey=AUTHKEY, port=PORT, verbose=0, fname_dump=None,
+                              handler_pool='thread', handler_workers=3, handler_ordered=ordered)
+        server._JobManager_Server__start_handler_pool()
+        for batch in batches:
+            server._JobManager_Server__handle_results(batch)
+        server._JobManager_Server__stop_handler_pool()
+        if ordered:
+            assert server.batches == batches
+        else:
+            assert sorted(server.batches) == batches
+    print("[+] thread pool handles batches ordered and unordered")
+    
+    try:
+        server = jobmanager.JobManager_Server(authkey=AUTHKEY, port=PORT, verbose=0, fname_dump=None,
+                                              handler_pool='process', handler_ordered=False,
+                                              result_handler=_write_batch)
+        server._JobManager_Server__start_handler_pool()
+        for batch in batches:
+            server._JobManager_Server__handle_results(batch)
+        server._JobManager_Server__stop_handler_pool()
+        with open('handled_batches') as f:
+            assert f.read().split() == ['2']*len(batches)
+        print("[+] process pool calls the result_handler")
+    finally:
+        if os.path.exists('handled_batches'):
+            os.remove('handled_batches')
+            
+    server = jobmanager.JobManager_Server(authkey=AUTHKEY, port=PORT, verbose=0, fname_dump=None,
+                                          handler_pool='thread', result_handler=_failing_handler)
+    server.process_new_results = _failing_handler
+    server._JobManager_Server__start_handler_pool()
+    try:
+        server._JobManager_Server__handle_results(batches[0])
+        server._JobManager_Server__stop_handler_pool()
+    except ValueError:
+        print("[+] exception of the handler re-raised")
+    else:
+        assert False, "ValueError expected"
+        
+def test_results_of_several_uploads_in_one_batch():
+    """the messages waiting in the result_q are handled as one batch"""
+    with Batch_Server(authkey=AUTHKEY, port=PORT, verbose=0, fname_dump=None) as server:
+        server.args_from_list(range(6))
+        for i in range(0, 6, 2):
+            server.result_q.put([(i, i), (i+1, i+1)])
+        server.start()
+        assert server.batches == [[(i, i) for i in range(6)]]
+    print("[+] three uploads handled by a single call of process_new_results")
+    
+def start_server_handler_pool(n):
+    with jobmanager.JobManager_Server(authkey      = AUTHKEY,
+                                      port         = PORT,
+                                      verbose      = 1,
+                                      fname_dump   = 'jobmanager.dump',
+                                      handler_pool = 'thread') as jm_server:
+        jm_server.args_from_list(range(1, n))
+        jm_server.start()
+        
+def test_jobmanager_handler_pool():
+    """
+    the results are handled by a thread pool, all of them are found in
+    the final_result of the dump
+    """
+    n = 30
+    p_server = mp.Process(target=start_server_handler_pool, args=(n,))
+    p_server.start()
+    
+    time.sleep(1)
+    
+    p_client = mp.Process(target=start_client, args=(1, 4))
+    p_client.start()
+    
+    p_client.join(30)
+    p_server.join(30)
+    
+    assert not p_client.is_alive(), "the client did not terminate on time!"
+    assert not p_server.is_alive(), "the server did not terminate on time!"
+    print("[+] client and server terminated")
+    
+    with open('jobmanager.dump', 'rb') as f:
+        data = jobmanager.JobManager_Server.static_load(f)
+    assert sorted(a for a, r in data['final_result']) == list(range(1, n))
+    print("[+] all arguments found in final_results")
+    
+class Combine_Client(jobmanager.JobManager_Client):
+    """sums up the squares of the arguments locally"""
+    @staticmethod
+    def func(arg, const_arg):
+        return arg**2
+    
+    @staticmethod
+    def combine(acc, arg, result):
+        if acc is None:
+            acc = 0
+        return acc + result
+    
+def start_combine_client():
+    jm_client = Combine_Client(server           = 'localhost', 
+                               authkey          = AUTHKEY, 
+                               port             = PORT, 
+                               nproc            = 2,
+                               verbose          = 1,
+                               batch_size       = 3,
+                               combine_max_jobs = 5)
+    jm_client.start()
+    
+def test_jobmanager_combine():
+    """
+    the clients fold the results, the server gets the sums along with 
+    the arguments
+    """
+    n = 40
+    p_server = mp.Process(target=start_server, args=(n,))
+    p_server.start()
+    
+    time.sleep(1)
+    
+    p_client = mp.Process(target=start_combine_client)
+    p_client.start()
+    
+    p_client.join(30)
+    p_server.join(30)
+    
+    assert not p_client.is_alive(), "the client did not terminate on time!"
+    assert not p_server.is_alive(), "the server did not terminate on time!"
+    print("[+] client and server terminated")
+    
+    with open('jobmanager.dump', 'rb') as f:
+        data = jobmanager.JobManager_Server.static_load(f)
+    assert data['numresults'] == n-1
+    assert len(data['args_dict']) == 0
+    args = [a for args, acc in data['final_result'] for a in args]
+    assert sorted(args) == list(range(1, n))
+    assert sum(acc for args, acc in data['final_result']) == sum(a**2 for a in range(1, n))
+    assert all(len(args) <= 5 for args, acc in data['final_result'])
+    print("[+] accumulators cover all arguments exactly once")
+    
+def test_journal_combined():
+    """replay a journal holding an accumulator of combined results"""
+    fname = 'jobmanager_combined.journal'
+    try:
+        journal = jobmanager._Journal(fname)
+        for i in range(4):
+            journal.append(('arg', i, i))
+        journal.append(('combined', (0, 2), 4))
+        journal.close()
+        
+        server = jobmanager.JobManager_Server(authkey=AUTHKEY, port=PORT, verbose=0, fname_dump=None,
+                                              fname_journal=fname)
+        server.read_old_state()
+        assert server.numresults == 2
+        assert server.final_result == [([0, 2], 4)]
+        assert sorted(server.args_dict) == [1, 3]
+        print("[+] combined jobs done after replay")
+        server._journal = None
+    finally:
+        if os.path.exists(fname):
+            os.remove(fname)
+    
+def test_send_oob():
+    """numpy arrays are sent as out-of-band buffers and received into writable memory"""
+    conn_send, conn_recv = mp.Pipe()
+    a = np.arange(1000, dtype=np.complex128)
+    h = jobmanager.hashableCopyOfNumpyArray(np.arange(4.))
+    jobmanager._send_oob(conn_send, [(0, a), (1, h), (2, 'no array')])
+    kind, data, buffers = jobmanager._recv_oob(conn_recv)
+    assert kind == jobmanager._OOB_RESULTS
+    assert len(buffers) == 2
+    results = pickle.loads(data, buffers=buffers)
+    assert np.all(results[0][1] == a)
+    assert results[0][1].flags.writeable
+    assert isinstance(results[1][1], jobmanager.hashableCopyOfNumpyArray)
+    assert hash(results[1][1]) == hash(h)
+    assert results[2][1] == 'no array'
+    print("[+] arrays received via out-of-band buffers")
+    
+class Array_Client(jobmanager.JobManager_Client):
+    @staticmethod
+    def func(arg, const_arg):
+        return const_arg*arg
+    
+def start_server_zero_copy(n):
+    with jobmanager.JobManager_Server(authkey     = AUTHKEY,
+                                      port        = PORT,
+                                      verbose     = 1,
+                                      const_arg   = np.arange(10000, dtype=np.complex128),
+                                      fname_dump  = 'jobmanager.dump',
+                                      result_port = 0,
+                                      zero_copy   = True) as jm_server:
+        jm_server.args_from_list(range(1, n))
+        jm_server.start()
+        
+def start_array_client():
+    jm_client = Array_Client(server  = 'localhost', 
+                             authkey = AUTHKEY, 
+                             port    = PORT, 
+                             nproc   = 2,
+                             verbose = 1)
+    jm_client.start()
+    
+def test_jobmanager_zero_copy():
+    """
+    const_arg and results are numpy arrays sent with out-of-band buffers
+    """
+    n = 20
+    p_server = mp.Process(target=start_server_zero_copy, args=(n,))
+    p_server.start()
+    
+    time.sleep(1)
+    
+    p_client = mp.Process(target=start_array_client)
+    p_client.start()
+    
+    p_client.join(30)
+    p_server.join(30)
+    
+    assert not p_client.is_alive(), "the client did not terminate on time!"
+    assert not p_server.is_alive(), "the server did not terminate on time!"
+    print("[+] client and server terminated")
+    
+    with open('jobmanager.dump', 'rb') as f:
+        data = jobmanager.JobManager_Server.static_load(f)
+    assert len(data['final_result']) == n-1
+    const_arg = np.arange(10000, dtype=np.complex128)
+    for arg, result in data['final_result']:
+        assert np.all(result == const_arg*arg)
+    print("[+] all results received")
+    
+def test_WireCodec():
+    codec = jobmanager._WireCodec(codec='zlib', threshold=100)
+    small = codec.dumps(1)
+    assert small[:1] == b'\x00'
+    large = codec.dumps(np.zeros(1000))
+    assert large[:1] == b'\x01'
+    assert len(large) < 1000
+    assert codec.loads(small) == 1
+    assert np.all(codec.loads(large) == 0)
+    assert codec.bytes_raw_sent > codec.bytes_sent
+    assert codec.bytes_raw_received > codec.bytes_received
+    print("[+] large messages compressed")
+    
+    job_id, arg = codec.encode_job((3, np.arange(5)))
+    assert job_id == 3
+    arg = pickle.loads(pickle.dumps(arg))
+    assert np.all(codec.decode_arg(arg) == np.arange(5))
+    assert codec.decode_arg('plain') == 'plain'
+    print("[+] encoded argument survives pickling")
+    
+    for name in ['bz2', 'lzma']:
+        codec = jobmanager._WireCodec(codec=name, level=1, threshold=0)
+        assert codec.loads(codec.dumps(b'x'*1000)) == b'x'*1000
+    print("[+] stdlib codecs available")
+    
+    try:
+        jobmanager._WireCodec(codec='unknown')
+    except RuntimeError:
+        print("[+] unknown codec refused")
+    else:
+        assert False, "RuntimeError expected"
+        
+class Zeros_Client(jobmanager.JobManager_Client):
+    """returns a well compressible result"""
+    @staticmethod
+    def func(arg, const_arg):
+        return np.zeros((100, len(arg)))
+    
+def start_zeros_client():
+    jm_client = Zeros_Client(server  = 'localhost', 
+                             authkey = AUTHKEY, 
+                             port    = PORT, 
+                             nproc   = 2,
+                             verbose = 1)
+    jm_client.start()
+    
+def start_server_compression(n, result_port):
+    with jobmanager.JobManager_Server(authkey               = AUTHKEY,
+                                      port                  = PORT,
+                                      verbose               = 1,
+                                      fname_dump            = 'jobmanager.dump',
+                                      result_port           = result_port,
+                                      compression           = 'zlib',
+                                      compression_threshold = 100) as jm_server:
+        jm_server.args_from_list([np.ones(100)*i for i in range(1, n)])
+        jm_server.start()
+        
+def test_jobmanager_compression():
+    """
+    arguments and results are compressed, using the result_q as well as
+    the direct result channel
+    """
+    n = 10
+    for result_port in [None, 0]:
+        p_server = mp.Process(target=start_server_compression, args=(n, result_port))
+        p_server.start()
+        
+        time.sleep(1)
+        
+        p_client = mp.Process(target=start_zeros_client)
+        p_client.start()
+        
+        p_client.join(30)
+        p_server.join(30)
+        
+        assert not p_client.is_alive(), "the client did not terminate on time!"
+        assert not p_server.is_alive(), "the server did not terminate on time!"
+        print("[+] client and server terminated")
+        
+        with open('jobmanager.dump', 'rb') as f:
+            data = jobmanager.JobManager_Server.static_load(f)
+        assert len(data['final_result']) == n-1
+        assert sorted(arg[0] for arg, result in data['final_result']) == list(range(1, n))
+        for arg, result in data['final_result']:
+            assert result.shape == (100, 100)
+            assert np.all(result == 0)
+        print("[+] all results received (result_port {})".format(result_port))
+    
+def test_serializers():
+    a = np.arange(12, dtype=np.complex128).reshape(3, 4)[:, ::2]
+    x = tuple(np.random.rand(15))
+    for serializer in [jobmanager.PickleSerializer(protocol=2),
+                       jobmanager.NumpySerializer(),
+                       jobmanager.FloatTupleSerializer()]:
+        b = serializer.loads(serializer.dumps(a))
+        assert b.dtype == a.dtype
+        assert np.all(b == a)
+        assert serializer.loads(serializer.dumps(x)) == x
+        for obj in [None, 'a', (1, 'b'), [1.5, 2.5], ()]:
+            assert serializer.loads(serializer.dumps(obj)) == obj
+        print("[+] {} round trip".format(serializer.name))
+    
+    serializer = jobmanager.NumpySerializer()
+    b = serializer.loads(serializer.dumps(jobmanager.hashableCopyOfNumpyArray(a)))
+    assert np.all(b == a)
+    b[0, 0] = 1
+    assert len(serializer.dumps(np.zeros(100))) < len(pickle.dumps(np.zeros(100), protocol=2))
+    print("[+] numpy arrays sent raw")
+    
+    serializer = jobmanager.FloatTupleSerializer()
+    assert len(serializer.dumps(x)) == 1 + 8*len(x)
+    assert serializer.dumps((1., 2))[:1] == b'P'
+    print("[+] tuples of floats packed")
+    
+    codec = jobmanager._WireCodec(codec=None, serializer=jobmanager.NumpySerializer())
+    items = [(0, np.ones(5)), ((1, 2), 'combined')]
+    msg = codec.dumps_results(items)
+    items2 = codec.loads_results(msg)
+    assert items2[0][0] == 0
+    assert np.all(items2[0][1] == 1)
+    assert items2[1] == items[1]
+    assert msg[:1] == b'\x00'
+    print("[+] results encoded one by one")
+    
+    try:
+        jobmanager.JobManager_Server(authkey    = AUTHKEY,
+                                     port       = PORT,
+                                     serializer = 'numpy')
+    except RuntimeError:
+        print("[+] serializer must be a Serializer")
+    else:
+        assert False, "RuntimeError expected"
+    
+def start_server_serializer(n, serializer):
+    with jobmanager.JobManager_Server(authkey     = AUTHKEY,
+                                      port        = PORT,
+                                      verbose     = 1,
+                                      fname_dump  = 'jobmanager.dump',
+                                      serializer  = serializer) as jm_server:
+        jm_server.args_from_list([np.ones(10)*i for i in range(1, n)])
+        jm_server.start()
+    
+def test_jobmanager_serializer():
+    """
+    arguments and results are encoded by the serializer of the server
+    """
+    n = 10
+    p_server = mp.Process(target=start_server_serializer, args=(n, jobmanager.NumpySerializer()))
+    p_server.start()
+    
+    time.sleep(1)
+    
+    p_client = mp.Process(target=start_zeros_client)
+    p_client.start()
+    
+    p_client.join(30)
+    p_server.join(30)
+    
+    assert not p_client.is_alive(), "the client did not terminate on time!"
+    assert not p_server.is_alive(), "the server did not terminate on time!"
+    print("[+] client and server terminated")
+    
+    with open('jobmanager.dump', 'rb') as f:
+        data = jobmanager.JobManager_Server.static_load(f)
+    assert len(data['final_result']) == n-1
+    assert sorted(arg[0] for arg, result in data['final_result']) == list(range(1, n))
+    for arg, result in data['final_result']:
+        assert result.shape == (100, 10)
+        assert np.all(result == 0)
+    print("[+] all results received")
+    
+class Picky_Serializer(jobmanager.NumpySerializer):
+    """fails to decode the argument np.ones(10)*3"""
+    def loads(self, data):
+        obj = jobmanager.NumpySerializer.loads(self, data)
+        if (obj.ndim == 1) and (obj[0] == 3):
+            raise ValueError("can not decode")
+        return obj
+    
+def test_jobmanager_decode_fails():
+    """
+    an argument which can not be decoded by the client fails like any other job
+    """
+    n = 10
+    p_server = mp.Process(target=start_server_serializer, args=(n, Picky_Serializer()))
+    p_server.start()
+    
+    time.sleep(1)
+    
+    p_client = mp.Process(target=start_zeros_client)
+    p_client.start()
+    
+    p_client.join(30)
+    p_server.join(30)
+    
+    assert not p_client.is_alive(), "the client did not terminate on time!"
+    assert not p_server.is_alive(), "the server did not terminate on time!"
+    print("[+] client and server terminated")
+    
+    with open('jobmanager.dump', 'rb') as f:
+        data = jobmanager.JobManager_Server.static_load(f)
+    assert len(data['final_result']) == n-2
+    assert [err for job_id, err, host in data['fail_list']] == ['ValueError']
+    assert [data['args_dict'][job_id][0] for job_id, err, host in data['fail_list']] == [3]
+    print("[+] the job went to the fail_list, the others were done")
+    
+def test_share_const_arg():
+    import tempfile
+    d = tempfile.mkdtemp()
+    table = np.random.rand(100, 100)
+    const_arg = {'table': table, 'small': np.arange(3), 'others': (1, [table*2])}
+    
+    shared, locks = jobmanager._share_const_arg(const_arg, d)
+    assert len(locks) == 2
+    assert isinstance(shared['table'], jobmanager._SharedArray)
+    assert isinstance(shared['small'], np.ndarray)
+    assert isinstance(shared['others'][1][0], jobmanager._SharedArray)
+    shared = pickle.loads(pickle.dumps(shared))
+    print("[+] large arrays replaced by references")
+    
+    shared2, locks2 = jobmanager._share_const_arg(const_arg, d)
+    assert len(locks2) == 2
+    assert shared2['table'].fname == shared['table'].fname
+    assert len(os.listdir(d)) == 2
+    print("[+] existing files reused")
+    
+    loaded = jobmanager._load_shared_const_arg(shared)
+    assert isinstance(loaded['table'], np.memmap)
+    assert np.all(loaded['table'] == table)
+    assert np.all(loaded['others'][1][0] == table*2)
+    assert loaded['others'][0] == 1
+    assert not loaded['table'].flags.writeable
+    print("[+] arrays mapped read-only")
+    
+    del loaded
+    for lock in locks:
+        lock.release()
+    assert len(os.listdir(d)) == 2
+    print("[+] files kept while still used")
+    for lock in locks2:
+        lock.release()
+    assert os.listdir(d) == []
+    print("[+] files removed by the last user")
+    os.rmdir(d)
+    
+class Shared_Client(jobmanager.JobManager_Client):
+    @staticmethod
+    def func(arg, const_arg):
+        assert isinstance(const_arg['table'], np.memmap)
+        return const_arg['table'][arg] * const_arg['scale']
+    
+def start_server_shared(n):
+    const_arg = {'table': np.arange(100000, dtype=np.float64), 
+                 'scale': 2}
+    with jobmanager.JobManager_Server(authkey    = AUTHKEY,
+                                      port       = PORT,
+                                      verbose    = 1,
+                                      const_arg  = const_arg,
+                                      fname_dump = 'jobmanager.dump') as jm_server:
+        jm_server.args_from_list(range(1, n))
+        jm_server.start()
+        
+def start_shared_client(directory, njobs=0, connected=None, wait_for=None, done=None):
+    jm_client = Shared_Client(server               = 'localhost', 
+                              authkey              = AUTHKEY, 
+                              port                 = PORT, 
+                              nproc                = 2,
+                              njobs                = njobs,
+                              verbose              = 1,
+                              shared_const_arg     = True,
+                              shared_const_arg_dir = directory)
+    assert len(jm_client._shared_locks) == 1
+    if connected is not None:
+        connected.set()
+    if wait_for is not None:
+        assert wait_for.wait(30)
+    jm_client.start()
+    if done is not None:
+        done.set()
+    
+def test_jobmanager_shared_const_arg():
+    """
+    the numpy array of const_arg is mapped by the workers from a host-local file
+    """
+    import tempfile
+    d = tempfile.mkdtemp()
+    n = 20
+    p_server = mp.Process(target=start_server_shared, args=(n,))
+    p_server.start()
+    
+    time.sleep(1)
+    
+    p_client = mp.Process(target=start_shared_client, args=(d,))
+    p_client.start()
+    
+    p_client.join(30)
+    p_server.join(30)
+    
+    assert not p_client.is_alive(), "the client did not terminate on time!"
+    assert not p_server.is_alive(), "the server did not terminate on time!"
+    assert p_client.exitcode == 0
+    print("[+] client and server terminated")
+    
+    with open('jobmanager.dump', 'rb') as f:
+        data = jobmanager.JobManager_Server.static_load(f)
+    assert len(data['final_result']) == n-1
+    for arg, result in data['final_result']:
+        assert result == 2*arg
+    print("[+] all results received")
+    
+    assert os.listdir(d) == []
+    os.rmdir(d)
+    print("[+] shared files removed")
+    
+def test_jobmanager_shared_const_arg_two_clients():
+    """
+    the second client connects while the first one runs and starts its
+    workers after the first one has finished, the file is still there
+    """
+    import tempfile
+    d = tempfile.mkdtemp()
+    n = 20
+    p_server = mp.Process(target=start_server_shared, args=(n,))
+    p_server.start()
+    
+    time.sleep(1)
+    
+    a_connected = mp.Event()
+    b_connected = mp.Event()
+    a_done = mp.Event()
+    p_client_a = mp.Process(target=start_shared_client, args=(d,),
+                            kwargs={'njobs': 2, 'connected': a_connected, 'wait_for': b_connected, 'done': a_done})
+    p_client_a.start()
+    assert a_connected.wait(10)
+    p_client_b = mp.Process(target=start_shared_client, args=(d,),
+                            kwargs={'connected': b_connected, 'wait_for': a_done})
+    p_client_b.start()
+    
+    p_client_a.join(30)
+    p_client_b.join(30)
+    p_server.join(30)
+    
+    assert not p_client_a.is_alive(), "the first client did not terminate on time!"
+    assert not p_client_b.is_alive(), "the second client did not terminate on time!"
+    assert not p_server.is_alive(), "the server did not terminate on time!"
+    assert (p_client_a.exitcode == 0) and (p_client_b.exitcode == 0)
+    print("[+] clients and server terminated")
+    
+    with open('jobmanager.dump', 'rb') as f:
+        data = jobmanager.JobManager_Server.static_load(f)
+    assert len(data['final_result']) == n-1
+    assert len(data['fail_list']) == 0
+    print("[+] all results received")
+    
+    assert os.listdir(d) == []
+    os.rmdir(d)
+    print("[+] shared file removed by the second client")
+    
+def test_content_hash():
+    a = np.arange(10.)
+    h = jobmanager._content_hash({'a': a, 'b': (1, 'x')})
+    assert h == jobmanager._content_hash({'a': a.copy(), 'b': (1, 'x')})
+    assert h != jobmanager._content_hash({'a': a+1, 'b': (1, 'x')})
+    assert h != jobmanager._content_hash({'a': a, 'b': [1, 'x']})
+    assert jobmanager._content_hash(a) != jobmanager._content_hash(a.astype(np.float32))
+    assert jobmanager._content_hash(a) != jobmanager._content_hash(a.reshape(2, 5))
+    print("[+] hash depends on the content only")
+    
+class Scale_Client(jobmanager.JobManager_Client):
+    @staticmethod
+    def func(arg, const_arg):
+        return arg*const_arg
+    
+def start_server_const_arg_cache(n):
+    with jobmanager.JobManager_Server(authkey    = AUTHKEY,
+                                      port       = PORT,
+                                      verbose    = 1,
+                                      const_arg  = 2,
+                                      fname_dump = 'jobmanager.dump') as jm_server:
+        jm_server.args_from_list(range(1, n))
+        jm_server.start()
+        
+def start_scale_client(const_arg_cache=None, delay=0):
+    jm_client = Scale_Client(server          = 'localhost', 
+                             authkey         = AUTHKEY, 
+                             port            = PORT, 
+                             nproc           = 2,
+                             verbose         = 1,
+                             const_arg_cache = const_arg_cache)
+    time.sleep(delay)
+    jm_client.start()
+    
+def test_jobmanager_const_arg_cache():
+    """
+    the const_arg is read from the cache of the client if it holds the hash
+    announced by the server
+    """
+    import tempfile
+    d = tempfile.mkdtemp()
+    n = 10
+    for i in range(2):
+        p_server = mp.Process(target=start_server_const_arg_cache, args=(n,))
+        p_server.start()
+        
+        time.sleep(1)
+        
+        p_client = mp.Process(target=start_scale_client, args=(d,))
+        p_client.start()
+        
+        p_client.join(30)
+        p_server.join(30)
+        
+        assert not p_client.is_alive(), "the client did not terminate on time!"
+        assert not p_server.is_alive(), "the server did not terminate on time!"
+        print("[+] client and server terminated")
+        
+        with open('jobmanager.dump', 'rb') as f:
+            data = jobmanager.JobManager_Server.static_load(f)
+        assert len(data['final_result']) == n-1
+        
+        fnames = os.listdir(d)
+        assert fnames == ['jobmanager_const_arg_{}.pickle'.format(jobmanager._content_hash(2))]
+        if i == 0:
+            for arg, result in data['final_result']:
+                assert result == 2*arg
+            print("[+] const_arg stored in cache")
+            # the second client must take the cached version
+            with open(os.path.join(d, fnames[0]), 'wb') as f:
+                pickle.dump(3, f)
+        else:
+            for arg, result in data['final_result']:
+                assert result == 3*arg
+            print("[+] const_arg read from cache")
+    os.remove(os.path.join(d, fnames[0]))
+    os.rmdir(d)
+
+def start_server_rounds(n):
+    with jobmanager.JobManager_Server(authkey    = AUTHKEY,
+                                      port       = PORT,
+                                      verbose    = 1,
+                                      const_arg  = 2,
+                                      fname_dump = 'jobmanager.dump') as jm_server:
+        jm_server.args_from_list(range(1, n))
+        jm_server.start()
+        
+        jm_server.set_const_arg(10)
+        jm_server.args_from_list(range(101, 100+n))
+        try:
+            jm_server.set_const_arg(5)
+        except RuntimeError:
+            print("[+] const_arg not changed while jobs are pending")
+        else:
+            assert False, "RuntimeError expected"
+        jm_server.start()
+    
+def test_jobmanager_const_arg_version():
+    """
+    the server publishes a new const_arg between two rounds, a client 
+    connected before switches to it
+    """
+    n = 10
+    p_server = mp.Process(target=start_server_rounds, args=(n,))
+    p_server.start()
+    
+    time.sleep(1)
+    
+    # connected during the first round, works on the second
+    p_client_late = mp.Process(target=start_scale_client, kwargs={'delay': 8})
+    p_client_late.start()
+    
+    p_client = mp.Process(target=start_scale_client)
+    p_client.start()
+    
+    p_client.join(30)
+    p_client_late.join(30)
+    p_server.join(30)
+    
+    assert not p_client.is_alive(), "the client did not terminate on time!"
+    assert not p_client_late.is_alive(), "the client did not terminate on time!"
+    assert not p_server.is_alive(), "the server did not terminate on time!"
+    print("[+] clients and server terminated")
+    
+    with open('jobmanager.dump', 'rb') as f:
+        data = jobmanager.JobManager_Server.static_load(f)
+    assert len(data['final_result']) == 2*(n-1)
+    for arg, result in data['final_result']:
+        if arg < 100:
+            assert result == 2*arg
+        else:
+            assert result == 10*arg
+    print("[+] second round calculated with the new const_arg")
+    
+def test_ConstArgSwitch():
+    calls = []
+    def fetch():
+        calls.append(1)
+        return 'v2', 2
+    switch = jobmanager._ConstArgSwitch(const_arg='v1', version=1, fetch=fetch, nproc=3)
+    switch.start()
+    
+    def worker(i):
+        assert switch.get(i, 2) == ('v2', 2)
+    procs = [mp.Process(target=worker, args=(i,)) for i in range(3)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(10)
+        assert p.exitcode == 0
+    assert len(calls) == 1
+    print("[+] new version fetched once for all workers")
+    
+    def fetch_fails():
+        raise RuntimeError("server gone")
+    switch.fetch = fetch_fails
+    try:
+        switch.get(0, 3)
+    except RuntimeError:
+        print("[+] exception of fetch raised by get")
+    else:
+        assert False, "RuntimeError expected"
+    assert switch.get(1, 2) == ('v2', 2)
+    switch.close(timeout=10)
+    
+def test_broadcast():
+    authkey = bytearray(AUTHKEY, encoding='utf8')
+    const_arg = np.random.rand(100000)
+    data = pickle.dumps(const_arg, protocol=pickle.HIGHEST_PROTOCOL)
+    server = jobmanager._BroadcastSeeder(authkey=authkey, data=data, chunk_size=2**16)
+    tracker = jobmanager._BroadcastTracker(server.manifest())
+    assert server.num_chunks == len(tracker.manifest()['chunk_hashes']) > 10
+    
+    seeders = []
+    for i in range(4):
+        ca, seeder = jobmanager._fetch_broadcast('localhost', authkey, tracker)
+        assert np.all(ca == const_arg)
+        seeders.append(seeder)
+        assert server.bytes_served == len(data)
+    assert sum(seeder.bytes_served for seeder in seeders) == 3*len(data)
+    print("[+] the server sent the const_arg once, the clients the other copies")
+    
+    ca, seeder = jobmanager._fetch_broadcast('localhost', authkey, tracker, seed=False)
+    assert seeder is None
+    assert np.all(ca == const_arg)
+    print("[+] fetched without seeding")
+    
+    # a client holding wrong data and a client which is gone
+    bad = jobmanager._BroadcastSeeder(authkey=authkey, data=b'x'*len(data), chunk_size=2**16)
+    for index in range(server.num_chunks):
+        tracker._holders[index] = [('127.0.0.1', bad.port), ('127.0.0.1', seeders[0].port)]
+    seeders[0].close()
+    ca, seeder = jobmanager._fetch_broadcast('localhost', authkey, tracker, seed=False)
+    assert np.all(ca == const_arg)
+    assert all(('127.0.0.1', seeders[0].port) not in holders for holders in tracker._holders)
+    print("[+] corrupt chunks and missing clients are skipped")
+    
+    for seeder in seeders[1:] + [bad, server]:
+        seeder.close()
+    
+class Broadcast_Client(jobmanager.JobManager_Client):
+    @staticmethod
+    def func(arg, const_arg):
+        return const_arg[arg]
+    
+def start_server_broadcast(n):
+    with jobmanager.JobManager_Server(authkey              = AUTHKEY,
+                                      port                 = PORT,
+                                      verbose              = 1,
+                                      const_arg            = np.arange(100000, dtype=np.float64)*3,
+                                      fname_dump           = 'jobmanager.dump',
+                                      const_arg_broadcast  = True,
+                                      broadcast_chunk_size = 2**16) as jm_server:
+        jm_server.args_from_list(range(1, n))
+        jm_server.start()
+        
+def start_broadcast_client():
+    jm_client = Broadcast_Client(server  = 'localhost', 
+                                 authkey = AUTHKEY, 
+                                 port    = PORT, 
+                                 nproc   = 1,
+                                 verbose = 2)
+    jm_client.start()
+    
+def test_jobmanager_broadcast():
+    """
+    several clients get the const_arg via the broadcast
+    """
+    n = 50
+    p_server = mp.Process(target=start_server_broadcast, args=(n,))
+    p_server.start()
+    
+    time.sleep(1)
+    
+    p_clients = [mp.Process(target=start_broadcast_client) for i in range(3)]
+    for p_client in p_clients:
+        p_client.start()
+        
+    for p_client in p_clients:
+        p_client.join(30)
+    p_server.join(30)
+    
+    for p_client in p_clients:
+        assert not p_client.is_alive(), "the client did not terminate on time!"
+    assert not p_server.is_alive(), "the server did not terminate on time!"
+    print("[+] clients and server terminated")
+    
+    with open('jobmanager.dump', 'rb') as f:
+        data = jobmanager.JobManager_Server.static_load(f)
+    assert len(data['final_result']) == n-1
+    for arg, result in data['final_result']:
+        assert result == 3*arg
+    print("[+] all results received")
+    
+def test_BlobCache():
+    import tempfile
+    d = tempfile.mkdtemp()
+    store = jobmanager._BlobStore()
+    blobs = [np.arange(10000, dtype=np.float64), {'x': 'some object'}, np.ones(10000)]
+    refs = []
+    for blob in blobs:
+        data = pickle.dumps(blob, protocol=pickle.HIGHEST_PROTOCOL)
+        refs.append(jobmanager.BlobRef(hashlib.sha1(data).hexdigest()))
+        store.put(refs[-1].hash, data)
+    
+    cache = jobmanager._BlobCache(d, max_bytes=100000)
+    arg = (1, refs[0], {'b': refs[1]})
+    for i in range(2):
+        a = cache.resolve(arg, store)
+        assert a[0] == 1
+        assert np.all(a[1] == blobs[0])
+        assert a[2]['b'] == blobs[1]
+    assert cache.fetched == 2
+    assert cache.hits == 2
+    assert isinstance(a[1], np.memmap)
+    print("[+] blobs fetched once, then taken from the cache")
+    
+    # another process on the same host
+    cache2 = jobmanager._BlobCache(d, max_bytes=100000)
+    cache2.resolve(refs[0], store)
+    assert cache2.hits == 1
+    print("[+] cache shared on the host")
+    
+    time.sleep(0.1)
+    cache.resolve(refs[1], store)
+    time.sleep(0.1)
+    cache.resolve(refs[2], store)
+    names = os.listdir(d)
+    assert len(names) == 2
+    assert 'jobmanager_blob_{}.npy'.format(refs[0].hash) not in names
+    print("[+] least recently used blob evicted")
+    
+    try:
+        cache.resolve(jobmanager.BlobRef('unknown'), store)
+    except RuntimeError:
+        print("[+] unknown blob detected")
+    else:
+        assert False, "RuntimeError expected"
+    
+    for name in os.listdir(d):
+        os.remove(os.path.join(d, name))
+    os.rmdir(d)
+    
+class Blob_Client(jobmanager.JobManager_Client):
+    @staticmethod
+    def func(arg, const_arg):
+        i, table = arg
+        return table[i]
+    
+def start_server_blobs(n):
+    with jobmanager.JobManager_Server(authkey    = AUTHKEY,
+                                      port       = PORT,
+                                      verbose    = 1,
+                                      fname_dump = 'jobmanager.dump') as jm_server:
+        ref_2 = jm_server.put_blob(np.arange(1000)*2)
+        ref_3 = jm_server.put_blob(np.arange(1000)*3)
+        assert jm_server.put_blob(np.arange(1000)*2) == ref_2
+        jm_server.args_from_list([(i, ref_2) for i in range(1, n)] + 
+                                 [(i, ref_3) for i in range(1, n)])
+        jm_server.start()
+        
+def start_blob_client(directory):
+    jm_client = Blob_Client(server          = 'localhost', 
+                            authkey         = AUTHKEY, 
+                            port            = PORT, 
+                            nproc           = 2,
+                            verbose         = 1,
+                            blob_cache_dir  = directory)
+    jm_client.start()
+    
+def test_jobmanager_blobs():
+    """
+    the arguments refer to blobs, which the client caches
+    """
+    import tempfile
+    d = tempfile.mkdtemp()
+    n = 20
+    p_server = mp.Process(target=start_server_blobs, args=(n,))
+    p_server.start()
+    
+    time.sleep(1)
+    
+    p_client = mp.Process(target=start_blob_client, args=(d,))
+    p_client.start()
+    
+    p_client.join(30)
+    p_server.join(30)
+    
+    assert not p_client.is_alive(), "the client did not terminate on time!"
+    assert not p_server.is_alive(), "the server did not terminate on time!"
+    print("[+] client and server terminated")
+    
+    with open('jobmanager.dump', 'rb') as f:
+        data = jobmanager.JobManager_Server.static_load(f)
+    assert len(data['final_result']) == 2*(n-1)
+    for (i, ref), result in data['final_result']:
+        assert isinstance(ref, jobmanager.BlobRef)
+        assert result in [2*i, 3*i]
+    assert sorted(result/i for (i, ref), result in data['final_result']) == [2]*(n-1) + [3]*(n-1)
+    print("[+] all results received")
+    
+    assert len(os.listdir(d)) == 2
+    for name in os.listdir(d):
+        os.remove(os.path.join(d, name))
+    os.rmdir(d)
+    print("[+] blobs cached on the host")
+    
+class Sleep_Client(jobmanager.JobManager_Client):
+    @staticmethod
+    def func(arg, const_arg):
+        # the client to be killed holds its jobs long enough
+        if 'JM_TEST_SLOW' in os.environ:
+            time.sleep(30)
+        time.sleep(0.2)
+        return arg
+    
+def start_server_leases(n):
+    with jobmanager.JobManager_Server(authkey    = AUTHKEY,
+                                      port       = PORT,
+                                      verbose    = 1,
+                                      fname_dump = 'jobmanager.dump',
+                                      lease_time = 5) as jm_server:
+        jm_server.args_from_list(range(1, n))
+        jm_server.start()
+        
+def start_sleep_client(slow=False):
+    if slow:
+        os.environ['JM_TEST_SLOW'] = '1'
+        # the client and its workers can be killed at once
+        os.setpgrp()
+    jm_client = Sleep_Client(server     = 'localhost', 
+                             authkey    = AUTHKEY, 
+                             port       = PORT, 
+                             nproc      = 2,
+                             batch_size = 4,
+                             verbose    = 1)
+    jm_client.start()
+    
+def test_jobmanager_leases():
+    """
+    the jobs of a client killed by SIGKILL are processed by another client
+    after their lease expired
+    
+    The other client is started together with the SIGKILL and finds the job_q 
+    empty before the lease expires, it has to wait for the jobs of the killed 
+    client.
+    """
+    n = 20
+    p_server = mp.Process(target=start_server_leases, args=(n,))
+    p_server.start()
+    
+    time.sleep(1)
+    
+    p_client_slow = mp.Process(target=start_sleep_client, args=(True,))
+    p_client_slow.start()
+    time.sleep(2)
+    p_client = mp.Process(target=start_sleep_client)
+    p_client.start()
+    os.killpg(p_client_slow.pid, signal.SIGKILL)
+    p_client_slow.join(5)
+    print("[+] first client killed")
+    
+    p_client.join(30)
+    p_server.join(30)
+    
+    assert not p_client.is_alive(), "the client did not terminate on time!"
+    assert not p_server.is_alive(), "the server did not terminate on time!"
+    print("[+] client and server terminated")
+    
+    with open('jobmanager.dump', 'rb') as f:
+        data = jobmanager.JobManager_Server.static_load(f)
+    assert len(data['args_dict']) == 0
+    assert sorted(arg for arg, result in data['final_result']) == list(range(1, n))
+    print("[+] all jobs processed, also those of the killed client")
+    
+class Straggler_Client(jobmanager.JobManager_Client):
+    @staticmethod
+    def func(arg, const_arg):
+        # job 1 gets stuck on the slow client
+        if (arg == 1) and ('JM_TEST_SLOW' in os.environ):
+            time.sleep(30)
+        time.sleep(0.1)
+        return arg
+    
+def start_server_speculation(n):
+    with jobmanager.JobManager_Server(authkey             = AUTHKEY,
+                                      port                = PORT,
+                                      verbose             = 1,
+                                      fname_dump          = 'jobmanager.dump',
+                                      lease_time          = 5,
+                                      speculative_copies  = 1,
+                                      speculative_min_age = 1) as jm_server:
+        jm_server.args_from_list(range(1, n))
+        jm_server.start()
+        
+def start_straggler_client(slow, nproc):
+    if slow:
+        os.environ['JM_TEST_SLOW'] = '1'
+    jm_client = Straggler_Client(server  = 'localhost', 
+                                 authkey = AUTHKEY, 
+                                 port    = PORT, 
+                                 nproc   = nproc,
+                                 verbose = 1)
+    jm_client.start()
+    
+def test_jobmanager_speculation():
+    """
+    the job stuck on a slow client is copied to a fast one
+    """
+    n = 20
+    p_server = mp.Process(target=start_server_speculation, args=(n,))
+    p_server.start()
+    
+    time.sleep(1)
+    
+    p_slow = mp.Process(target=start_straggler_client, args=(True, 1))
+    p_slow.start()
+    time.sleep(2)
+    p_fast = mp.Process(target=start_straggler_client, args=(False, 2))
+    p_fast.start()
+    
+    p_fast.join(20)
+    p_server.join(20)
+    
+    assert not p_fast.is_alive(), "the fast client did not terminate on time!"
+    assert not p_server.is_alive(), "the server did not terminate on time!"
+    print("[+] server done before the straggler")
+    
+    p_slow.terminate()
+    p_slow.join(10)
+    
+    with open('jobmanager.dump', 'rb') as f:
+        data = jobmanager.JobManager_Server.static_load(f)
+    assert len(data['args_dict']) == 0
+    assert sorted(arg for arg, result in data['final_result']) == list(range(1, n))
+    print("[+] all jobs processed")
+    
+def test_RetryPolicy():
+    policy = jobmanager.RetryPolicy(max_attempts=3, backoff=0.5, max_backoff=1.5, no_retry_on=[ValueError])
+    assert policy.retry('RuntimeError', 1)
+    assert policy.retry('RuntimeError', 2)
+    assert not policy.retry('RuntimeError', 3)
+    assert not policy.retry('ValueError', 1)
+    assert [policy.delay(n) for n in [1, 2, 3]] == [0.5, 1, 1.5]
+    
+    policy = jobmanager.RetryPolicy(retry_on=['OSError', MemoryError])
+    assert policy.retry('OSError', 1)
+    assert policy.retry('MemoryError', 1)
+    assert not policy.retry('RuntimeError', 1)
+    print("[+] RetryPolicy decides as expected")
+    
+    # retries avoid the hosts the job failed on
+    q = jobmanager.JobQueue([(0, 'arg0')])
+    q.lease_time = 5
+    assert q.get(client_id='h2:1') == (0, 'arg0')
+    q.expect(2)
+    q.put_retries([(7, 'arg7'), (8, 'arg8')], {7: {'h1'}}, 2)
+    assert q.get(client_id='h1:5') == (8, 'arg8')
+    try:
+        q.get(block=False, client_id='h1:5')
+    except jobmanager._JobsPending:
+        pass
+    else:
+        assert False, "job 7 should not go to host h1"
+    assert q.get(client_id='h2:1') == (7, 'arg7')
+    
+    # unless there is no other host
+    q = jobmanager.JobQueue()
+    q.lease_time = 5
+    q.put_retries([(9, 'arg9')], {9: {'h1'}}, 0)
+    assert q.get(client_id='h1:5') == (9, 'arg9')
+    print("[+] retried jobs avoid the hosts they failed on")
+    
+    # the retry goes to a host which is idle when it is put
+    q = jobmanager.JobQueue([(0, 'arg0')])
+    q.lease_time = 5
+    assert q.get(client_id='h1:5') == (0, 'arg0')
+    q.expect(1)
+    try:
+        q.get(timeout=0.1, client_id='h2:1')
+    except jobmanager._JobsPending:
+        pass
+    else:
+        assert False, "_JobsPending expected"
+    q.put_retries([(7, 'arg7')], {7: {'h1'}}, 1)
+    try:
+        q.get(block=False, client_id='h1:6')
+    except jobmanager._JobsPending:
+        pass
+    else:
+        assert False, "job 7 should not go to host h1"
+    assert q.get(timeout=0.1, client_id='h2:1') == (7, 'arg7')
+    print("[+] retried job handed to the idle host")
+    
+    # idle clients are told to ask again until the announced retries are put
+    q = jobmanager.JobQueue()
+    q.expect(1)
+    jobmanager.threading.Timer(0.3, q.put_retries, args=([(1, 'arg1')], {}, 1)).start()
+    t0 = time.time()
+    try:
+        q.get(timeout=0.1, client_id='h1:5')
+    except jobmanager._JobsPending:
+        assert time.time() - t0 < 0.25
+    else:
+        assert False, "_JobsPending expected"
+    time.sleep(0.3)
+    assert q.get(timeout=0.1, client_id='h1:5') == (1, 'arg1')
+    try:
+        q.get(block=False, client_id='h1:5')
+    except jobmanager._JobsPending:
+        assert False, "no more jobs to come"
+    except jobmanager.queue.Empty:
+        pass
+    print("[+] idle clients ask again for the retries")
+    
+class Flaky_Client(jobmanager.JobManager_Client):
+    @staticmethod
+    def func(arg, const_arg):
+        if arg == 5:
+            raise ValueError("never retried")
+        # odd arguments fail at the first attempt
+        fname = os.path.join(const_arg, str(arg))
+        if (arg % 2 == 1) and not os.path.exists(fname):
+            open(fname, 'w').close()
+            raise RuntimeError("transient failure")
+        return arg
+    
+def start_server_retry(n, directory):
+    policy = jobmanager.RetryPolicy(max_attempts=2, backoff=0.5, no_retry_on=[ValueError])
+    with jobmanager.JobManager_Server(authkey      = AUTHKEY,
+                                      port         = PORT,
+                                      verbose      = 1,
+                                      const_arg    = directory,
+                                      fname_dump   = 'jobmanager.dump',
+                                      retry_policy = policy) as jm_server:
+        jm_server.args_from_list(range(1, n))
+        jm_server.start()
+        
+def start_flaky_client():
+    jm_client = Flaky_Client(server  = 'localhost', 
+                             authkey = AUTHKEY, 
+                             port    = PORT, 
+                             nproc   = 2,
+                             verbose = 0)
+    jm_client.start()
+    
+def test_jobmanager_retry():
+    """
+    transient failures are retried, the job failing with ValueError is not
+    """
+    import glob
+    import tempfile
+    d = tempfile.mkdtemp()
+    n = 20
+    p_server = mp.Process(target=start_server_retry, args=(n, d))
+    p_server.start()
+    
+    time.sleep(1)
+    
+    p_client = mp.Process(target=start_flaky_client)
+    p_client.start()
+    
+    p_client.join(30)
+    p_server.join(30)
+    
+    assert not p_client.is_alive(), "the client did not terminate on time!"
+    assert not p_server.is_alive(), "the server did not terminate on time!"
+    print("[+] client and server terminated")
+    
+    with open('jobmanager.dump', 'rb') as f:
+        data = jobmanager.JobManager_Server.static_load(f)
+    assert sorted(arg for arg, result in data['final_result']) == [i for i in range(1, n) if i != 5]
+    assert [(data['args_dict'][job_id], err) for job_id, err, host in data['fail_list']] == [(5, 'ValueError')]
+    print("[+] transient failures retried")
+    
+    for name in os.listdir(d):
+        os.remove(os.path.join(d, name))
+    os.rmdir(d)
+    for fname in glob.glob('traceback_err_*.trb'):
+        os.remove(fname)
+    
 def test_hashDict():
     s = set()
     
@@ -703,11 +2930,65 @@ if __name__ == "__main__":
 #         test_Signal_to_terminate_process_list,
 #                 
 #         test_jobmanager_basic,
+#         test_jobmanager_batch_size,
+#         test_args_from_iterable,
+#         test_jobmanager_args_from_iterable,
+#         test_jobmanager_direct_results,
+#         test_myQueue_bulk_operations,
+#         test_ChunkSizer,
+#         test_jobmanager_auto_batch_size,
+#         test_ResultUploader,
+#         test_JobFetcher,
+#         test_JobQueue,
+#         test_JobQueue_leases,
+#         test_JobQueue_speculation,
 #         test_jobmanager_server_signals,
         test_shutdown_server_while_client_running,
 #         test_shutdown_client,
+#         test_shutdown_client_prefetch,
 #         test_check_fail,
 #         test_jobmanager_read_old_stat,
+#         test_JobSpill,
+#         test_jobmanager_spill,
+#         test_args_from_iterable_spill,
+#         test_spill_with_failures,
+#         test_Journal,
+#         test_jobmanager_journal,
+#         test_static_load_old_dump,
+#         test_dump_chunked,
+#         test_convert_dump,
+#         test_PickleFileSink,
+#         test_NpyDirSink,
+#         test_server_result_sink,
+#         test_ResultColumns,
+#         test_jobmanager_result_schema,
+#         test_handler_pool,
+#         test_results_of_several_uploads_in_one_batch,
+#         test_jobmanager_handler_pool,
+#         test_jobmanager_combine,
+#         test_journal_combined,
+#         test_send_oob,
+#         test_jobmanager_zero_copy,
+#         test_WireCodec,
+#         test_jobmanager_compression,
+#         test_serializers,
+#         test_jobmanager_serializer,
+#         test_jobmanager_decode_fails,
+#         test_share_const_arg,
+#         test_jobmanager_shared_const_arg,
+#         test_jobmanager_shared_const_arg_two_clients,
+#         test_content_hash,
+#         test_jobmanager_const_arg_cache,
+#         test_jobmanager_const_arg_version,
+#         test_ConstArgSwitch,
+#         test_broadcast,
+#         test_jobmanager_broadcast,
+#         test_BlobCache,
+#         test_jobmanager_blobs,
+#         test_jobmanager_leases,
+#         test_jobmanager_speculation,
+#         test_RetryPolicy,
+#         test_jobmanager_retry,
 #         test_hashDict,
 #         test_hashedViewOnNumpyArray,
 #         test_client_status,
@@ -718,6 +2999,7 @@ if __name__ == "__main__":
 
         lambda : print("END")
         ]
+        setup_module(None)
         for f in func:
             print()
             print('#'*80)
@@ -725,6 +3007,7 @@ if __name__ == "__main__":
             print()
             f()
             time.sleep(1)
+        teardown_module(None)
     
 #         _test_interrupt_client()
     
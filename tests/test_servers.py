@@ -95,6 +95,21 @@ def test_recursive_type_scan():
     for i in d:
         print(i)
     
+
+def test_PersistentDataSink():
+    from jobmanager.persistentData import PersistentDataStructure as PDS
+    with PDS(name='test_sink', verbose=0) as data:
+        try:
+            sink = jm.servers.PersistentDataSink(data, key=lambda a: 'key{}'.format(a), batch_size=2)
+            for i in range(3):
+                sink.put(i, i**2)
+            assert len(data) == 2
+            sink.close()
+            assert len(data) == 3
+            assert data['key2'] == (2, 4)
+            print("[+] results stored in batches")
+        finally:
+            data.erase()
     
 if __name__ == "__main__":
     test_recursive_type_scan()